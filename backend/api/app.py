@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import router
+from model_registry import registry, WARMUP_ENV
+import os
 import uvicorn
 
 app = FastAPI(
@@ -21,6 +23,19 @@ app.add_middleware(
 # Include routes
 app.include_router(router)
 
+@app.on_event("startup")
+def warm_up_models():
+    """
+    Load and warm up every model once so the first request doesn't pay for it.
+    By default this runs in the background: the app serves /health/live at once
+    and /health/ready reports ready when the models are loaded.
+    """
+    mode = os.environ.get(WARMUP_ENV, "background")
+    if mode == "blocking":
+        registry.warm_up()
+    elif mode != "off":
+        registry.warm_up_in_background()
+
 @app.get("/")
 async def root():
     return {
@@ -28,9 +43,20 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "process": "/api/audio/process - Complete pipeline",
+            "stream": "/api/audio/stream - Windowed pipeline streaming NDJSON/SSE events",
+            "batch": "/api/audio/batch - Many files at once, models batched across them, NDJSON/SSE per file",
+            "live": "/api/audio/live - WebSocket: 16 kHz PCM in, partial/final segments with speakers out",
+            "sessions": "/api/audio/sessions/{session_key}/append - Growing recordings: only the new tail is processed each upload",
+            "jobs": "/api/audio/jobs - Queue the complete pipeline, poll /jobs/{job_id}",
             "transcribe": "/api/audio/transcribe - Transcription only",
             "diarize": "/api/audio/diarize - Diarization only",
-            "health": "/api/audio/health - Health check"
+            "health": "/api/audio/health - Health check",
+            "liveness": "/api/audio/health/live - Liveness: the process is serving requests",
+            "readiness": "/api/audio/health/ready - Readiness: which models are loaded (503 until warm-up is done)",
+            "speakers": "/api/audio/speakers - Enrolled voices in the cross-session speaker index",
+            "governor": "/api/audio/governor - CPU budget, heavy-stage slots and waiting stages",
+            "models": "/api/audio/models - Model load time and memory",
+            "metrics": "/api/audio/metrics - Prometheus-style stage timings and queue depth"
         }
     }
 
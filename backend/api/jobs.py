@@ -0,0 +1,206 @@
+"""
+Background job subsystem for long-running audio processing.
+
+Routes submit work and return a job ID right away; a bounded worker pool runs
+the jobs off the event loop. The backend is pluggable: `LocalJobBackend` keeps
+everything in-process for a single node, and another implementation (e.g. one
+that talks to a broker) only has to provide the `JobBackend` interface and be
+registered in `JOB_BACKENDS`.
+"""
+
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from scheduler import cpu_budget
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the backend cannot accept more work."""
+
+
+class JobNotFoundError(KeyError):
+    """Raised when a job ID is unknown (or already evicted)."""
+
+
+class JobBackend(ABC):
+    """Interface every job backend implements."""
+
+    @abstractmethod
+    def submit(self, fn: Callable[..., Any], *args, cleanup: Callable[[], None] | None = None, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return the job ID. Raises QueueFullError."""
+
+    @abstractmethod
+    def status(self, job_id: str) -> dict:
+        """Public view of the job (no result payload)."""
+
+    @abstractmethod
+    def result(self, job_id: str) -> Any:
+        """Result of a finished job."""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> dict:
+        """Cancel a queued job, or mark a running one so its result is discarded."""
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Jobs accepted but not finished yet."""
+
+
+class _Job:
+    def __init__(self, job_id: str, cleanup: Callable[[], None] | None):
+        self.id = job_id
+        self.state = QUEUED
+        self.cleanup = cleanup
+        self.future = None
+        self.result = None
+        self.error: str | None = None
+        self.cancel_requested = False
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+
+    def public(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.state,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class LocalJobBackend(JobBackend):
+    """
+    In-process queue on a thread pool.
+
+    Threads rather than processes so every job shares the models already loaded
+    in `model_registry`; the heavy work runs in native code that releases the GIL.
+    """
+
+    def __init__(self, workers: int | None = None, max_queue: int = 16, keep_finished: int = 500):
+        self.workers = workers or max(1, cpu_budget() // 4)
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="audio-job")
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, cleanup=None, **kwargs) -> str:
+        with self._lock:
+            if self._depth_locked() >= self.workers + self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+            job = _Job(uuid.uuid4().hex, cleanup)
+            self._jobs[job.id] = job
+            self._evict_locked()
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job: _Job, fn, args, kwargs):
+        with self._lock:
+            if job.state == CANCELLED:
+                return
+            job.state = RUNNING
+            job.started_at = time.time()
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                if job.cancel_requested:
+                    job.state = CANCELLED
+                else:
+                    job.result = result
+                    job.state = DONE
+        except Exception as e:
+            with self._lock:
+                job.error = str(e)
+                job.state = CANCELLED if job.cancel_requested else FAILED
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                self._cleanup(job)
+
+    def _cleanup(self, job: _Job):
+        if job.cleanup is not None:
+            try:
+                job.cleanup()
+            except Exception as e:
+                print(f"⚠️  Cleanup for job {job.id} failed: {e}")
+            job.cleanup = None
+
+    def _get(self, job_id: str) -> _Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def status(self, job_id: str) -> dict:
+        with self._lock:
+            return self._get(job_id).public()
+
+    def result(self, job_id: str):
+        with self._lock:
+            return self._get(job_id).result
+
+    def cancel(self, job_id: str) -> dict:
+        with self._lock:
+            job = self._get(job_id)
+            if job.state == QUEUED:
+                # If a worker already picked it up, _run sees CANCELLED and returns
+                job.future.cancel()
+                job.state = CANCELLED
+                job.finished_at = time.time()
+                self._cleanup(job)
+            elif job.state == RUNNING:
+                # Native inference can't be interrupted; the result is dropped when it returns
+                job.cancel_requested = True
+            return job.public()
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._depth_locked()
+
+    def _depth_locked(self) -> int:
+        return sum(1 for j in self._jobs.values() if j.state not in FINISHED_STATES)
+
+    def _evict_locked(self):
+        finished = [j.id for j in self._jobs.values() if j.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+
+JOB_BACKENDS: dict[str, Callable[[], JobBackend]] = {
+    "local": lambda: LocalJobBackend(
+        workers=int(os.environ.get("ECHOLOGIA_JOB_WORKERS", 0)) or None,
+        max_queue=int(os.environ.get("ECHOLOGIA_JOB_QUEUE_SIZE", 16)),
+    ),
+}
+
+_backend: JobBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_job_backend() -> JobBackend:
+    """The process-wide job backend, selected by ECHOLOGIA_JOB_BACKEND (default: local)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.environ.get("ECHOLOGIA_JOB_BACKEND", "local")
+                if name not in JOB_BACKENDS:
+                    raise RuntimeError(f"Unknown job backend '{name}'. Available: {sorted(JOB_BACKENDS)}")
+                _backend = JOB_BACKENDS[name]()
+    return _backend
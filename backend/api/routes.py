@@ -1,9 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import os
 import sys
 from pathlib import Path
-import shutil
 from typing import Dict, Any
 
 # Add whisper_shit to path
@@ -11,16 +12,26 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
 
 from processor import (
     process_audio_to_personas,
-    transcribe_audio_simple,
-    diarize_with_pyannote
+    transcribe_cached,
+    diarize_cached
 )
+from result_cache import get_result_cache
+from speaker_index import get_speaker_index
+from governor import get_governor
+from analytics import speaker_analytics
+from model_registry import registry
+from instrumentation import (
+    MODEL_LOADED, MODEL_LOAD_SECONDS, MODEL_MEMORY_MB, QUEUE_DEPTH, render_metrics
+)
+from streaming import process_audio_windowed, to_ndjson, to_sse, WINDOW_SEC, OVERLAP_SEC
+from multi_file import process_files
+from incremental import process_audio_append, get_session_store
+from live import LiveSession, STEP_SEC
+from .jobs import get_job_backend, QueueFullError, JobNotFoundError, DONE, FAILED, CANCELLED
+from .uploads import spool_upload
 
 router = APIRouter(prefix="/api/audio", tags=["audio"])
 
-# Directory for uploaded files
-UPLOAD_DIR = Path(__file__).parent.parent / "uploads"
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 
 @router.post("/process")
 async def process_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
@@ -30,21 +41,13 @@ async def process_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
     Returns:
         JSON with segments, personas, age/gender, and speaker names
     """
-    # Validate file type
-    if not file.filename.endswith(('.mp3', '.wav', '.m4a', '.flac', '.ogg')):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid file format. Supported: mp3, wav, m4a, flac, ogg"
-        )
-    
-    # Save uploaded file
-    file_path = UPLOAD_DIR / file.filename
+    # Stream the upload to a per-request scratch file, hashing as it arrives
+    upload = await spool_upload(file)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process the audio
-        result = process_audio_to_personas(str(file_path))
+        # Process the audio off the event loop
+        result = await run_in_threadpool(
+            process_audio_to_personas, str(upload.path), audio_hash=upload.sha256
+        )
         
         return result
         
@@ -53,8 +56,7 @@ async def process_audio(file: UploadFile = File(...)) -> Dict[str, Any]:
     
     finally:
         # Clean up uploaded file
-        if file_path.exists():
-            file_path.unlink()
+        upload.cleanup()
 
 
 @router.post("/transcribe")
@@ -65,31 +67,21 @@ async def transcribe_only(file: UploadFile = File(...)) -> Dict[str, Any]:
     Returns:
         Transcription segments with timestamps
     """
-    if not file.filename.endswith(('.mp3', '.wav', '.m4a', '.flac', '.ogg')):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid file format. Supported: mp3, wav, m4a, flac, ogg"
-        )
-    
-    file_path = UPLOAD_DIR / file.filename
+    upload = await spool_upload(file)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        segments, info = transcribe_audio_simple(str(file_path))
+        asr = await run_in_threadpool(transcribe_cached, str(upload.path), upload.sha256)
         
         return {
-            "language": info.language,
-            "segments": segments,
-            "total_segments": len(segments)
+            "language": asr["language"],
+            "segments": asr["segments"],
+            "total_segments": len(asr["segments"])
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
     
     finally:
-        if file_path.exists():
-            file_path.unlink()
+        upload.cleanup()
 
 
 @router.post("/diarize")
@@ -103,29 +95,18 @@ async def diarize_only(file: UploadFile = File(...), num_speakers: int = 2) -> D
     Returns:
         Speaker segments with timestamps
     """
-    if not file.filename.endswith(('.mp3', '.wav', '.m4a', '.flac', '.ogg')):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid file format. Supported: mp3, wav, m4a, flac, ogg"
-        )
-    
-    file_path = UPLOAD_DIR / file.filename
+    upload = await spool_upload(file)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        diar_segments = diarize_with_pyannote(str(file_path), num_speakers=num_speakers)
+        diar_segments = await run_in_threadpool(diarize_cached, str(upload.path), upload.sha256, num_speakers)
         
-        # Calculate speaking times
-        speaker_times = {}
-        for seg in diar_segments:
-            spk = seg["speaker_id"]
-            duration = seg["end"] - seg["start"]
-            speaker_times[spk] = speaker_times.get(spk, 0) + duration
+        # Overlap-aware speaking times, turns and interruptions
+        analytics = speaker_analytics(diar_segments)
+        speaker_times = {spk: round(st["talk_time_sec"], 2) for spk, st in analytics.items()}
         
         return {
             "segments": diar_segments,
             "speaker_times": speaker_times,
+            "analytics": analytics,
             "num_speakers": len(speaker_times)
         }
         
@@ -133,11 +114,336 @@ async def diarize_only(file: UploadFile = File(...), num_speakers: int = 2) -> D
         raise HTTPException(status_code=500, detail=f"Diarization failed: {str(e)}")
     
     finally:
-        if file_path.exists():
-            file_path.unlink()
+        upload.cleanup()
+
+
+@router.post("/stream")
+async def stream_audio(
+    file: UploadFile = File(...),
+    format: str = "ndjson",
+    window_sec: float = WINDOW_SEC,
+    overlap_sec: float = OVERLAP_SEC,
+    num_speakers: int | None = None
+):
+    """
+    Long-recording mode: process the upload in overlapping windows and stream
+    results as they are produced
+    
+    Args:
+        format: "ndjson" (one JSON event per line) or "sse" (server-sent events)
+        window_sec: Length of each processing window
+        overlap_sec: Overlap used to keep speaker IDs stable across windows
+        num_speakers: Speakers per window if known (default: detect)
+    
+    Returns:
+        start, segment, progress and a final summary event
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    if not 0 <= overlap_sec < window_sec:
+        raise HTTPException(status_code=400, detail="overlap_sec must be between 0 and window_sec")
+    
+    upload = await spool_upload(file)
+    events = process_audio_windowed(str(upload.path), window_sec, overlap_sec, num_speakers)
+    if format == "sse":
+        body, media_type = to_sse(events), "text/event-stream"
+    else:
+        body, media_type = to_ndjson(events), "application/x-ndjson"
+    
+    # The sync generator runs in the threadpool; the scratch file goes once the stream ends
+    return StreamingResponse(body, media_type=media_type, background=BackgroundTask(upload.cleanup))
+
+
+@router.post("/batch")
+async def batch_audio(
+    files: list[UploadFile] = File(...),
+    format: str = "ndjson",
+    num_speakers: int | None = None
+):
+    """
+    Many recordings in one request: decoded in parallel, with Whisper and the
+    voice models run over batches that mix segments of several files
+    
+    Args:
+        format: "ndjson" (one JSON event per line) or "sse" (server-sent events)
+        num_speakers: Speakers per recording if known (default: detect)
+    
+    Returns:
+        a start event, one file event per recording as it finishes and a summary
+        with the aggregate throughput (audio_hours_per_hour)
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    
+    uploads = []
+    try:
+        for file in files:
+            uploads.append((file.filename, await spool_upload(file)))
+    except BaseException:
+        for _, upload in uploads:
+            upload.cleanup()
+        raise
+    
+    def cleanup():
+        for _, upload in uploads:
+            upload.cleanup()
+    
+    events = process_files(
+        [{"path": str(upload.path), "name": name, "audio_hash": upload.sha256} for name, upload in uploads],
+        num_speakers,
+    )
+    if format == "sse":
+        body, media_type = to_sse(events), "text/event-stream"
+    else:
+        body, media_type = to_ndjson(events), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, background=BackgroundTask(cleanup))
+
+
+@router.websocket("/live")
+async def live_audio(
+    websocket: WebSocket,
+    dtype: str = "int16",
+    step_sec: float = STEP_SEC,
+    num_speakers: int | None = None
+):
+    """
+    Live mode: the client sends 16 kHz mono PCM as binary frames (int16 by
+    default, or float32 with ?dtype=float32) and a text frame "stop" at the end
+    
+    Sends JSON events back:
+        partial   current hypothesis for the not-yet-final tail
+        final     a finished segment with a stable speaker_id
+        done      after "stop", with speech seconds per speaker
+    
+    Every event has audio_end (stream seconds it accounts for) and compute_ms.
+    """
+    await websocket.accept()
+    if dtype not in ("int16", "float32"):
+        await websocket.close(code=1003, reason="dtype must be 'int16' or 'float32'")
+        return
+    
+    session = LiveSession(step_sec=step_sec, num_speakers=num_speakers)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                # Model calls block, so they run off the event loop; frames queue meanwhile
+                events = await run_in_threadpool(session.feed, message["bytes"], dtype)
+            elif (message.get("text") or "").strip().lower() == "stop":
+                events = await run_in_threadpool(session.flush)
+            else:
+                continue
+            for event in events:
+                await websocket.send_json(event)
+            if events and events[-1]["type"] == "done":
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+
+
+@router.post("/sessions/{session_key}/append")
+async def append_audio(
+    session_key: str,
+    file: UploadFile = File(...),
+    num_speakers: int | None = None,
+    final: bool = False
+) -> Dict[str, Any]:
+    """
+    Append mode for a recording that keeps growing: upload the whole recording
+    so far under the same session_key each time; only the audio after the
+    last update (plus an overlap) is processed
+    
+    Args:
+        num_speakers: Speakers per update if known (default: detect); fixed by the first update
+        final: The recording is complete, so the tail is committed too
+    
+    Returns:
+        Personas for the whole recording so far, with stable speaker IDs, and the
+        segments this update found; meta.append describes what it processed, and
+        meta.append.segment_cursor is where its committed segments start in
+        /sessions/{session_key}/segments
+    """
+    upload = await spool_upload(file)
+    try:
+        return await run_in_threadpool(process_audio_append, session_key, str(upload.path), num_speakers, final)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+    finally:
+        upload.cleanup()
+
+
+@router.get("/sessions/{session_key}")
+async def session_status(session_key: str) -> Dict[str, Any]:
+    """Progress of an append-mode session"""
+    try:
+        info = get_session_store().describe(session_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_key}")
+    return info
+
+
+@router.get("/sessions/{session_key}/segments")
+async def session_segments(session_key: str, since: int = 0) -> Dict[str, Any]:
+    """Committed segments of an append-mode session, from index `since` on"""
+    store = get_session_store()
+    try:
+        state = store.load(session_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_key}")
+    segments = await run_in_threadpool(store.segments, session_key, state, max(0, since))
+    return {"session_key": session_key, "since": since, "next": state["segment_count"], "segments": segments}
+
+
+@router.delete("/sessions/{session_key}")
+async def delete_session(session_key: str) -> Dict[str, Any]:
+    """Forget an append-mode session; the next upload under its key starts over"""
+    try:
+        deleted = await run_in_threadpool(get_session_store().delete, session_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_key}")
+    return {"session_key": session_key, "deleted": True}
+
+
+@router.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)) -> Dict[str, Any]:
+    """
+    Queue the complete pipeline for an upload and return immediately
+    
+    Returns:
+        Job ID and status; poll /jobs/{job_id} and fetch /jobs/{job_id}/result
+    """
+    backend = get_job_backend()
+    # The scratch file outlives this request; the job removes it when done
+    upload = await spool_upload(file)
+    try:
+        job_id = backend.submit(
+            process_audio_to_personas,
+            str(upload.path),
+            audio_hash=upload.sha256,
+            cleanup=upload.cleanup
+        )
+    except QueueFullError as e:
+        upload.cleanup()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    
+    return backend.status(job_id)
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict[str, Any]:
+    """Current state of a queued job"""
+    try:
+        return get_job_backend().status(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """
+    Result of a finished job
+    
+    Returns:
+        200 with the pipeline output, 202 while the job is still queued or running
+    """
+    backend = get_job_backend()
+    try:
+        status = backend.status(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    
+    if status["status"] == DONE:
+        return backend.result(job_id)
+    if status["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Processing failed: {status['error']}")
+    if status["status"] == CANCELLED:
+        raise HTTPException(status_code=410, detail="Job was cancelled")
+    return JSONResponse(status_code=202, content=status)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued job; a running job finishes but its result is discarded"""
+    try:
+        return get_job_backend().cancel(job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
 
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "audio-processing-api"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "service": "audio-processing-api",
+        "queue_depth": get_job_backend().depth()
+    }
+
+
+@router.get("/health/live")
+async def liveness():
+    """Liveness: the process is up and serving, whether or not the models are loaded"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Readiness: 200 once the models the startup warm-up asked for are loaded,
+    503 while they are still loading or if one failed
+    
+    Returns:
+        ready flag, models still pending and each model's state
+    """
+    state = registry.readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+@router.get("/cache")
+async def cache_status():
+    """Result cache size and hit/miss counters per stage"""
+    cache = get_result_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@router.get("/speakers")
+async def speaker_index_status():
+    """Enrolled voices in the cross-session speaker index"""
+    index = get_speaker_index()
+    return index.stats() if index is not None else {"enabled": False}
+
+
+@router.get("/governor")
+async def governor_status():
+    """CPU budget, heavy-stage slots and what is running or waiting for one"""
+    return get_governor().stats()
+
+
+@router.get("/models")
+async def model_status():
+    """Load time, warm-up time and memory per shared model"""
+    return registry.stats()
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus-style stage timings, queue depth and model state"""
+    QUEUE_DEPTH.set(get_job_backend().depth())
+    for name, stats in registry.stats().items():
+        MODEL_LOADED.set(1 if stats["loaded"] else 0, model=name)
+        if stats["load_time_sec"] is not None:
+            MODEL_LOAD_SECONDS.set(stats["load_time_sec"], model=name)
+        if stats["memory_mb"] is not None:
+            MODEL_MEMORY_MB.set(stats["memory_mb"], model=name)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
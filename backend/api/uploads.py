@@ -0,0 +1,87 @@
+"""
+Upload ingestion.
+
+Uploads are streamed in fixed-size chunks into a unique scratch file per
+request and hashed as the bytes arrive, so the content hash needed by the
+result cache is ready the moment the last chunk lands and the decoder can
+start on the spool immediately. A configurable size limit rejects oversized
+uploads without buffering them.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+SUPPORTED_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg')
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_MB = float(os.environ.get("ECHOLOGIA_MAX_UPLOAD_MB", 1024))
+
+UPLOAD_DIR = Path(__file__).parent.parent / "uploads"
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+
+class SpooledUpload:
+    """An upload written to its own scratch file, with its SHA-256 and size."""
+
+    def __init__(self, path: Path, sha256: str, size: int):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+
+    def cleanup(self):
+        self.path.unlink(missing_ok=True)
+
+
+def check_format(filename: str | None):
+    """400 unless the filename has a supported audio extension."""
+    if not filename or not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file format. Supported: mp3, wav, m4a, flac, ogg"
+        )
+
+
+async def spool_chunks(chunks: AsyncIterator[bytes], suffix: str, max_bytes: int | None = None) -> SpooledUpload:
+    """
+    Write an async stream of byte chunks to a unique file in UPLOAD_DIR, hashing as it goes.
+    Raises 413 (and removes the partial file) once `max_bytes` is exceeded.
+    """
+    max_bytes = int(MAX_UPLOAD_MB * 1024 * 1024) if max_bytes is None else max_bytes
+    fd, name = tempfile.mkstemp(dir=UPLOAD_DIR, prefix="upload_", suffix=suffix)
+    path = Path(name)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit"
+                    )
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return SpooledUpload(path, digest.hexdigest(), size)
+
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def spool_upload(file: UploadFile, max_bytes: int | None = None) -> SpooledUpload:
+    """Validate and spool a multipart upload; see spool_chunks."""
+    check_format(file.filename)
+    return await spool_chunks(_iter_upload(file), Path(file.filename).suffix.lower(), max_bytes)
@@ -0,0 +1,150 @@
+"""
+Benchmark: age/gender inference backends (eager fp32, int8, TorchScript).
+
+Runs predict_speaker_age_gender on the same audio and turns once per backend
+(AGE_GENDER_BACKEND) and reports for each:
+    load_sec        loading plus preparing the backend (quantizing, tracing)
+    wall_sec / rtf  median inference time over --repeat runs, and / audio seconds
+    peak_rss_mb     highest resident memory while the backend ran
+    max_age_diff    largest per-speaker age difference from eager, in years
+    max_gender_diff largest per-speaker gender probability difference from eager
+    labels_agree    every speaker gets the same sex and age labels as with eager
+The audio is a synthetic conversation with its ground-truth turns, or --audio
+(a real recording) diarized by the configured diarization model. With
+--models stub, a tiny randomly initialised model stands in for wav2vec2 and
+the parity numbers only show that the backends compute the same function.
+
+Exits 1 if a backend fails the parity tolerances of age_gender_model.py.
+
+Usage:
+    python backend/benchmarks/bench_age_gender_backends.py --models stub --duration 120
+    python backend/benchmarks/bench_age_gender_backends.py --audio demo-audio.mp3 --json backends.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
+
+from bench_pipeline import PeakRSS
+from model_registry import AGE_GENDER_BACKENDS, age_gender_description, configure_age_gender, registry
+
+SAMPLE_RATE = 16000
+
+
+def load_audio(args):
+    from audio_buffer import AudioBuffer, decode_audio
+
+    if args.audio:
+        from processor import diarize_with_pyannote
+
+        buffer = decode_audio(args.audio)
+        return buffer, diarize_with_pyannote(buffer, num_speakers=args.speakers)
+    from synthetic_audio import synthesize_conversation
+
+    samples, turns = synthesize_conversation(args.duration, args.speakers, args.seed)
+    return AudioBuffer(samples, SAMPLE_RATE), turns
+
+
+def run_backend(backend: str, buffer, turns: list[dict], speakers: list[str], repeat: int) -> tuple[dict, dict]:
+    from age_gender_estimation import age_gender_attributes, predict_speaker_age_gender
+
+    configure_age_gender(backend=backend)
+    t0 = time.perf_counter()
+    registry.get("age_gender")
+    load_sec = time.perf_counter() - t0
+
+    walls, peaks = [], []
+    predictions = {}
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            t1 = time.perf_counter()
+            predictions = predict_speaker_age_gender(buffer.samples, buffer.sample_rate, turns, speakers)
+            walls.append(time.perf_counter() - t1)
+        peaks.append(rss.peak)
+    wall = statistics.median(walls)
+    stats = {
+        **age_gender_description(),
+        "load_sec": round(load_sec, 2),
+        "wall_sec": round(wall, 4),
+        "rtf": round(wall / buffer.duration, 5),
+        "peak_rss_mb": round(max(peaks), 1),
+        "labels": {spk: age_gender_attributes(p) for spk, p in predictions.items()},
+    }
+    return stats, predictions
+
+
+def parity_vs(reference: dict, predictions: dict) -> dict:
+    """Per-speaker differences from the eager predictions."""
+    age_diff = max((abs(predictions[s]["age_years"] - r["age_years"]) for s, r in reference.items() if s in predictions), default=0.0)
+    gender_diff = max(
+        (max(abs(a - b) for a, b in zip(predictions[s]["gender_probs"], r["gender_probs"])) for s, r in reference.items() if s in predictions),
+        default=0.0,
+    )
+    return {"max_age_diff": round(age_diff, 3), "max_gender_diff": round(gender_diff, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="Benchmark a real recording instead of synthetic audio")
+    parser.add_argument("--duration", type=float, default=120.0, help="Synthetic audio length in seconds")
+    parser.add_argument("--speakers", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=("real", "stub"), default="real")
+    parser.add_argument("--backends", nargs="+", choices=AGE_GENDER_BACKENDS, default=list(AGE_GENDER_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    if args.models == "stub":
+        from stub_models import register_stub_models
+        register_stub_models(registry)
+
+    from age_gender_model import AGE_TOLERANCE_YEARS, GENDER_TOLERANCE
+
+    buffer, turns = load_audio(args)
+    speakers = sorted({t["speaker_id"] for t in turns})
+    print(f"🎧 {buffer.duration:.0f}s, {len(speakers)} speakers, models={args.models}, threads={os.cpu_count()}")
+
+    # Eager first: it is the reference for parity
+    backends = ["eager"] + [b for b in args.backends if b != "eager"]
+    results, reference = {}, None
+    for backend in backends:
+        print(f"⏱️  {backend}...")
+        stats, predictions = run_backend(backend, buffer, turns, speakers, args.repeat)
+        if reference is None:
+            reference = predictions
+        stats.update(parity_vs(reference, predictions))
+        eager_labels = results.get("eager", stats)["labels"]
+        stats["labels_agree"] = all(
+            stats["labels"].get(s, {}).get("sex", {}).get("label") == l["sex"]["label"]
+            and stats["labels"].get(s, {}).get("age", {}).get("label") == l["age"]["label"]
+            for s, l in eager_labels.items()
+        )
+        results[backend] = stats
+
+    eager = results["eager"]
+    print(f"\n{'backend':<13}{'in use':<13}{'load s':>8}{'wall s':>9}{'RTF':>9}{'speedup':>9}{'peak MB':>9}{'age Δy':>8}{'gender Δ':>10}{'labels':>8}")
+    failures = []
+    for backend, st in results.items():
+        speedup = eager["wall_sec"] / st["wall_sec"] if st["wall_sec"] else float("inf")
+        print(f"{backend:<13}{st['backend']:<13}{st['load_sec']:>8.2f}{st['wall_sec']:>9.3f}{st['rtf']:>9.4f}{speedup:>8.2f}x"
+              f"{st['peak_rss_mb']:>9.0f}{st['max_age_diff']:>8.2f}{st['max_gender_diff']:>10.4f}{'same' if st['labels_agree'] else 'DIFF':>8}")
+        if st["max_age_diff"] > AGE_TOLERANCE_YEARS or st["max_gender_diff"] > GENDER_TOLERANCE:
+            failures.append(backend)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"duration_sec": round(buffer.duration, 2), "results": results}, indent=2))
+        print(f"\n💾 Results saved to {args.json}")
+    if failures:
+        print(f"\n❌ Outside parity tolerance ({AGE_TOLERANCE_YEARS} years, {GENDER_TOLERANCE} gender prob): {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark: faster-whisper speed/accuracy sweep.
+
+Transcribes the bundled demo recording (or --audio) under every combination of
+model size, compute type, decoding (greedy vs beam), batch size and word
+timestamps on or off. For each
+one it reports the real-time factor, words per second and the word error rate
+against a reference. The reference is --reference-text if given; otherwise it
+is the transcript of the slowest, most careful configuration in the sweep
+(largest model, widest beam, sequential). Use the table to pick the
+WHISPER_* settings for the hardware at hand. The cost of word timestamps
+(Whisper's cross-attention alignment) is summarised as the extra ASR time
+relative to the same configuration without them.
+
+The speech regions come from the pipeline's own VAD, so every configuration
+decodes exactly what the service would.
+
+Usage:
+    python backend/benchmarks/bench_asr_sweep.py
+    python backend/benchmarks/bench_asr_sweep.py --sizes tiny base small --beams 1 5 --batches 0 8 16 --json sweep.json
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
+
+from audio_buffer import decode_audio
+from model_registry import asr_description, configure_asr, registry
+from processor import transcribe_audio_simple
+from vad import detect_speech
+
+DEFAULT_AUDIO = Path(__file__).parent.parent / "whisper_shit" / "demo-audio.mp3"
+SIZE_ORDER = ["tiny", "base", "small", "medium", "large-v2", "large-v3"]
+
+
+def words(text: str) -> list[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+def word_error_rate(reference: list[str], hypothesis: list[str]) -> float:
+    """Levenshtein distance over words, divided by the reference length."""
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    prev = list(range(len(hypothesis) + 1))
+    for i, r in enumerate(reference, 1):
+        cur = [i] + [0] * len(hypothesis)
+        for j, h in enumerate(hypothesis, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(reference)
+
+
+def care(result: dict) -> tuple:
+    """Sort key: bigger model, wider beam, sequential decoding, higher precision rank higher."""
+    size = result["name"].removeprefix("faster-whisper-")
+    return (
+        SIZE_ORDER.index(size) if size in SIZE_ORDER else -1,
+        result["beam_size"],
+        result["batch_size"] is None,
+        result["compute_type"] != "int8",
+        result["word_timestamps"],
+    )
+
+
+def run_config(buffer, regions, size: str, compute_type: str, beam: int, batch: int, word_ts: bool, repeat: int) -> dict:
+    configure_asr(model_size=size, compute_type=compute_type, beam_size=beam, batch_size=batch, word_timestamps=word_ts)
+    registry.get("whisper")  # load and warm up outside the timing
+    walls = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        segments, _ = transcribe_audio_simple(buffer, regions)
+        walls.append(time.perf_counter() - t0)
+    wall = min(walls)
+    text = " ".join(s["text"] for s in segments)
+    return {
+        **asr_description(),
+        "wall_sec": round(wall, 3),
+        "rtf": round(wall / buffer.duration, 4),
+        "words": len(words(text)),
+        "words_per_sec": round(len(words(text)) / wall, 1) if wall else None,
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=str(DEFAULT_AUDIO))
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "base", "small"])
+    parser.add_argument("--compute-types", nargs="+", default=["int8"])
+    parser.add_argument("--beams", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--batches", nargs="+", type=int, default=[0, 8, 16], help="0 = sequential")
+    parser.add_argument("--word-timestamps", nargs="+", type=int, default=[0, 1], help="1 = on, 0 = off")
+    parser.add_argument("--repeat", type=int, default=2, help="Best of N runs per configuration")
+    parser.add_argument("--reference-text", help="File with the reference transcript")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    buffer = decode_audio(args.audio)
+    regions = detect_speech(buffer.samples, buffer.sample_rate)
+    print(f"🎧 {Path(args.audio).name}: {buffer.duration:.0f}s, {regions.speech_sec:.0f}s speech, "
+          f"cpu_threads={asr_description()['cpu_threads']}")
+
+    configs = list(itertools.product(args.sizes, args.compute_types, args.beams, args.batches, args.word_timestamps))
+    results = []
+    for size, compute_type, beam, batch, word_ts in configs:
+        print(f"⏱️  {size} {compute_type} beam={beam} batch={batch or '-'} words={'on' if word_ts else 'off'}")
+        try:
+            results.append(run_config(buffer, regions, size, compute_type, beam, batch, bool(word_ts), args.repeat))
+        except Exception as e:
+            print(f"⚠️  Skipped: {e}")
+
+    if not results:
+        print("❌ No configuration could run")
+        sys.exit(1)
+
+    if args.reference_text:
+        reference = words(Path(args.reference_text).read_text())
+        ref_name = Path(args.reference_text).name
+    else:
+        best = max(results, key=care)
+        reference = words(best["text"])
+        ref_name = f"{best['name']} {best['compute_type']} beam={best['beam_size']} batch={best['batch_size'] or '-'}"
+    for r in results:
+        r["wer"] = round(word_error_rate(reference, words(r["text"])), 4)
+
+    print(f"\nReference: {ref_name}")
+    print(f"{'model':<24}{'compute':<10}{'beam':>5}{'batch':>7}{'word ts':>9}{'RTF':>9}{'words/s':>9}{'WER':>8}")
+    for r in sorted(results, key=lambda r: r["rtf"]):
+        print(f"{r['name']:<24}{r['compute_type']:<10}{r['beam_size']:>5}{r['batch_size'] or '-':>7}"
+              f"{'on' if r['word_timestamps'] else 'off':>9}{r['rtf']:>9.4f}{r['words_per_sec']:>9}{100 * r['wer']:>7.1f}%")
+
+    # Alignment overhead: same configuration with and without word timestamps
+    base = {(r["name"], r["compute_type"], r["beam_size"], r["batch_size"]): r for r in results if not r["word_timestamps"]}
+    overheads = []
+    for r in results:
+        other = base.get((r["name"], r["compute_type"], r["beam_size"], r["batch_size"]))
+        if r["word_timestamps"] and other and other["wall_sec"]:
+            overheads.append(r["wall_sec"] / other["wall_sec"] - 1)
+    if overheads:
+        overheads.sort()
+        print(f"\nWord timestamps add {100 * overheads[len(overheads) // 2]:.0f}% to ASR time "
+              f"(median of {len(overheads)} configurations, max {100 * overheads[-1]:.0f}%)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"audio": args.audio, "reference": ref_name, "results": results}, indent=2))
+        print(f"\n💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: throughput of concurrent pipeline runs, with and without the CPU governor.
+
+Runs --jobs copies of the pipeline at once on threads (as the API's job
+backend does) for each concurrency level, once with the governor on and once
+with it off (ECHOLOGIA_GOVERNOR=0 behaviour: every stage sizes its own
+threads), and reports for each:
+    wall_sec        time until the last of the concurrent runs finished
+    audio_per_sec   seconds of audio processed per wall second, over all runs
+    mean_latency    mean time from start to result of one run
+    peak_rss_mb     highest resident memory while the runs were going
+    stage_wait_sec  total time heavy stages waited for a governor slot
+The audio is synthetic (or --audio), every run gets its own copy, and the
+result cache and speaker index are off. With --models stub, only the torch
+parts (the tiny age/gender model, pyannote's stand-in is numpy) respond to
+thread counts, so the difference between the two modes is small; it is
+meant for the real models.
+
+Usage:
+    python backend/benchmarks/bench_concurrency.py --models stub --duration 60
+    python backend/benchmarks/bench_concurrency.py --audio demo-audio.mp3 --jobs 1 2 4 8 --json concurrency.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
+
+from bench_pipeline import PeakRSS, load_audio
+from governor import get_governor
+from model_registry import registry
+
+
+def run_level(buffer, jobs: int, num_speakers: int) -> dict:
+    """`jobs` pipeline runs started together; each gets its own copy of the audio."""
+    from audio_buffer import AudioBuffer
+    from processor import _process_buffer
+
+    governor = get_governor()
+    waited_before = governor.wait_sec
+    buffers = [AudioBuffer(buffer.samples.copy(), buffer.sample_rate) for _ in range(jobs)]
+
+    def one(i: int) -> float:
+        t0 = time.perf_counter()
+        _process_buffer(buffers[i], f"bench-concurrency-{i}", num_speakers)
+        return time.perf_counter() - t0
+
+    with PeakRSS() as rss:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            latencies = list(pool.map(one, range(jobs)))
+        wall = time.perf_counter() - t0
+    return {
+        "jobs": jobs,
+        "wall_sec": round(wall, 3),
+        "audio_per_sec": round(jobs * buffer.duration / wall, 2),
+        "mean_latency_sec": round(statistics.mean(latencies), 3),
+        "peak_rss_mb": round(rss.peak, 1),
+        "stage_wait_sec": round(governor.wait_sec - waited_before, 3),
+    }
+
+
+def set_governor(enabled: bool):
+    """Switch the governor and reload Whisper, whose thread count is fixed at load."""
+    get_governor().configure(enabled=enabled)
+    registry.unload("whisper")
+    if not enabled:
+        # Back to what the libraries pick on their own
+        import torch
+        torch.set_num_threads(os.cpu_count() or 1)
+    registry.get("whisper")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="Benchmark a real recording instead of synthetic audio")
+    parser.add_argument("--duration", type=float, default=60.0, help="Synthetic audio length in seconds")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=("real", "stub"), default="real")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8], help="Concurrency levels")
+    parser.add_argument("--json", help="Also write the results here")
+    args = parser.parse_args()
+
+    # Names don't affect the timing; keep the runs offline
+    os.environ["ECHOLOGIA_LLM_BACKEND"] = "stub"
+    if args.models == "stub":
+        from stub_models import register_stub_models
+        register_stub_models(registry)
+
+    buffer, source = load_audio(args)
+    registry.warm_up()
+    governor = get_governor()
+    print(f"🎧 {source} ({buffer.duration:.0f}s), models={args.models}, "
+          f"budget={governor.budget} cores, {governor.max_stages} slots x {governor.stage_threads} threads")
+
+    results = {}
+    for mode, enabled in (("governor", True), ("ungoverned", False)):
+        set_governor(enabled)
+        # One untimed run so both modes start warm
+        run_level(buffer, 1, args.speakers)
+        results[mode] = []
+        for jobs in args.jobs:
+            print(f"⏱️  {mode}, {jobs} concurrent job(s)...")
+            results[mode].append(run_level(buffer, jobs, args.speakers))
+    set_governor(True)
+
+    print(f"\n{'jobs':>5}{'governed a/s':>14}{'ungoverned a/s':>16}{'speedup':>9}"
+          f"{'gov latency':>13}{'ungov latency':>15}{'gov peak MB':>13}{'ungov peak MB':>15}{'slot wait s':>13}")
+    for gov, ungov in zip(results["governor"], results["ungoverned"]):
+        speedup = gov["audio_per_sec"] / ungov["audio_per_sec"] if ungov["audio_per_sec"] else float("inf")
+        print(f"{gov['jobs']:>5}{gov['audio_per_sec']:>14.1f}{ungov['audio_per_sec']:>16.1f}{speedup:>8.2f}x"
+              f"{gov['mean_latency_sec']:>13.2f}{ungov['mean_latency_sec']:>15.2f}"
+              f"{gov['peak_rss_mb']:>13.0f}{ungov['peak_rss_mb']:>15.0f}{gov['stage_wait_sec']:>13.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "source": source,
+            "duration_sec": round(buffer.duration, 2),
+            "governor": get_governor().stats(),
+            "results": results,
+        }, indent=2))
+        print(f"\n💾 Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
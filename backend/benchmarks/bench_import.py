@@ -0,0 +1,134 @@
+"""
+Benchmark: import time of the API and pipeline entry points.
+
+Each module is imported in a fresh interpreter (so nothing is already in
+sys.modules) and reports:
+    import_sec   median time of the import itself over --repeat runs
+    heavy        heavy dependencies (torch, librosa, ...) the import pulled in
+
+The heavy dependencies should load per stage, when a model or the decoder is
+first used, never at import; any of them showing up is always a regression.
+Results can be saved as a JSON baseline and compared against it, like
+bench_pipeline.py.
+
+Usage:
+    python backend/benchmarks/bench_import.py --save
+    python backend/benchmarks/bench_import.py --compare
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+BASELINE_PATH = Path(__file__).parent / "baselines" / "import.json"
+TARGETS = ["api.app", "processor", "streaming", "live", "batch"]
+HEAVY_MODULES = ["torch", "torchaudio", "transformers", "librosa", "faster_whisper", "ctranslate2", "pyannote", "openai"]
+# Differences below this floor are noise, whatever the relative change
+MIN_DELTA_SEC = 0.05
+
+_PROBE = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+importlib.import_module(sys.argv[1])
+sec = time.perf_counter() - t0
+print(json.dumps({"sec": sec, "heavy": sorted(m for m in sys.argv[2:] if m in sys.modules)}))
+"""
+
+
+def probe(module: str) -> dict:
+    """Import `module` in a fresh interpreter and return its import time and heavy imports."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(BACKEND_DIR), str(BACKEND_DIR / "whisper_shit"), env.get("PYTHONPATH", "")])
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE, module, *HEAVY_MODULES],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip()}")
+    # The module may print while importing; the probe's JSON is the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int) -> dict:
+    modules = {}
+    for module in TARGETS:
+        print(f"⏱️  import {module}...")
+        runs = [probe(module) for _ in range(repeat)]
+        modules[module] = {
+            "import_sec": round(statistics.median(r["sec"] for r in runs), 4),
+            "heavy": runs[-1]["heavy"],
+        }
+    return {
+        "created": datetime.now().isoformat(),
+        "repeat": repeat,
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "modules": modules,
+    }
+
+
+def compare(current: dict, baseline: dict | None, tolerance: float) -> list[str]:
+    """Human-readable regressions; heavy imports count even without a baseline."""
+    regressions = []
+    for name, now in current["modules"].items():
+        if now["heavy"]:
+            regressions.append(f"{name}: imports {', '.join(now['heavy'])} at import time")
+        before = (baseline or {}).get("modules", {}).get(name)
+        if before is None:
+            continue
+        if now["import_sec"] > before["import_sec"] * (1 + tolerance) and now["import_sec"] - before["import_sec"] > MIN_DELTA_SEC:
+            regressions.append(f"{name}: {before['import_sec']}s -> {now['import_sec']}s")
+    return regressions
+
+
+def print_table(result: dict, baseline: dict | None = None):
+    print(f"\n{'module':<16}{'import s':>10}{'base s':>10}  heavy")
+    for name, st in result["modules"].items():
+        base = (baseline or {}).get("modules", {}).get(name)
+        base_sec = f"{base['import_sec']:>10.3f}" if base else f"{'-':>10}"
+        print(f"{name:<16}{st['import_sec']:>10.3f}{base_sec}  {', '.join(st['heavy']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help=f"Baseline file (default: {BASELINE_PATH.relative_to(BACKEND_DIR)})")
+    parser.add_argument("--save", action="store_true", help="Write the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_PATH
+    baseline = None
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"❌ No baseline at {baseline_path}; run with --save first")
+            sys.exit(2)
+        baseline = json.loads(baseline_path.read_text())
+
+    result = run(args.repeat)
+    print_table(result, baseline)
+
+    if args.save:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2))
+        print(f"\n💾 Baseline saved to {baseline_path}")
+
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s):")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    if baseline is not None:
+        print(f"\n✅ No regressions vs {baseline_path} (tolerance {100 * args.tolerance:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
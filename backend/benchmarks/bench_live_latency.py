@@ -0,0 +1,110 @@
+"""
+Benchmark: end-to-end latency of the live WebSocket endpoint.
+
+Replays a local audio file into /api/audio/live as 16 kHz int16 PCM frames at
+real-time pace (or faster with --speed), and for every event the server sends
+back measures how long after the audio it accounts for (audio_end) was sent.
+Reports p50/p95/max latency for partial and final events against a target.
+
+Start the API first (from backend/: python -m api.app, or uvicorn api.app:app), then:
+    python backend/benchmarks/bench_live_latency.py demo-audio.mp3 --target-ms 1500
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def load_pcm16(path: str, seconds: float | None = None) -> bytes:
+    import librosa
+
+    samples, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True, duration=seconds)
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def replay(url: str, pcm: bytes, frame_ms: int, speed: float) -> tuple[list[dict], float]:
+    import websockets
+
+    frame_bytes = SAMPLE_RATE * 2 * frame_ms // 1000
+    sent_at: dict[int, float] = {}   # stream sample index at end of frame -> wall time it was sent
+    events: list[dict] = []
+
+    async with websockets.connect(url, max_size=None) as ws:
+        async def sender():
+            t0 = time.perf_counter()
+            for i in range(0, len(pcm), frame_bytes):
+                frame = pcm[i:i + frame_bytes]
+                # Pace frames as a microphone would deliver them
+                due = t0 + (i / 2 / SAMPLE_RATE) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await ws.send(frame)
+                sent_at[(i + len(frame)) // 2] = time.perf_counter()
+            await ws.send("stop")
+
+        async def receiver():
+            async for message in ws:
+                event = json.loads(message)
+                event["_received"] = time.perf_counter()
+                events.append(event)
+                if event["type"] == "done":
+                    break
+
+        started = time.perf_counter()
+        await asyncio.gather(sender(), receiver())
+        wall = time.perf_counter() - started
+
+    # Latency = received time minus the moment the newest audio it covers had been sent
+    marks = np.array(sorted(sent_at))
+    for event in events:
+        idx = int(round(event["audio_end"] * SAMPLE_RATE))
+        k = min(int(np.searchsorted(marks, idx)), len(marks) - 1)
+        event["latency_ms"] = 1000 * (event["_received"] - sent_at[int(marks[k])])
+    return events, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", help="Audio file to replay")
+    parser.add_argument("--url", default="ws://localhost:8000/api/audio/live")
+    parser.add_argument("--frame-ms", type=int, default=100, help="PCM frame size sent per message")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1.0 = real time)")
+    parser.add_argument("--seconds", type=float, default=None, help="Only replay the first N seconds")
+    parser.add_argument("--target-ms", type=float, default=1500.0, help="Latency target for partials")
+    args = parser.parse_args()
+
+    pcm = load_pcm16(args.audio, args.seconds)
+    duration = len(pcm) / 2 / SAMPLE_RATE
+    print(f"🎙️  Replaying {duration:.1f}s of {args.audio} at {args.speed}x in {args.frame_ms} ms frames")
+
+    events, wall = asyncio.run(replay(args.url, pcm, args.frame_ms, args.speed))
+
+    print(f"\n{'event':<10}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'compute p50':>13}")
+    for kind in ("partial", "final"):
+        lat = [e["latency_ms"] for e in events if e["type"] == kind]
+        comp = [e["compute_ms"] for e in events if e["type"] == kind]
+        print(f"{kind:<10}{len(lat):>7}{percentile(lat, 50):>10.0f}{percentile(lat, 95):>10.0f}"
+              f"{max(lat, default=float('nan')):>10.0f}{percentile(comp, 50):>13.0f}")
+
+    done = next((e for e in events if e["type"] == "done"), {})
+    print(f"\nWall time {wall:.1f}s for {duration:.1f}s of audio; speakers: {done.get('speakers')}")
+
+    partial_p95 = percentile([e["latency_ms"] for e in events if e["type"] == "partial"], 95)
+    ok = partial_p95 <= args.target_ms
+    print(f"{'✅' if ok else '❌'} partial p95 {partial_p95:.0f} ms vs target {args.target_ms:.0f} ms")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: speaker assignment by max overlap.
+
+Compares the brute-force O(N x M) loop that assign_speakers_by_overlap used to
+run against the sorted sweep in intervals.overlap_join, on synthetic segment
+lists, and checks that both give identical speakers.
+
+Usage:
+    python backend/benchmarks/bench_overlap_join.py --sizes 10000 50000 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
+
+from intervals import overlap_join
+
+
+def naive_join(queries, diar_segments):
+    """The original nested loop, kept as the reference implementation."""
+    out = []
+    for q_start, q_end in queries:
+        best_spk = None
+        best_ov = 0.0
+        for d in diar_segments:
+            ov = max(0.0, min(q_end, d["end"]) - max(q_start, d["start"]))
+            if ov > best_ov:
+                best_ov = ov
+                best_spk = d["speaker_id"]
+        out.append(best_spk)
+    return out
+
+
+def synthetic_segments(n: int, num_speakers: int = 4, seed: int = 0):
+    """n ASR segments and n diarization turns over the same timeline, with some overlap."""
+    rng = random.Random(seed)
+    diar = []
+    t = 0.0
+    for _ in range(n):
+        dur = rng.uniform(0.5, 8.0)
+        start = max(0.0, t - rng.uniform(0.0, 0.6))  # occasional overlapping speech
+        diar.append({"start": start, "end": start + dur, "speaker_id": f"spk_{rng.randrange(num_speakers) + 1:02d}"})
+        t = start + dur + rng.uniform(0.0, 1.0)
+    total = t
+    asr = []
+    t = 0.0
+    step = total / n
+    for _ in range(n):
+        dur = rng.uniform(0.5, 2.0) * step
+        asr.append((t, t + dur))
+        t += step
+    return asr, diar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 10000, 25000, 50000, 100000])
+    parser.add_argument("--naive-max", type=int, default=5000,
+                        help="Largest size to also run (and verify against) the quadratic reference")
+    args = parser.parse_args()
+
+    print(f"{'segments':>10} {'sweep (s)':>10} {'naive (s)':>10} {'speedup':>8}  match")
+    for n in args.sizes:
+        queries, diar = synthetic_segments(n)
+
+        t0 = time.perf_counter()
+        fast = overlap_join(queries, diar)
+        fast_sec = time.perf_counter() - t0
+
+        if n <= args.naive_max:
+            t0 = time.perf_counter()
+            slow = naive_join(queries, diar)
+            naive_sec = time.perf_counter() - t0
+            print(f"{n:>10} {fast_sec:>10.3f} {naive_sec:>10.2f} {naive_sec / fast_sec:>7.0f}x  {fast == slow}")
+        else:
+            print(f"{n:>10} {fast_sec:>10.3f} {'-':>10} {'-':>8}  -")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark: per-stage wall time, real-time factor and peak memory of the pipeline.
+
+Runs each stage of the pipeline on synthetic multi-speaker audio (or a real
+file), then the whole of process_audio_to_personas, and reports for each:
+    wall_sec     median wall time over --repeat runs
+    rtf          wall_sec / audio duration (below 1.0 is faster than real time)
+    peak_rss_mb  highest resident memory while the stage ran
+    rss_delta_mb that peak minus the memory before the stage started
+
+Models are loaded and warmed before timing; their load cost is reported on its
+own. With --models stub, offline stand-ins replace Whisper, pyannote and the
+age/gender model (see stub_models.py) and speaker names come from the local
+stub LLM backend, so the suite runs without downloads or network access.
+
+Results can be saved as a JSON baseline and later compared against it. A
+stage regresses when it is slower (or uses more memory) than the baseline
+by more than the tolerance and by more than a small absolute floor.
+
+Usage:
+    python backend/benchmarks/bench_pipeline.py --models stub --duration 300 --save
+    python backend/benchmarks/bench_pipeline.py --models stub --duration 300 --compare
+    python backend/benchmarks/bench_pipeline.py --audio demo-audio.mp3 --models real --save
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Stage timings must not be served from the result cache
+os.environ["ECHOLOGIA_CACHE"] = "0"
+# Synthetic voices don't belong in the speaker index
+os.environ["ECHOLOGIA_SPEAKER_INDEX"] = "0"
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "whisper_shit"))
+
+from instrumentation import rss_mb
+from model_registry import registry
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+SAMPLE_RATE = 16000
+STAGES = [
+    "transcribe_audio_simple",
+    "diarize_with_pyannote",
+    "assign_speakers_by_overlap",
+    "split_segments_by_speaker",
+    "speaking_time_fair",
+    "estimate_age_gender_for_personas",
+    "process_audio_to_personas",
+]
+# Differences below these floors are noise, whatever the relative change
+MIN_WALL_DELTA_SEC = 0.05
+MIN_RSS_DELTA_MB = 25.0
+
+
+class PeakRSS:
+    """Samples RSS on a background thread while the block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.before = self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self.before = self.peak = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+        return False
+
+
+def measure(fn, repeat: int, duration_sec: float) -> tuple[dict, object]:
+    """Run fn `repeat` times; return its stats and the last result."""
+    walls, peaks, deltas = [], [], []
+    result = None
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            result = fn()
+            walls.append(time.perf_counter() - t0)
+        peaks.append(rss.peak)
+        deltas.append(rss.peak - rss.before)
+    wall = statistics.median(walls)
+    return {
+        "wall_sec": round(wall, 4),
+        "rtf": round(wall / duration_sec, 5),
+        "peak_rss_mb": round(max(peaks), 1),
+        "rss_delta_mb": round(max(deltas), 1),
+    }, result
+
+
+def load_audio(args) -> tuple:
+    from audio_buffer import AudioBuffer, decode_audio
+
+    if args.audio:
+        buffer = decode_audio(args.audio)
+        return buffer, f"file:{Path(args.audio).name}"
+    from synthetic_audio import synthesize_conversation
+
+    samples, _ = synthesize_conversation(args.duration, args.speakers, args.seed)
+    return AudioBuffer(samples, SAMPLE_RATE), f"synthetic:{args.duration:.0f}s:{args.speakers}spk:seed{args.seed}"
+
+
+def run(args) -> dict:
+    if args.models == "stub":
+        from stub_models import register_stub_models
+        register_stub_models(registry)
+        # Names from the local pattern matcher instead of the API
+        os.environ["ECHOLOGIA_LLM_BACKEND"] = "stub"
+
+    from age_gender_estimation import estimate_age_gender_for_personas
+    from processor import (
+        assign_speakers_by_overlap,
+        diarize_with_pyannote,
+        process_audio_to_personas,
+        speaking_time_fair,
+        split_segments_by_speaker,
+        transcribe_audio_simple,
+    )
+
+    buffer, source = load_audio(args)
+    duration = buffer.duration
+    print(f"🎧 {source} ({duration:.0f}s), models={args.models}, repeat={args.repeat}")
+
+    registry.warm_up()
+    stages = {}
+
+    def record(name, fn):
+        print(f"⏱️  {name}...")
+        stats, result = measure(fn, args.repeat, duration)
+        stages[name] = stats
+        return result
+
+    asr, _ = record("transcribe_audio_simple", lambda: transcribe_audio_simple(buffer))
+    diar = record("diarize_with_pyannote", lambda: diarize_with_pyannote(buffer, num_speakers=args.speakers))
+    record("assign_speakers_by_overlap", lambda: assign_speakers_by_overlap(asr, diar))
+    record("split_segments_by_speaker", lambda: split_segments_by_speaker(asr, diar))
+    talk = record("speaking_time_fair", lambda: speaking_time_fair(diar))
+    personas = [{"speaker_id": spk} for spk in talk]
+    record(
+        "estimate_age_gender_for_personas",
+        lambda: estimate_age_gender_for_personas(buffer.samples, buffer.sample_rate, diar, [dict(p) for p in personas]),
+    )
+    record(
+        "process_audio_to_personas",
+        lambda: process_audio_to_personas(buffer, num_speakers=args.speakers, audio_hash="benchmark"),
+    )
+
+    return {
+        "created": datetime.now().isoformat(),
+        "source": source,
+        "duration_sec": round(duration, 2),
+        "models": args.models,
+        "repeat": args.repeat,
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "model_load": registry.stats(),
+        "stages": stages,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    for name, now in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        # RTF rather than wall time, so baselines stay comparable if the duration changes
+        if now["rtf"] > before["rtf"] * (1 + tolerance) and (now["rtf"] - before["rtf"]) * current["duration_sec"] > MIN_WALL_DELTA_SEC:
+            regressions.append(f"{name}: RTF {before['rtf']} -> {now['rtf']} (+{100 * (now['rtf'] / before['rtf'] - 1):.0f}%)")
+        if now["rss_delta_mb"] > before["rss_delta_mb"] * (1 + tolerance) and now["rss_delta_mb"] - before["rss_delta_mb"] > MIN_RSS_DELTA_MB:
+            regressions.append(f"{name}: memory +{before['rss_delta_mb']} -> +{now['rss_delta_mb']} MB")
+    return regressions
+
+
+def print_table(result: dict, baseline: dict | None = None):
+    print(f"\n{'stage':<36}{'wall s':>10}{'RTF':>10}{'peak MB':>10}{'+MB':>8}{'base RTF':>10}")
+    for name in STAGES:
+        st = result["stages"].get(name)
+        if st is None:
+            continue
+        base = (baseline or {}).get("stages", {}).get(name)
+        base_rtf = f"{base['rtf']:>10}" if base else f"{'-':>10}"
+        print(f"{name:<36}{st['wall_sec']:>10.3f}{st['rtf']:>10.4f}{st['peak_rss_mb']:>10.0f}{st['rss_delta_mb']:>8.0f}{base_rtf}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="Benchmark a real recording instead of synthetic audio")
+    parser.add_argument("--duration", type=float, default=120.0, help="Synthetic audio length in seconds")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models", choices=("real", "stub"), default="real")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="Baseline file (default: baselines/<models>.json)")
+    parser.add_argument("--save", action="store_true", help="Write the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown / memory growth")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / f"{args.models}.json"
+    baseline = None
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"❌ No baseline at {baseline_path}; run with --save first")
+            sys.exit(2)
+        baseline = json.loads(baseline_path.read_text())
+
+    result = run(args)
+    print_table(result, baseline)
+
+    if args.save:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, indent=2))
+        print(f"\n💾 Baseline saved to {baseline_path}")
+
+    if baseline is not None:
+        if baseline.get("source") != result["source"]:
+            print(f"⚠️  Baseline audio was {baseline.get('source')}, this run used {result['source']}")
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {baseline_path}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions vs {baseline_path} (tolerance {100 * args.tolerance:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
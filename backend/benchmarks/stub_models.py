@@ -0,0 +1,192 @@
+"""
+Offline stand-ins for the pipeline's models, for benchmarks.
+
+register_stub_models() replaces the registry loaders with models that need no
+download and no network but exercise the same code paths:
+    whisper      energy-based segmenter with faster-whisper's transcribe() interface
+    diarization  energy + spectral-feature k-means with pyannote's call and output interface
+    age_gender   randomly initialised, tiny AgeGenderModel (real wav2vec2 code, small config)
+    emotion      randomly initialised EmotionHead on the stub age_gender features
+
+Their timings measure the pipeline's own overhead (buffering, joins, batching,
+scheduling), not model quality or real model cost.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+
+FRAME_SEC = 0.02
+
+
+def _frame_energy(samples: np.ndarray, sr: int) -> tuple[np.ndarray, int]:
+    hop = int(FRAME_SEC * sr)
+    n = len(samples) // hop
+    frames = samples[:n * hop].reshape(n, hop)
+    return np.sqrt(np.mean(frames ** 2, axis=1)), hop
+
+
+def _voiced_runs(samples: np.ndarray, sr: int, max_len_sec: float, min_gap_sec: float = 0.3) -> list[tuple[float, float]]:
+    """Runs of frames above an adaptive energy threshold, split at max_len_sec."""
+    energy, hop = _frame_energy(samples, sr)
+    if len(energy) == 0:
+        return []
+    voiced = energy > max(0.01, 3 * np.median(energy))
+    runs, start, silent = [], None, 0
+    max_gap = int(min_gap_sec / FRAME_SEC)
+    for i, v in enumerate(voiced):
+        if v:
+            if start is None:
+                start = i
+            silent = 0
+        elif start is not None:
+            silent += 1
+            if silent > max_gap:
+                runs.append((start, i - silent + 1))
+                start, silent = None, 0
+    if start is not None:
+        runs.append((start, len(voiced) - silent))
+    max_frames = max(1, int(max_len_sec / FRAME_SEC))
+    out = []
+    for s, e in runs:
+        for p in range(s, e, max_frames):
+            out.append((p * FRAME_SEC, min(e, p + max_frames) * FRAME_SEC))
+    return out
+
+
+class StubWhisper:
+    """
+    faster-whisper's WhisperModel.transcribe() interface over an energy segmenter.
+    Also takes the batched pipeline's options (clip_timestamps as [{"start", "end"}]).
+    """
+
+    def transcribe(self, audio, clip_timestamps=None, word_timestamps=False, **options):
+        sr = 16000
+        samples = np.asarray(audio, dtype=np.float32)
+        if clip_timestamps and isinstance(clip_timestamps[0], dict):
+            spans = [(c["start"], c["end"]) for c in clip_timestamps]
+        elif clip_timestamps:
+            spans = list(zip(clip_timestamps[::2], clip_timestamps[1::2]))
+        else:
+            spans = [(0.0, len(samples) / sr)]
+
+        def segments():
+            for span_start, span_end in spans:
+                chunk = samples[int(span_start * sr):int(span_end * sr)]
+                for s, e in _voiced_runs(chunk, sr, max_len_sec=10.0):
+                    n_words = max(1, int((e - s) * 2.5))
+                    step = (e - s) / n_words
+                    words = [
+                        SimpleNamespace(word=" word", start=span_start + s + i * step,
+                                        end=span_start + s + (i + 1) * step, probability=0.9)
+                        for i in range(n_words)
+                    ] if word_timestamps else None
+                    yield SimpleNamespace(
+                        start=span_start + s, end=span_start + e,
+                        text=" ".join(["word"] * n_words), avg_logprob=-0.3, words=words,
+                    )
+
+        return segments(), SimpleNamespace(language="en", language_probability=1.0, duration=len(samples) / sr)
+
+
+class _Segment:
+    def __init__(self, start: float, end: float):
+        self.start = start
+        self.end = end
+
+
+class StubAnnotation:
+    """The part of pyannote.core.Annotation that diarize_with_pyannote reads."""
+
+    def __init__(self, turns: list[tuple[float, float, str]]):
+        self._turns = turns
+
+    def itertracks(self, yield_label: bool = False):
+        for i, (s, e, label) in enumerate(self._turns):
+            yield (_Segment(s, e), i, label) if yield_label else (_Segment(s, e), i)
+
+    def labels(self) -> list[str]:
+        return sorted({label for _, _, label in self._turns})
+
+
+def _features(chunk: np.ndarray, sr: int) -> np.ndarray:
+    """Tiny 'speaker embedding': log band energies of the chunk's spectrum."""
+    spectrum = np.abs(np.fft.rfft(chunk * np.hanning(len(chunk)), n=1024))
+    bands = np.array_split(spectrum[: int(3500 / (sr / 1024))], 16)
+    feats = np.log1p(np.array([b.mean() for b in bands]))
+    return feats / (np.linalg.norm(feats) or 1.0)
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centers = x[rng.choice(len(x), size=k, replace=False)]
+    for _ in range(iters):
+        labels = np.argmin(((x[:, None, :] - centers[None]) ** 2).sum(-1), axis=1)
+        for j in range(k):
+            if np.any(labels == j):
+                centers[j] = x[labels == j].mean(axis=0)
+    return labels, centers
+
+
+class StubDiarization:
+    """pyannote Pipeline call interface: energy runs clustered on spectral features."""
+
+    def __call__(self, file: dict, num_speakers: int | None = None, return_embeddings: bool = False, **kwargs):
+        sr = file["sample_rate"]
+        samples = file["waveform"][0].numpy()
+        runs = _voiced_runs(samples, sr, max_len_sec=1.5)
+        turns, centers = [], np.zeros((0, 16))
+        if runs:
+            feats = np.stack([_features(samples[int(s * sr):int(e * sr)], sr) for s, e in runs])
+            k = max(1, min(num_speakers or 2, len(runs)))
+            labels, centers = _kmeans(feats, k)
+            turns = [(s, e, f"SPEAKER_{label:02d}") for (s, e), label in zip(runs, labels)]
+        annotation = StubAnnotation(turns)
+        if not return_embeddings:
+            return annotation
+        # Centroids in the order of annotation.labels()
+        used = [int(label.split("_")[1]) for label in annotation.labels()]
+        return annotation, centers[used]
+
+
+def _load_stub_age_gender():
+    import torch
+    from transformers import Wav2Vec2Config, Wav2Vec2FeatureExtractor
+
+    from age_gender_model import AgeGenderModel
+    from model_registry import apply_age_gender_backend
+
+    config = Wav2Vec2Config(
+        hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        conv_dim=(32, 32), conv_stride=(5, 4), conv_kernel=(10, 8),
+        num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2,
+        feat_extract_norm="layer", do_stable_layer_norm=True,
+    )
+    torch.manual_seed(0)
+    model = AgeGenderModel(config).eval()
+    processor = Wav2Vec2FeatureExtractor(return_attention_mask=True, do_normalize=True)
+    device = torch.device("cpu")
+    return processor, apply_age_gender_backend(processor, model, device), device
+
+
+STUB_EMOTION_LABELS = ["neutral", "happy", "sad", "angry"]
+
+
+def _load_stub_emotion():
+    import torch
+    from types import SimpleNamespace
+
+    from age_gender_model import EmotionHead
+
+    torch.manual_seed(1)
+    head = EmotionHead(SimpleNamespace(hidden_size=32, final_dropout=0.0), STUB_EMOTION_LABELS).eval()
+    head.name = "stub"
+    return head, torch.device("cpu")
+
+
+def register_stub_models(registry):
+    """Swap every model in `registry` for its offline stub."""
+    registry.register("whisper", StubWhisper, thread_safe=True)
+    registry.register("diarization", StubDiarization)
+    registry.register("age_gender", _load_stub_age_gender)
+    registry.register("emotion", _load_stub_emotion, optional=True)
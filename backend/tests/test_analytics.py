@@ -0,0 +1,69 @@
+"""
+speaker_analytics over a recording cut in two parts and merged must match one
+pass over the whole recording, including turns that start right at the cut.
+
+Run from backend/: python -m pytest tests
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "whisper_shit"))
+
+from analytics import merge_speaker_analytics, speaker_analytics  # noqa: E402
+
+KEYS = ("talk_time_sec", "speech_sec", "overlap_sec", "turns", "interruptions")
+
+
+def _split(turns: list[dict], cut: float):
+    """Both parts of `turns` around `cut`, and the last speaker to start a turn before it."""
+    before = [dict(t, end=min(t["end"], cut)) for t in turns if t["start"] < cut]
+    after = [
+        dict(t, start=max(t["start"], cut), continued=t["start"] < cut)
+        for t in turns if t["end"] > cut
+    ]
+    starts = sorted((t["start"], t["speaker_id"]) for t in turns if t["start"] < cut)
+    last = starts[-1][1] if starts else None
+    return before, after, last
+
+
+def _assert_same(merged: dict, whole: dict):
+    assert merged.keys() == whole.keys()
+    for spk, st in whole.items():
+        for k in KEYS:
+            assert merged[spk][k] == pytest.approx(st[k]), (spk, k)
+
+
+def test_new_turn_at_the_cut_interrupts_a_continued_turn():
+    # B listed first: nothing but the sort may decide which of the two opens first
+    turns = [
+        {"speaker_id": "B", "start": 2.0, "end": 3.0},
+        {"speaker_id": "A", "start": 0.0, "end": 4.0},
+    ]
+    before, after, last = _split(turns, 2.0)
+    merged = merge_speaker_analytics(speaker_analytics(before), speaker_analytics(after, last))
+    whole = speaker_analytics(turns)
+    assert whole["B"]["interruptions"] == 1
+    _assert_same(merged, whole)
+
+
+def test_random_cuts_on_a_coarse_grid_match_one_pass():
+    rng = random.Random(0)
+    for _ in range(2000):
+        turns = []
+        for _ in range(rng.randint(1, 12)):
+            start = round(rng.uniform(0, 10), 1)
+            turns.append({
+                "speaker_id": rng.choice("ABC"),
+                "start": start,
+                "end": round(start + rng.uniform(0.1, 3), 1),
+            })
+        rng.shuffle(turns)
+        cut = round(rng.uniform(0, 12), 1)
+        before, after, last = _split(turns, cut)
+        rng.shuffle(after)
+        merged = merge_speaker_analytics(speaker_analytics(before), speaker_analytics(after, last))
+        _assert_same(merged, speaker_analytics(turns))
@@ -1,73 +1,152 @@
 import numpy as np
-import torch
-import torch.nn as nn
-from transformers import Wav2Vec2Processor
-from transformers.models.wav2vec2.modeling_wav2vec2 import (
-    Wav2Vec2Model,
-    Wav2Vec2PreTrainedModel,
+from governor import get_governor
+from model_registry import registry
+from speech_features import (
+    BATCH_SIZE,
+    WINDOW_SEC,
+    FeatureBank,
+    extract_features,
+    speech_windows,
+    spread_subset,
 )
 
-
-class ModelHead(nn.Module):
-    r"""Classification head."""
-
-    def __init__(self, config, num_labels):
-        super().__init__()
-        self.dense = nn.Linear(config.hidden_size, config.hidden_size)
-        self.dropout = nn.Dropout(config.final_dropout)
-        self.out_proj = nn.Linear(config.hidden_size, num_labels)
-
-    def forward(self, features, **kwargs):
-        x = features
-        x = self.dropout(x)
-        x = self.dense(x)
-        x = torch.tanh(x)
-        x = self.dropout(x)
-        x = self.out_proj(x)
-        return x
-
-
-class AgeGenderModel(Wav2Vec2PreTrainedModel):
-    r"""Speech age and gender classifier."""
-
-    def __init__(self, config):
-        super().__init__(config)
-        self.config = config
-        self.wav2vec2 = Wav2Vec2Model(config)
-        self.age = ModelHead(config, 1)
-        self.gender = ModelHead(config, 3)
-        self.init_weights()
-
-    def forward(self, input_values):
-        outputs = self.wav2vec2(input_values)
-        hidden_states = outputs[0]
-        hidden_states = torch.mean(hidden_states, dim=1)
-        logits_age = self.age(hidden_states)
-        logits_gender = torch.softmax(self.gender(hidden_states), dim=1)
-        return hidden_states, logits_age, logits_gender
-
-
-AGE_GENDER_MODEL_ID = "audeering/wav2vec2-large-robust-24-ft-age-gender"
-_age_gender_processor = None
-_age_gender_model = None
-
-
-def _load_age_gender_model(device: torch.device):
-    """Load the age/gender model (cached globally)."""
-    global _age_gender_processor, _age_gender_model
-    if _age_gender_model is None:
-        print("🧠 Loading age & gender classifier...")
-        _age_gender_processor = Wav2Vec2Processor.from_pretrained(AGE_GENDER_MODEL_ID)
-        _age_gender_model = AgeGenderModel.from_pretrained(AGE_GENDER_MODEL_ID).to(device)
-        _age_gender_model.eval()
-    return _age_gender_processor, _age_gender_model
+GENDER_LABELS = ["female", "male", "child"]
+
+# Windowed inference keeps memory bounded: see speech_features
+MAX_SECONDS_PER_SPEAKER = 60.0
+
+
+def _age_label(age_years: float) -> tuple[str, int]:
+    # Map age to categories - simplified to 4 only
+    if age_years < 18:
+        return "Child", 12
+    elif age_years < 35:
+        return "Teenager", 25
+    elif age_years < 60:
+        return "Adult", int(age_years)
+    else:
+        return "Senior", int(age_years)
+
+
+def predict_speaker_age_gender(
+    audio_np: np.ndarray,
+    sr: int,
+    diar_segments: list[dict],
+    speakers: list[str],
+    window_sec: float = WINDOW_SEC,
+    max_seconds_per_speaker: float | dict[str, float] = MAX_SECONDS_PER_SPEAKER,
+    batch_size: int = BATCH_SIZE,
+    features: FeatureBank | None = None,
+) -> dict[str, dict]:
+    """
+    Raw age/gender predictions per speaker.
+    
+    Each speaker's turns are cut into fixed-length windows (at most
+    `max_seconds_per_speaker` seconds per speaker, or a per-speaker budget if a
+    dict is given), the age/gender heads run on the encoder features of those
+    windows, and the per-window predictions are averaged per speaker, weighted
+    by window length. With `features` (a FeatureBank over the same windows, e.g.
+    shared with the emotion stage) the subset is taken from the bank and the
+    encoder doesn't run again; otherwise only the subset is encoded.
+    
+    Returns:
+        {speaker_id: {"analyzed_sec", "age_years", "age_std", "gender_probs"}} for
+        every speaker that had enough audio
+    """
+    import torch
+
+    if features is None:
+        windows = speech_windows(diar_segments, speakers, sr, len(audio_np), window_sec, max_seconds_per_speaker)
+        if not windows:
+            return {}
+        features = extract_features(audio_np, sr, windows, batch_size)
+        rows = {spk: features.indices(spk) for spk in speakers}
+    else:
+        rows = {}
+        for spk in speakers:
+            budget = max_seconds_per_speaker.get(spk, 0.0) if isinstance(max_seconds_per_speaker, dict) else max_seconds_per_speaker
+            idx = features.indices(spk)
+            if budget > 0 and len(idx):
+                rows[spk] = idx[spread_subset(len(idx), window_sec, budget)]
+    selected = np.concatenate([idx for idx in rows.values() if len(idx)] or [np.zeros(0, dtype=int)])
+    if not len(selected):
+        return {}
+
+    _, model, device = registry.get("age_gender")
+    with torch.no_grad(), get_governor().stage("age_gender"):
+        logits_age, logits_gender = model.heads(torch.from_numpy(features.features[selected]).to(device))
+    ages = dict(zip(selected.tolist(), logits_age[:, 0].detach().cpu().numpy() * 100))  # Scale to 0-100 years
+    genders = dict(zip(selected.tolist(), logits_gender.detach().cpu().numpy()))
+    seconds = features.seconds
+
+    predictions = {}
+    for spk, idx in rows.items():
+        if not len(idx):
+            continue
+        w = seconds[idx]
+        spk_ages = np.array([ages[i] for i in idx], dtype=np.float64)
+        age_years = float(np.average(spk_ages, weights=w))
+        predictions[spk] = {
+            "analyzed_sec": float(w.sum()),
+            "age_years": age_years,
+            "age_std": float(np.sqrt(np.average((spk_ages - age_years) ** 2, weights=w))),
+            "gender_probs": np.average(np.array([genders[i] for i in idx], dtype=np.float64), axis=0, weights=w).tolist(),
+        }
+    return predictions
+
+
+def merge_age_gender_predictions(a: dict | None, b: dict | None) -> dict | None:
+    """Combine two predictions for the same speaker (e.g. from different windows of a recording)."""
+    if not a or not b:
+        return a or b
+    wa, wb = a["analyzed_sec"], b["analyzed_sec"]
+    total = wa + wb
+    age = (wa * a["age_years"] + wb * b["age_years"]) / total
+    # Pooled variance around the combined mean
+    var = (wa * (a["age_std"] ** 2 + (a["age_years"] - age) ** 2)
+           + wb * (b["age_std"] ** 2 + (b["age_years"] - age) ** 2)) / total
+    return {
+        "analyzed_sec": total,
+        "age_years": age,
+        "age_std": float(np.sqrt(var)),
+        "gender_probs": ((wa * np.asarray(a["gender_probs"]) + wb * np.asarray(b["gender_probs"])) / total).tolist(),
+    }
+
+
+def age_gender_attributes(prediction: dict) -> dict:
+    """Persona "sex" and "age" fields from a speaker prediction."""
+    # Extract gender (3 classes: female, male, child)
+    gender_probs = np.asarray(prediction["gender_probs"])
+    gender_idx = int(np.argmax(gender_probs))
+    age_label, age_mean = _age_label(prediction["age_years"])
+
+    # Confident when the windows agree and there was enough speech to look at
+    agreement = 1.0 / (1.0 + prediction["age_std"] / 10.0)
+    coverage = min(1.0, prediction["analyzed_sec"] / 10.0)
+
+    return {
+        "sex": {
+            "label": GENDER_LABELS[gender_idx], 
+            "confidence": round(float(gender_probs[gender_idx]), 3)
+        },
+        "age": {
+            "label": age_label,
+            "mean_estimate": age_mean,
+            "confidence": round(agreement * coverage, 3),
+            "analyzed_sec": round(prediction["analyzed_sec"], 1),
+        },
+    }
 
 
 def estimate_age_gender_for_personas(
     audio_np: np.ndarray, 
     sr: int, 
     diar_segments: list[dict], 
-    personas: list[dict]
+    personas: list[dict],
+    window_sec: float = WINDOW_SEC,
+    max_seconds_per_speaker: float = MAX_SECONDS_PER_SPEAKER,
+    batch_size: int = BATCH_SIZE,
+    features: FeatureBank | None = None,
 ) -> list[dict]:
     """
     Estimate age and gender for each persona using their audio segments.
@@ -77,102 +156,21 @@ def estimate_age_gender_for_personas(
         sr: Sample rate (should be 16000)
         diar_segments: List of diarization segments with speaker_id, start, end
         personas: List of persona dicts to update
+        window_sec: Length of each analysis window
+        max_seconds_per_speaker: Upper bound on audio analyzed per speaker
+        batch_size: Windows per forward pass
+        features: Encoder features already computed for these turns, if any
         
     Returns:
         Updated personas with age and sex fields populated
     """
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    processor, model = _load_age_gender_model(device)
-
+    predictions = predict_speaker_age_gender(
+        audio_np, sr, diar_segments, [p["speaker_id"] for p in personas],
+        window_sec, max_seconds_per_speaker, batch_size, features,
+    )
     for persona in personas:
-        spk_id = persona["speaker_id"]
-        
-        # Collect all audio segments for this speaker
-        spans = [(seg["start"], seg["end"]) for seg in diar_segments if seg["speaker_id"] == spk_id]
-        if not spans:
-            continue
-
-        # Extract and concatenate audio chunks
-        chunks = []
-        for start, end in spans:
-            s_idx = max(0, int(start * sr))
-            e_idx = min(len(audio_np), int(end * sr))
-            if e_idx > s_idx:
-                chunks.append(audio_np[s_idx:e_idx])
-
-        if not chunks:
-            continue
-
-        speaker_audio = np.concatenate(chunks)
-        
-        # Skip if too short
-        if speaker_audio.size < sr * 0.5:
-            continue
-
-        # Process audio through the model
-        y = processor(speaker_audio, sampling_rate=sr)
-        y = y['input_values'][0]
-        y = y.reshape(1, -1)
-        y = torch.from_numpy(y).to(device)
-
-        with torch.no_grad():
-            hidden_states, logits_age, logits_gender = model(y)
-
-        # Extract age (continuous value from 0-1, scale to years)
-        age_normalized = logits_age.item()
-        age_years = age_normalized * 100  # Scale to 0-100 years
-        
-        # Extract gender (3 classes: female, male, child)
-        gender_probs = logits_gender[0].detach().cpu().numpy()
-        gender_labels = ["female", "male", "child"]
-        gender_idx = np.argmax(gender_probs)
-        gender_label = gender_labels[gender_idx]
-        gender_conf = float(gender_probs[gender_idx])
-
-        # Map age to categories - simplified to 4 only
-        if age_years < 18:
-            age_label = "Child"
-            age_mean = 12
-        elif age_years < 35:
-            age_label = "Teenager"
-            age_mean = 25
-        elif age_years < 60:
-            age_label = "Adult"
-            age_mean = int(age_years)
-        else:
-            age_label = "Senior"
-            age_mean = int(age_years)
-
-        # Update persona
-        persona["sex"] = {
-            "label": gender_label, 
-            "confidence": round(gender_conf, 3)
-        }
-        persona["age"] = {
-            "label": age_label,
-            "mean_estimate": age_mean,
-            "confidence": 0.8,  
-        }
-
+        prediction = predictions.get(persona["speaker_id"])
+        if prediction is not None:
+            # Update persona
+            persona.update(age_gender_attributes(prediction))
     return personas
-
-
-# Remove test code from module level - it was running on import
-if __name__ == "__main__":
-    # This is only for manual testing
-    device = 'cpu'
-    processor = Wav2Vec2Processor.from_pretrained(AGE_GENDER_MODEL_ID)
-    model = AgeGenderModel.from_pretrained(AGE_GENDER_MODEL_ID)
-    
-    sampling_rate = 16000
-    signal = np.zeros((1, sampling_rate), dtype=np.float32)
-    
-    y = processor(signal, sampling_rate=sampling_rate)
-    y = y['input_values'][0]
-    y = y.reshape(1, -1)
-    y = torch.from_numpy(y).to(device)
-    
-    with torch.no_grad():
-        y = model(y)
-    
-    print(torch.hstack([y[1], y[2]]).detach().cpu().numpy())
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""
+The wav2vec2 age/gender classifier (audeering/wav2vec2-large-robust-24-ft-age-gender)
+and the emotion head that reads the same encoder's features.
+
+Kept apart from age_gender_estimation so that importing the pipeline doesn't
+import torch and transformers; the model registry imports this module when it
+loads the model.
+"""
+
+import numpy as np
+import torch
+import torch.nn as nn
+from transformers import Wav2Vec2Processor
+from transformers.models.wav2vec2.modeling_wav2vec2 import (
+    Wav2Vec2Model,
+    Wav2Vec2PreTrainedModel,
+)
+from model_registry import AGE_GENDER_BACKENDS, AGE_GENDER_MODEL_ID
+
+
+class ModelHead(nn.Module):
+    r"""Classification head."""
+
+    def __init__(self, config, num_labels):
+        super().__init__()
+        self.dense = nn.Linear(config.hidden_size, config.hidden_size)
+        self.dropout = nn.Dropout(config.final_dropout)
+        self.out_proj = nn.Linear(config.hidden_size, num_labels)
+
+    def forward(self, features, **kwargs):
+        x = features
+        x = self.dropout(x)
+        x = self.dense(x)
+        x = torch.tanh(x)
+        x = self.dropout(x)
+        x = self.out_proj(x)
+        return x
+
+
+class AgeGenderModel(Wav2Vec2PreTrainedModel):
+    r"""Speech age and gender classifier."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.config = config
+        self.wav2vec2 = Wav2Vec2Model(config)
+        self.age = ModelHead(config, 1)
+        self.gender = ModelHead(config, 3)
+        self.init_weights()
+
+    def encode(self, input_values, attention_mask=None):
+        """The wav2vec2 encoder, mean-pooled over time: one feature vector per window."""
+        outputs = self.wav2vec2(input_values, attention_mask=attention_mask)
+        hidden_states = outputs[0]
+        if attention_mask is None:
+            return torch.mean(hidden_states, dim=1)
+        # Mean over the real frames only, so padding in a batch doesn't skew the result
+        mask = self.wav2vec2._get_feature_vector_attention_mask(hidden_states.shape[1], attention_mask)
+        mask = mask.unsqueeze(-1).to(hidden_states.dtype)
+        return (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+
+    def heads(self, hidden_states):
+        """Age (years / 100) and gender probabilities from pooled features."""
+        logits_age = self.age(hidden_states)
+        logits_gender = torch.softmax(self.gender(hidden_states), dim=1)
+        return logits_age, logits_gender
+
+    def forward(self, input_values, attention_mask=None):
+        hidden_states = self.encode(input_values, attention_mask)
+        logits_age, logits_gender = self.heads(hidden_states)
+        return hidden_states, logits_age, logits_gender
+
+
+class EmotionHead(nn.Module):
+    r"""Emotion classifier on the pooled features of the age/gender encoder."""
+
+    def __init__(self, config, labels: list[str]):
+        super().__init__()
+        self.labels = list(labels)
+        self.head = ModelHead(config, len(self.labels))
+        # Set by whoever loads the weights, for meta.model_emotion and cache keys
+        self.name: str | None = None
+        self.trained: str | None = None
+
+    def forward(self, hidden_states):
+        return torch.softmax(self.head(hidden_states), dim=1)
+
+
+class AgeGenderRunner:
+    """
+    What the registry hands out for "age_gender": encode() runs the (possibly
+    quantized or traced) encoder, heads() the age/gender heads on its output.
+    Calling it runs both, like AgeGenderModel.forward.
+    """
+
+    def __init__(self, encode, heads):
+        self.encode = encode
+        self.heads = heads
+
+    def __call__(self, input_values, attention_mask=None):
+        hidden_states = self.encode(input_values, attention_mask)
+        return (hidden_states, *self.heads(hidden_states))
+
+
+# Inference backends (model_registry.AGE_GENDER_BACKENDS), each an AgeGenderRunner:
+#   eager        the fp32 model as loaded
+#   int8         dynamic int8 quantization of every nn.Linear (CPU only)
+#   torchscript  a traced and frozen TorchScript graph of the fp32 encoder
+
+# How far a backend may drift from eager fp32 before it is rejected
+AGE_TOLERANCE_YEARS = 2.0
+GENDER_TOLERANCE = 0.05
+
+
+class _MaskedEncoder(nn.Module):
+    """encode() with the attention mask required, which is the signature tracing records."""
+
+    def __init__(self, model: AgeGenderModel):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_values, attention_mask):
+        return self.model.encode(input_values, attention_mask)
+
+
+def example_inputs(processor, device, lengths_sec=(4.0, 2.5, 1.0), sr: int = 16000, seed: int = 0):
+    """A padded batch of noise windows of different lengths, for tracing and parity checks."""
+    rng = np.random.default_rng(seed)
+    y = processor(
+        [rng.standard_normal(int(sec * sr)).astype(np.float32) * 0.1 for sec in lengths_sec],
+        sampling_rate=sr,
+        padding=True,
+        return_attention_mask=True,
+        return_tensors="pt",
+    )
+    return y["input_values"].to(device), y["attention_mask"].to(device)
+
+
+def build_backend(model: AgeGenderModel, backend: str, inputs: tuple | None = None) -> AgeGenderRunner:
+    """
+    The model prepared for `backend`. `inputs` (input_values, attention_mask) is the
+    example batch TorchScript traces with; the padded batch must contain a shorter
+    window so the masked path is recorded.
+    """
+    if backend == "eager":
+        return AgeGenderRunner(model.encode, model.heads)
+    if backend == "int8":
+        # Weights of the linear layers (most of wav2vec2's compute) go to int8;
+        # activations are quantized on the fly, so no calibration data is needed
+        quantized = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        return AgeGenderRunner(quantized.encode, quantized.heads)
+    if backend == "torchscript":
+        if inputs is None:
+            raise ValueError("The torchscript backend needs example inputs to trace")
+        with torch.no_grad():
+            traced = torch.jit.trace(_MaskedEncoder(model).eval(), inputs, check_trace=False)
+        # The heads are two small linear layers; they stay eager
+        return AgeGenderRunner(torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval())), model.heads)
+    raise ValueError(f"Unknown age/gender backend {backend!r}; choose from {', '.join(AGE_GENDER_BACKENDS)}")
+
+
+def parity(reference, candidate, inputs: tuple) -> dict:
+    """
+    Largest difference between two backends on the same batch: age in years,
+    gender probability, and whether the predicted gender class always agrees.
+    """
+    with torch.no_grad():
+        _, ref_age, ref_gender = reference(*inputs)
+        _, age, gender = candidate(*inputs)
+    age_diff = float((ref_age - age).abs().max()) * 100  # the model outputs age / 100
+    gender_diff = float((ref_gender - gender).abs().max())
+    same_class = bool((ref_gender.argmax(dim=1) == gender.argmax(dim=1)).all())
+    return {
+        "max_age_diff_years": round(age_diff, 3),
+        "max_gender_prob_diff": round(gender_diff, 4),
+        "gender_class_agrees": same_class,
+        "ok": age_diff <= AGE_TOLERANCE_YEARS and gender_diff <= GENDER_TOLERANCE and same_class,
+    }
+
+
+# Remove test code from module level - it was running on import
+if __name__ == "__main__":
+    # This is only for manual testing
+    device = 'cpu'
+    processor = Wav2Vec2Processor.from_pretrained(AGE_GENDER_MODEL_ID)
+    model = AgeGenderModel.from_pretrained(AGE_GENDER_MODEL_ID)
+    
+    sampling_rate = 16000
+    signal = np.zeros((1, sampling_rate), dtype=np.float32)
+    
+    y = processor(signal, sampling_rate=sampling_rate)
+    y = y['input_values'][0]
+    y = y.reshape(1, -1)
+    y = torch.from_numpy(y).to(device)
+    
+    with torch.no_grad():
+        y = model(y)
+    
+    print(torch.hstack([y[1], y[2]]).detach().cpu().numpy())
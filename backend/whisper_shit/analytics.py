@@ -0,0 +1,99 @@
+"""
+Conversation analytics from diarization turns.
+
+One sorted-event sweep over the turn boundaries yields, per speaker: fair talk
+time (overlapping speech split evenly between the active speakers), raw speech
+time, overlap seconds and ratio, turn counts and interruption counts. The cost
+is O(n log n) for the sort plus O(n * concurrent speakers) for the sweep, so it
+stays linear on sessions with hundreds of thousands of turns.
+"""
+
+_END = 0    # at equal timestamps ends are handled before starts, so touching turns don't overlap
+_START = 1
+
+
+def speaker_analytics(diar_segments: list[dict], last_speaker: str | None = None) -> dict[str, dict]:
+    """
+    Per-speaker talk statistics.
+
+    For a later part of a recording, pass the speaker who started the last turn
+    before it as `last_speaker` (of turns starting together, the greatest speaker ID,
+    as that is the one handled last), and mark turns cut at the start of the part with
+    "continued": True; the totals then add up with merge_speaker_analytics().
+
+    Returns:
+        {speaker_id: {
+            "talk_time_sec":  fair share of every moment the speaker was active,
+            "speech_sec":     time the speaker was active at all,
+            "overlap_sec":    time the speaker was active together with someone else,
+            "overlap_ratio":  overlap_sec / speech_sec,
+            "turns":          runs of consecutive turns by this speaker,
+            "interruptions":  turns started while another speaker was still talking,
+        }}
+    """
+    events = []
+    for d in diar_segments:
+        start, end = float(d["start"]), float(d["end"])
+        if end > start:
+            events.append((start, _START, d["speaker_id"], d.get("continued", False)))
+            events.append((end, _END, d["speaker_id"], False))
+    # Continued turns were already open before the part started, so at equal timestamps
+    # they open before new turns, which then count as interruptions like in one pass.
+    # Speaker ID breaks the remaining ties, so the order doesn't depend on the input's.
+    events.sort(key=lambda e: (e[0], e[1], not e[3], e[2]))
+
+    stats: dict[str, dict] = {}
+    active: dict[str, int] = {}  # speaker -> number of their turns currently open
+    prev_t = events[0][0] if events else 0.0
+
+    for t, kind, spk, continued in events:
+        dt = t - prev_t
+        if dt > 0 and active:
+            share = dt / len(active)
+            overlapped = len(active) > 1
+            for s in active:
+                st = stats[s]
+                st["talk_time_sec"] += share
+                st["speech_sec"] += dt
+                if overlapped:
+                    st["overlap_sec"] += dt
+        prev_t = t
+
+        if kind == _START:
+            st = stats.get(spk)
+            if st is None:
+                st = stats[spk] = {
+                    "talk_time_sec": 0.0, "speech_sec": 0.0, "overlap_sec": 0.0,
+                    "overlap_ratio": 0.0, "turns": 0, "interruptions": 0,
+                }
+            # A continued turn was already counted in the part before
+            if spk != last_speaker and not continued:
+                st["turns"] += 1
+                last_speaker = spk
+            if spk not in active and active and not continued:
+                st["interruptions"] += 1
+            active[spk] = active.get(spk, 0) + 1
+        else:
+            remaining = active[spk] - 1
+            if remaining:
+                active[spk] = remaining
+            else:
+                del active[spk]
+
+    for st in stats.values():
+        st["overlap_ratio"] = round(st["overlap_sec"] / st["speech_sec"], 3) if st["speech_sec"] else 0.0
+    return stats
+
+
+def merge_speaker_analytics(a: dict[str, dict], b: dict[str, dict]) -> dict[str, dict]:
+    """Statistics of two consecutive parts of a recording, as if computed in one pass."""
+    out = {spk: dict(st) for spk, st in a.items()}
+    for spk, st in b.items():
+        if spk not in out:
+            out[spk] = dict(st)
+            continue
+        merged = out[spk]
+        for k in ("talk_time_sec", "speech_sec", "overlap_sec", "turns", "interruptions"):
+            merged[k] += st[k]
+        merged["overlap_ratio"] = round(merged["overlap_sec"] / merged["speech_sec"], 3) if merged["speech_sec"] else 0.0
+    return out
@@ -0,0 +1,172 @@
+"""
+Shared decoded audio.
+
+An upload is decoded exactly once into a mono float32 16 kHz buffer. ASR,
+diarization and age/gender estimation all read zero-copy views of that buffer
+instead of decoding the file again. For long recordings the buffer can be
+backed by a memory-mapped scratch file so the samples live in the page cache
+rather than on the Python heap.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Directory for memory-mapped buffers; unset means keep samples in memory
+MMAP_DIR_ENV = "ECHOLOGIA_MMAP_DIR"
+
+
+class AudioBuffer:
+    """Decoded mono float32 audio plus helpers for zero-copy access."""
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = SAMPLE_RATE, mmap_path: str | None = None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.mmap_path = mmap_path
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def view(self, start: float = 0.0, end: float | None = None) -> np.ndarray:
+        """Slice [start, end) seconds. Basic slicing, so no samples are copied."""
+        s_idx = max(0, int(start * self.sample_rate))
+        e_idx = len(self.samples) if end is None else min(len(self.samples), int(end * self.sample_rate))
+        return self.samples[s_idx:max(s_idx, e_idx)]
+
+    def tensor(self):
+        """Samples as a [1, n] torch tensor sharing memory with the buffer."""
+        import torch
+
+        return torch.from_numpy(self.samples).unsqueeze(0)
+
+    def close(self):
+        """Drop the samples and remove the memory-mapped scratch file, if any."""
+        self.samples = np.zeros(0, dtype=np.float32)
+        if self.mmap_path and os.path.exists(self.mmap_path):
+            os.unlink(self.mmap_path)
+        self.mmap_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def stream_audio(audio_file: str, sample_rate: int = SAMPLE_RATE, offset: float = 0.0, block_sec: float = 30.0):
+    """
+    Decode `audio_file` incrementally, yielding mono float32 blocks at `sample_rate`.
+
+    Only one block is in memory at a time and decoding starts at `offset`
+    seconds without reading what comes before it. Files soundfile can open are
+    read with a seekable block reader and resampled with a streaming resampler;
+    anything else (m4a, mp4, ...) goes through an ffmpeg pipe with `-ss`. If
+    ffmpeg is not installed either, librosa decodes the file in one go.
+    """
+    import soundfile as sf
+
+    block = max(1, int(block_sec * sample_rate))
+    try:
+        handle = sf.SoundFile(audio_file)
+    except RuntimeError:
+        handle = None
+
+    if handle is not None:
+        with handle:
+            handle.seek(min(handle.frames, int(offset * handle.samplerate)))
+            resampler = None
+            if handle.samplerate != sample_rate:
+                import soxr
+
+                resampler = soxr.ResampleStream(handle.samplerate, sample_rate, 1, dtype="float32")
+            in_block = max(1, int(block_sec * handle.samplerate))
+            while True:
+                chunk = handle.read(in_block, dtype="float32", always_2d=True)
+                last = len(chunk) < in_block
+                mono = np.ascontiguousarray(chunk.mean(axis=1), dtype=np.float32)
+                if resampler is not None:
+                    mono = resampler.resample_chunk(mono, last=last)
+                if mono.size:
+                    yield mono
+                if last:
+                    return
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        import librosa
+
+        samples, _ = librosa.load(audio_file, sr=sample_rate, mono=True, offset=offset)
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        for start in range(0, len(samples), block):
+            yield samples[start:start + block]
+        return
+
+    cmd = [ffmpeg, "-nostdin", "-v", "error", "-ss", f"{offset:.3f}", "-i", audio_file,
+           "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        while True:
+            raw = proc.stdout.read(block * 4)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) - len(raw) % 4], dtype=np.float32).copy()
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def decode_audio(audio_file: str, sample_rate: int = SAMPLE_RATE, mmap_dir: str | None = None) -> AudioBuffer:
+    """
+    Decode `audio_file` once to mono float32 at `sample_rate`.
+
+    Args:
+        audio_file: Path to any format librosa can read
+        sample_rate: Target sample rate (the models all expect 16000)
+        mmap_dir: If set (or ECHOLOGIA_MMAP_DIR is set), back the buffer with a
+            memory-mapped file in this directory. Blocks are streamed from the
+            decoder into the file, so the whole recording is never on the heap.
+
+    Returns:
+        AudioBuffer owning the decoded samples
+    """
+    print("🎵 Decoding audio...")
+    mmap_dir = mmap_dir or os.environ.get(MMAP_DIR_ENV)
+    if not mmap_dir:
+        import librosa
+
+        samples, sr = librosa.load(audio_file, sr=sample_rate, mono=True)
+        return AudioBuffer(np.ascontiguousarray(samples, dtype=np.float32), sr)
+
+    os.makedirs(mmap_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".f32", dir=mmap_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for block in stream_audio(audio_file, sample_rate):
+                out.write(block.tobytes())
+        n = os.path.getsize(path) // 4
+        if n == 0:
+            os.unlink(path)
+            return AudioBuffer(np.zeros(0, dtype=np.float32), sample_rate)
+        mapped = np.memmap(path, dtype=np.float32, mode="r+", shape=(n,))
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    return AudioBuffer(mapped, sample_rate, mmap_path=path)
+
+
+def as_audio_buffer(audio) -> AudioBuffer:
+    """Accept an AudioBuffer, a 16 kHz float32 array or a file path."""
+    if isinstance(audio, AudioBuffer):
+        return audio
+    if isinstance(audio, np.ndarray):
+        return AudioBuffer(np.ascontiguousarray(audio, dtype=np.float32))
+    return decode_audio(str(audio))
@@ -0,0 +1,231 @@
+"""
+Batch processing of many recordings.
+
+Files are spread over a pool of worker processes. Each worker is pinned to its
+own slice of the cores, so cpu_budget(), the stage scheduler and Whisper's
+thread count all see that slice, and each worker loads and warms the models
+once when it starts. Every finished file is appended to a JSONL manifest
+next to the outputs, and an interrupted run picks up where it stopped: files
+already marked done (same size and mtime, output still present) are skipped.
+Files lost to a crashed worker process are not recorded, so the next run
+processes them again.
+"""
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+from scheduler import cpu_budget
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.flac', '.ogg')
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def find_audio_files(inputs: list[str]) -> list[Path]:
+    """Expand directories (recursively) and glob patterns into a sorted list of audio files."""
+    found = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = path.rglob("*")
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(p) for p in glob.glob(item, recursive=True))
+        for p in candidates:
+            if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS:
+                found.add(p.resolve())
+    return sorted(found)
+
+
+def _output_path(audio: Path, root: Path, output_dir: Path) -> Path:
+    """Mirror the input layout under output_dir, so equal file names in different folders don't collide."""
+    return output_dir / audio.relative_to(root).with_suffix(".json")
+
+
+def _file_key(audio: Path) -> dict:
+    st = audio.stat()
+    return {"file": str(audio), "size": st.st_size, "mtime": int(st.st_mtime)}
+
+
+def load_manifest(manifest: Path) -> dict[str, dict]:
+    """Latest manifest record per file; a torn last line from a killed run is ignored."""
+    records = {}
+    if not manifest.exists():
+        return records
+    with open(manifest) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["file"]] = record
+    return records
+
+
+def _should_skip(record: dict | None, key: dict, retry_failed: bool) -> bool:
+    """Skip files finished (or failed, unless retrying) in an earlier run and unchanged since."""
+    if record is None or record.get("size") != key["size"] or record.get("mtime") != key["mtime"]:
+        return False
+    if record.get("status") == "done":
+        return Path(record.get("output", "")).exists()
+    return record.get("status") == "failed" and not retry_failed
+
+
+# Worker side
+
+def _init_worker(slot_counter, cores_per_worker: int, warm_up: bool):
+    """Pin this worker to its own cores and load the models once."""
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+        start = (slot * cores_per_worker) % len(cores)
+        os.sched_setaffinity(0, cores[start:start + cores_per_worker] or cores)
+    except AttributeError:
+        pass  # no affinity control on this platform; workers share all cores
+
+    if warm_up:
+        from model_registry import registry
+        registry.warm_up()
+
+
+def _process_one(audio: str, output: str, num_speakers: int | None) -> dict:
+    from processor import process_audio_to_personas
+
+    started = time.perf_counter()
+    try:
+        result = process_audio_to_personas(audio, num_speakers=num_speakers)
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(output).with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp, output)
+        return {
+            "status": "done",
+            "output": output,
+            "duration_sec": result["meta"]["duration_sec"],
+            "speakers": len(result["personas"]),
+            "wall_sec": round(time.perf_counter() - started, 2),
+        }
+    except Exception as e:
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}", "wall_sec": round(time.perf_counter() - started, 2)}
+
+
+# Driver side
+
+def run_batch(
+    inputs: list[str],
+    output_dir: str = "batch_output",
+    workers: int | None = None,
+    num_speakers: int | None = 2,
+    retry_failed: bool = False,
+    warm_up: bool = True,
+) -> dict:
+    """
+    Process every audio file matched by `inputs` and write one JSON per file.
+
+    Args:
+        inputs: Directories, files or glob patterns
+        output_dir: Where outputs and the manifest go
+        workers: Worker processes (default: one per 4 cores, at least 1)
+        num_speakers: Passed to the pipeline; None lets pyannote decide
+        retry_failed: Also re-run files the manifest marks as failed
+        warm_up: Load the models when each worker starts rather than on its first file
+
+    Returns:
+        Throughput summary for this run
+    """
+    files = find_audio_files(inputs)
+    out_root = Path(output_dir).resolve()
+    out_root.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_root / MANIFEST_NAME
+    previous = load_manifest(manifest_path)
+
+    if not files:
+        print("❌ No audio files found")
+        return {"files": 0}
+    root = Path(os.path.commonpath([str(f.parent) for f in files]))
+
+    todo, skipped = [], 0
+    for audio in files:
+        key = _file_key(audio)
+        if _should_skip(previous.get(key["file"]), key, retry_failed):
+            skipped += 1
+            continue
+        todo.append((audio, key))
+
+    workers = workers or max(1, cpu_budget() // 4)
+    workers = max(1, min(workers, len(todo) or 1))
+    cores_per_worker = max(1, cpu_budget() // workers)
+    print(f"📂 {len(files)} files: {len(todo)} to process, {skipped} already in the manifest")
+    print(f"⚙️  {workers} workers x {cores_per_worker} cores")
+
+    done = failed = interrupted = 0
+    audio_sec = worker_sec = 0.0
+    started = time.perf_counter()
+    if todo:
+        # spawn: torch and CTranslate2 thread pools don't survive fork
+        ctx = get_context("spawn")
+        slot_counter = ctx.Value("i", 0)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(slot_counter, cores_per_worker, warm_up),
+        ) as pool, open(manifest_path, "a") as manifest:
+            futures = {
+                pool.submit(_process_one, str(audio), str(_output_path(audio, root, out_root)), num_speakers): key
+                for audio, key in todo
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    outcome = future.result()
+                except BrokenProcessPool:
+                    # A worker died (e.g. out of memory) and took every pending file with it;
+                    # no record, so the next run retries them
+                    interrupted += 1
+                    continue
+                except Exception as e:
+                    outcome = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+                record = {**key, **outcome, "finished_at": datetime.now().isoformat()}
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+
+                if outcome["status"] == "done":
+                    done += 1
+                    audio_sec += outcome["duration_sec"]
+                    worker_sec += outcome["wall_sec"]
+                    print(f"✅ [{done + failed}/{len(todo)}] {Path(key['file']).name} "
+                          f"({outcome['duration_sec']:.0f}s audio in {outcome['wall_sec']:.0f}s)")
+                else:
+                    failed += 1
+                    print(f"❌ [{done + failed}/{len(todo)}] {Path(key['file']).name}: {outcome['error']}")
+
+    if interrupted:
+        print(f"⚠️  A worker process died; {interrupted} file(s) left unrecorded, re-run to process them")
+    wall = time.perf_counter() - started
+    summary = {
+        "files": len(files),
+        "processed": done,
+        "failed": failed,
+        "skipped": skipped,
+        "interrupted": interrupted,
+        "workers": workers,
+        "wall_sec": round(wall, 1),
+        "audio_sec": round(audio_sec, 1),
+        "files_per_hour": round(3600 * done / wall, 1) if wall > 0 else None,
+        # Wall time per second of audio for the whole run, and per file inside a worker
+        "rtf": round(wall / audio_sec, 4) if audio_sec else None,
+        "rtf_per_worker": round(worker_sec / audio_sec, 4) if audio_sec else None,
+        "manifest": str(manifest_path),
+    }
+    return summary
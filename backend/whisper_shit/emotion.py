@@ -0,0 +1,165 @@
+"""
+Speech emotion from the shared wav2vec2 features.
+
+The emotion head (EmotionHead in age_gender_model.py) classifies the pooled
+features of every window in a FeatureBank, so it costs two small linear
+layers on top of the encoder pass age/gender already makes. Window
+probabilities are then rolled up three ways:
+    per segment       overlap-weighted mean of the windows under the segment,
+                      or the nearest window of the speaker if none is under it
+    per speaker       mood_summary: dominant label plus other frequent ones
+    per session       global_emotion_trend: share of speech time per label
+
+The head's weights are trained on the age/gender encoder's features (see
+train_emotion_head.py) and are optional: without them (registry.available
+("emotion") is False) every segment stays "neutral".
+
+Like age/gender, emotion only looks at an evenly spread subset of each
+speaker's speech: ECHOLOGIA_EMOTION_MAX_SEC seconds per speaker (default 120;
+per window in windowed mode, per update in append mode). The shared encoder
+pass covers the larger of the two budgets, so with the defaults it costs at
+most twice the age/gender pass whatever the length of the recording.
+ECHOLOGIA_EMOTION_MAX_SEC=0 encodes every window of speech instead, for
+per-segment labels at a cost that grows with the recording.
+"""
+
+import os
+
+import numpy as np
+
+from governor import get_governor
+from model_registry import registry
+from speech_features import FeatureBank
+
+# Emotion of a segment nothing was measured for (no head, or no speech windows)
+NEUTRAL = {"label": "neutral", "confidence": 0.8}
+# A label this frequent in a speaker's speech shows up in mood_summary.variation
+VARIATION_MIN_SHARE = 0.15
+EMOTION_MAX_SECONDS_PER_SPEAKER = float(os.environ.get("ECHOLOGIA_EMOTION_MAX_SEC", 120.0))
+
+
+def voice_budget(age_gender_budget: float | dict[str, float]) -> float | dict[str, float] | None:
+    """
+    Per-speaker budget of the shared feature pass when emotion runs too: the larger of
+    the age/gender budget and the emotion budget (None: every window).
+    """
+    if EMOTION_MAX_SECONDS_PER_SPEAKER <= 0:
+        return None
+    if isinstance(age_gender_budget, dict):
+        return {spk: max(b, EMOTION_MAX_SECONDS_PER_SPEAKER) for spk, b in age_gender_budget.items()}
+    return max(age_gender_budget, EMOTION_MAX_SECONDS_PER_SPEAKER)
+
+
+def window_emotions(features: FeatureBank) -> dict:
+    """
+    Emotion probabilities per window of `features`, in a JSON-friendly form:
+        {"labels": [...], "windows": [[start_sec, end_sec, speaker_id], ...], "probs": [[...], ...]}
+    """
+    import torch
+
+    head, device = registry.get("emotion")
+    probs = np.zeros((len(features), len(head.labels)), dtype=np.float32)
+    if len(features):
+        with torch.no_grad(), get_governor().stage("emotion"):
+            probs = head(torch.from_numpy(features.features).to(device)).detach().cpu().numpy()
+    sr = features.sample_rate
+    return {
+        "labels": head.labels,
+        "windows": [
+            [round(float(s) / sr, 3), round(float(e) / sr, 3), spk]
+            for spk, s, e in zip(features.speakers, features.starts, features.ends)
+        ],
+        "probs": np.round(probs, 4).tolist(),
+    }
+
+
+def _label(probs: np.ndarray, labels: list[str]) -> dict:
+    k = int(np.argmax(probs))
+    return {"label": labels[k], "confidence": round(float(probs[k]), 3)}
+
+
+def segment_emotions(segments: list[dict], emotions: dict) -> list[dict]:
+    """
+    One {"label", "confidence"} per segment: the window probabilities averaged over
+    the segment, weighted by overlap. Windows of the segment's own speaker are
+    preferred. A segment no window overlaps (windows are a sample of the speech)
+    takes the nearest window of its speaker, or the nearest window at all.
+    """
+    labels = emotions["labels"]
+    if not emotions["windows"]:
+        return [dict(NEUTRAL) for _ in segments]
+    win = emotions["windows"]
+    order = np.argsort([w[0] for w in win], kind="stable")
+    starts = np.array([win[i][0] for i in order])
+    ends = np.array([win[i][1] for i in order])
+    speakers = [win[i][2] for i in order]
+    probs = np.asarray(emotions["probs"], dtype=np.float64)[order]
+    # Windows are at most this long, so anything starting earlier ends before the segment
+    longest = float((ends - starts).max())
+    mids = (starts + ends) / 2
+    by_speaker: dict[str, np.ndarray] = {}
+    for i, spk in enumerate(speakers):
+        by_speaker.setdefault(spk, []).append(i)
+    by_speaker = {spk: np.array(rows) for spk, rows in by_speaker.items()}
+    every = np.arange(len(speakers))
+
+    out = []
+    for seg in segments:
+        lo = np.searchsorted(starts, seg["start"] - longest, side="left")
+        hi = np.searchsorted(starts, seg["end"], side="left")
+        idx = np.arange(lo, hi)
+        overlap = np.minimum(ends[idx], seg["end"]) - np.maximum(starts[idx], seg["start"])
+        keep = overlap > 0
+        own = keep & np.array([speakers[i] == seg.get("speaker_id") for i in idx], dtype=bool)
+        if own.any():
+            keep = own
+        if not keep.any():
+            rows = by_speaker.get(seg.get("speaker_id"), every)
+            nearest = rows[np.argmin(np.abs(mids[rows] - (seg["start"] + seg["end"]) / 2))]
+            out.append(_label(probs[nearest], labels))
+            continue
+        out.append(_label(np.average(probs[idx[keep]], axis=0, weights=overlap[keep]), labels))
+    return out
+
+
+def emotion_sums(emotions: dict, start: float = 0.0, end: float = float("inf")) -> dict[str, list[float]]:
+    """
+    Seconds-weighted sums of window probabilities per speaker, for the windows whose
+    midpoint is in [start, end). Sums from different chunks of a recording add up.
+    """
+    sums: dict[str, np.ndarray] = {}
+    for (w_start, w_end, spk), p in zip(emotions["windows"], emotions["probs"]):
+        if start <= (w_start + w_end) / 2 < end:
+            sums[spk] = sums.get(spk, 0.0) + (w_end - w_start) * np.asarray(p, dtype=np.float64)
+    return {spk: v.tolist() for spk, v in sums.items()}
+
+
+def merge_emotion_sums(a: dict[str, list[float]], b: dict[str, list[float]]) -> dict[str, list[float]]:
+    out = dict(a)
+    for spk, v in b.items():
+        out[spk] = (np.asarray(out[spk]) + np.asarray(v)).tolist() if spk in out else v
+    return out
+
+
+def mood_summary(sums: list[float] | None, labels: list[str]) -> dict:
+    """Persona mood_summary from one speaker's sums: the dominant label and other frequent ones."""
+    if sums is None or not np.sum(sums):
+        return {"dominant": "neutral"}
+    shares = np.asarray(sums) / np.sum(sums)
+    ranked = np.argsort(-shares)
+    summary = {"dominant": labels[ranked[0]], "confidence": round(float(shares[ranked[0]]), 3)}
+    variation = [labels[k] for k in ranked[1:] if shares[k] >= VARIATION_MIN_SHARE]
+    if variation:
+        summary["variation"] = variation
+    return summary
+
+
+def emotion_trend(sums: dict[str, list[float]], labels: list[str]) -> dict[str, float]:
+    """global_emotion_trend: each label's share of all analyzed speech."""
+    if not sums:
+        return {"neutral": 1.0}
+    total = np.sum([np.asarray(v) for v in sums.values()], axis=0)
+    if not total.sum():
+        return {"neutral": 1.0}
+    shares = total / total.sum()
+    return {labels[k]: round(float(shares[k]), 3) for k in np.argsort(-shares)}
@@ -0,0 +1,159 @@
+"""
+Process-wide CPU governor.
+
+torch, CTranslate2 (faster-whisper), pyannote (torch) and librosa (numba,
+BLAS) each size their thread pools for the whole machine, so a few requests
+or stages running side by side oversubscribe the cores. The governor splits
+one CPU budget into slots:
+
+    ECHOLOGIA_CPU_BUDGET        cores to use (default and upper bound: the cores available)
+    ECHOLOGIA_MAX_HEAVY_STAGES  heavy stages running at once (default: budget / 4, at least 2)
+
+A heavy stage (Whisper decoding, diarization, a wav2vec2 batch) holds a slot
+while it runs, so at most ECHOLOGIA_MAX_HEAVY_STAGES of them run at the same
+time across every request in the process; the rest wait. Every library is
+sized to one slot, budget / ECHOLOGIA_MAX_HEAVY_STAGES threads:
+    torch         torch.set_num_threads, when the first stage that uses torch runs
+    CTranslate2   cpu_threads (and one worker per slot) when Whisper is loaded
+    BLAS, numba   threadpoolctl if installed; OMP/MKL/OPENBLAS/NUMBA_NUM_THREADS
+                  defaults for libraries imported later
+
+ECHOLOGIA_GOVERNOR=0 turns it off: stages aren't limited and the libraries
+keep their own thread counts.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from scheduler import cpu_budget
+
+GOVERNOR_ENV = "ECHOLOGIA_GOVERNOR"
+CPU_BUDGET_ENV = "ECHOLOGIA_CPU_BUDGET"
+MAX_HEAVY_STAGES_ENV = "ECHOLOGIA_MAX_HEAVY_STAGES"
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMBA_NUM_THREADS")
+
+
+class ResourceGovernor:
+    """Admission control for heavy stages, and the thread count each library gets."""
+
+    def __init__(self, budget: int | None = None, max_stages: int | None = None, enabled: bool = True):
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._running: dict[str, int] = {}
+        self._waiting = 0
+        self.stages_run = 0
+        self.wait_sec = 0.0
+        self.peak_running = 0
+        self.configure(budget, max_stages, enabled)
+
+    def configure(self, budget: int | None = None, max_stages: int | None = None, enabled: bool | None = None):
+        """
+        Change the budget, the slot count or whether the governor is on; what isn't
+        given keeps its setting. Whisper's thread count is fixed when it is loaded,
+        so unload it after changing this.
+        """
+        with self._cond:
+            self._budget_setting = budget or getattr(self, "_budget_setting", None)
+            self._stages_setting = max_stages or getattr(self, "_stages_setting", None)
+            available = cpu_budget()
+            self.budget = max(1, min(self._budget_setting or available, available))
+            self.max_stages = max(1, min(self._stages_setting or max(2, self.budget // 4), self.budget))
+            if enabled is not None:
+                self.enabled = enabled
+            # Resize the libraries on the next stage
+            self._torch_threads = self._blas_threads = None
+            self._cond.notify_all()
+        if self.enabled:
+            for var in _THREAD_ENV_VARS:
+                os.environ.setdefault(var, str(self.stage_threads))
+
+    @property
+    def stage_threads(self) -> int:
+        """Threads each heavy stage gets."""
+        return max(1, self.budget // self.max_stages)
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Hold a slot for heavy stage `name`, waiting until one is free. Nested use on
+        the same thread (a stage calling another governed function) reuses the slot.
+        Yields {"threads", "wait_sec"}.
+        """
+        if not self.enabled or getattr(self._local, "holding", False):
+            yield {"threads": self.stage_threads, "wait_sec": 0.0}
+            return
+
+        t0 = time.perf_counter()
+        with self._cond:
+            self._waiting += 1
+            while self.running >= self.max_stages:
+                self._cond.wait()
+            self._waiting -= 1
+            self._running[name] = self._running.get(name, 0) + 1
+            self.peak_running = max(self.peak_running, self.running)
+            wait = time.perf_counter() - t0
+            self.wait_sec += wait
+            self.stages_run += 1
+        self._apply_library_threads()
+        self._local.holding = True
+        try:
+            yield {"threads": self.stage_threads, "wait_sec": wait}
+        finally:
+            self._local.holding = False
+            with self._cond:
+                self._running[name] -= 1
+                self._cond.notify()
+
+    def _apply_library_threads(self):
+        n = self.stage_threads
+        # torch's intra-op pool is process-wide; only touch it once torch is in use
+        torch = sys.modules.get("torch")
+        if torch is not None and self._torch_threads != n:
+            torch.set_num_threads(n)
+            self._torch_threads = n
+        if self._blas_threads != n:
+            try:
+                from threadpoolctl import threadpool_limits
+                threadpool_limits(limits=n)
+            except ImportError:
+                pass
+            self._blas_threads = n
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "cpu_budget": self.budget,
+                "max_heavy_stages": self.max_stages,
+                "stage_threads": self.stage_threads,
+                "running": {name: n for name, n in self._running.items() if n},
+                "waiting": self._waiting,
+                "peak_running": self.peak_running,
+                "stages_run": self.stages_run,
+                "wait_sec": round(self.wait_sec, 3),
+            }
+
+
+_governor: ResourceGovernor | None = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> ResourceGovernor:
+    """The process-wide governor, configured from the environment."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = ResourceGovernor(
+                    budget=int(os.environ.get(CPU_BUDGET_ENV, 0)) or None,
+                    max_stages=int(os.environ.get(MAX_HEAVY_STAGES_ENV, 0)) or None,
+                    enabled=os.environ.get(GOVERNOR_ENV, "1") != "0",
+                )
+    return _governor
@@ -0,0 +1,503 @@
+"""
+Append mode for recordings that keep growing, keyed by session.
+
+Capture boxes upload the same recording every few minutes, a little longer
+each time. Instead of running the whole file again, process_audio_append()
+keeps what earlier updates found and only processes the new tail plus an
+overlap:
+
+    |------------ committed ------------|-- provisional --|
+                                  C - overlap/2   C       end of this upload
+
+Everything before the commit point C is final: its segments, talk
+statistics, age/gender, emotion, language counts and names are stored with
+the session. An update decodes the recording from C - overlap/2 on, runs
+VAD, ASR and diarization on that tail, maps pyannote's labels onto the
+session's spk_XX IDs (overlap with the turns stored for the region before C
+first, then the SpeakerTracker centroids) and moves C to overlap/2 before
+the new end. The part after the new C is only reported, not stored; the
+next update processes it again with more context. final=True commits
+everything. The work per update is the new audio plus one overlap; talk
+statistics are merged with merge_speaker_analytics, the LLM only sees the
+new segments and a voice is only looked up in the speaker index once. An
+update answers with only the segments it found (committed and provisional)
+plus a cursor into the committed list, so neither the response nor the
+work grows with the length of the recording.
+
+Sessions live under ECHOLOGIA_SESSION_DIR (default: backend/sessions), one
+directory per session:
+    state.json       everything above except the segments, rewritten atomically
+    segments.jsonl   committed segments, append-only
+and one lock file per session key outside them, so deleting a session never
+removes a lock another update is waiting on:
+    .locks/<key>.lock   an exclusive flock held for the whole update
+"""
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from age_gender_estimation import (
+    MAX_SECONDS_PER_SPEAKER,
+    age_gender_attributes,
+    merge_age_gender_predictions,
+    predict_speaker_age_gender,
+)
+from analytics import merge_speaker_analytics, speaker_analytics
+from audio_buffer import SAMPLE_RATE, AudioBuffer, stream_audio
+from emotion import (
+    emotion_sums,
+    emotion_trend,
+    merge_emotion_sums,
+    mood_summary,
+    segment_emotions,
+    voice_budget,
+    window_emotions,
+)
+from instrumentation import PIPELINE_RUNS, Timings
+from llm_populate_entries import UNKNOWN, extract_speaker_names_with_llm
+from model_registry import age_gender_description, asr_description, emotion_description, registry
+from processor import (
+    build_personas,
+    diarize_with_pyannote,
+    format_segment,
+    split_segments_by_speaker,
+    transcribe_audio_simple,
+)
+from speaker_index import recognize_personas
+from speaker_tracking import SpeakerTracker, overlap_votes
+from speech_features import extract_features, speech_windows
+from streaming import OVERLAP_SEC, _shift
+from vad import detect_speech
+
+SESSION_DIR_ENV = "ECHOLOGIA_SESSION_DIR"
+DEFAULT_SESSION_DIR = Path(__file__).parent.parent / "sessions"
+APPEND_OVERLAP_SEC = float(os.environ.get("ECHOLOGIA_APPEND_OVERLAP_SEC", OVERLAP_SEC))
+# A recording this much shorter than the last update is not the same recording
+SHRINK_TOLERANCE_SEC = 0.5
+_SESSION_KEY = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+def _cut(turns: list[dict], start: float, end: float) -> list[dict]:
+    """Turns clipped to [start, end); those that began earlier are marked "continued"."""
+    out = []
+    for t in turns:
+        s, e = max(t["start"], start), min(t["end"], end)
+        if e > s:
+            out.append(dict(t, start=s, end=e, continued=t["start"] < start))
+    return out
+
+
+def _last_speaker(turns: list[dict], before: str | None) -> str | None:
+    """Speaker of the last turn that started in `turns`, for the next part's analytics."""
+    started = [t for t in turns if not t.get("continued")]
+    # Same tie-break as speaker_analytics' sweep: of equal starts the greatest ID is last
+    return max(started, key=lambda t: (t["start"], t["speaker_id"]))["speaker_id"] if started else before
+
+
+class SessionStore:
+    """Append-mode session state on disk, one directory per session."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, key: str) -> Path:
+        if not _SESSION_KEY.match(key) or key.startswith("."):
+            raise ValueError(f"Invalid session key {key!r}: use letters, digits, '.', '_' and '-', not starting with '.'")
+        return self.root / key
+
+    @contextmanager
+    def locked(self, key: str):
+        """Hold the session for an update; other threads and processes wait."""
+        self._dir(key)
+        locks = self.root / ".locks"
+        locks.mkdir(exist_ok=True)
+        with open(locks / f"{key}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with open(self._dir(key) / "state.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def segments(self, key: str, state: dict, since: int = 0) -> list[dict]:
+        """
+        The committed segments from index `since` on; lines past what state.json
+        records are from an interrupted update.
+        """
+        out = []
+        try:
+            with open(self._dir(key) / "segments.jsonl", "rb") as f:
+                for n, line in enumerate(f.read(state["segments_bytes"]).splitlines()):
+                    if n >= since:
+                        out.append(json.loads(line))
+        except OSError:
+            pass
+        return out
+
+    def save(self, key: str, state: dict, new_segments: list[dict]):
+        """Append `new_segments`, then replace state.json, which is what makes the update count."""
+        path = self._dir(key)
+        path.mkdir(exist_ok=True)
+        with open(path / "segments.jsonl", "ab") as f:
+            f.truncate(state.get("segments_bytes", 0))
+            f.seek(0, os.SEEK_END)
+            for seg in new_segments:
+                f.write((json.dumps(seg) + "\n").encode())
+            state["segments_bytes"] = f.tell()
+        fd, tmp = tempfile.mkstemp(dir=path, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path / "state.json")
+
+    def delete(self, key: str) -> bool:
+        path = self._dir(key)
+        # Not while an update is writing to it; the lock file itself stays
+        with self.locked(key):
+            if not (path / "state.json").exists():
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def describe(self, key: str) -> dict | None:
+        """Progress of a session, without the speaker state."""
+        state = self.load(key)
+        if state is None:
+            return None
+        return {
+            "session_key": key,
+            "session_id": state["session_id"],
+            "updates": state["updates"],
+            "duration_sec": round(state["duration_sec"], 1),
+            "committed_sec": round(state["committed_sec"], 1),
+            "final": state["final"],
+            "segments": state["segment_count"],
+            "speakers": sorted(state["tracker"]["weights"]),
+            "created": state["created"],
+            "updated": state["updated"],
+        }
+
+
+_store: SessionStore | None = None
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide session store."""
+    global _store
+    if _store is None:
+        _store = SessionStore(os.environ.get(SESSION_DIR_ENV) or DEFAULT_SESSION_DIR)
+    return _store
+
+
+def _new_state(key: str, num_speakers: int | None) -> dict:
+    now = datetime.now()
+    return {
+        "session_key": key,
+        "session_id": f"session_{now.strftime('%Y_%m_%d_%H%M%S')}",
+        "created": now.isoformat() + "Z",
+        "updated": None,
+        "updates": 0,
+        "num_speakers": num_speakers,
+        "overlap_sec": APPEND_OVERLAP_SEC,
+        "duration_sec": 0.0,
+        "committed_sec": 0.0,
+        "final": False,
+        "speech_sec": 0.0,
+        "tracker": SpeakerTracker().to_dict(),
+        "shared_turns": [],
+        "talk_stats": {},
+        "last_speaker": None,
+        "lang_counts": {},
+        "languages": {},
+        "age_gender": {},
+        "emotion_labels": None,
+        "emotion_sums": {},
+        "voices": {},
+        "names": {},
+        "segment_count": 0,
+        "segments_bytes": 0,
+    }
+
+
+def process_audio_append(
+    session_key: str,
+    audio_file: str,
+    num_speakers: int | None = None,
+    final: bool = False,
+) -> dict:
+    """
+    Process the part of a growing recording that earlier updates of `session_key`
+    haven't committed yet. The output has the shape of process_audio_to_personas with
+    personas and statistics for the whole recording so far, but "segments" holds only
+    this update's: committed ones first, then provisional ones the next update may
+    revise. meta.append.segment_cursor is the index of the first of them in the
+    session's committed list (SessionStore.segments returns the list from any index).
+
+    Args:
+        session_key: Caller's name for the recording; a new key starts a new session
+        audio_file: The recording as it is now (earlier audio unchanged, new audio at the end)
+        num_speakers: Speakers per update if known; fixed by the first update
+        final: The recording is complete; commit everything
+
+    Raises:
+        ValueError: invalid key, or the recording is shorter than at the last update
+    """
+    store = get_session_store()
+    with store.locked(session_key):
+        state = store.load(session_key) or _new_state(session_key, num_speakers)
+        try:
+            output = _append(store, state, audio_file, final)
+        except Exception:
+            PIPELINE_RUNS.inc(status="error")
+            raise
+    PIPELINE_RUNS.inc(status="ok")
+    return output
+
+
+def _decode_tail(audio_file: str, start: float, end: float) -> np.ndarray:
+    """Samples of [start, end) seconds, decoded from `start` on rather than from the top."""
+    blocks = list(stream_audio(audio_file, SAMPLE_RATE, offset=start))
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return samples[:int(round((end - start) * SAMPLE_RATE))]
+
+
+def _append(store: SessionStore, state: dict, audio_file: str, final: bool) -> dict:
+    import librosa
+
+    timings = Timings()
+    key = state["session_key"]
+    overlap = state["overlap_sec"]
+    prev_total, committed = state["duration_sec"], state["committed_sec"]
+
+    total = float(librosa.get_duration(path=audio_file))
+    if total < prev_total - SHRINK_TOLERANCE_SEC:
+        raise ValueError(
+            f"Recording is {total:.1f}s, shorter than the {prev_total:.1f}s of the last update; "
+            "start a new session for a different recording"
+        )
+    new_committed = total if final else max(committed, total - overlap / 2)
+    win_start = max(0.0, committed - overlap / 2)
+    print(f"🔁 Session {key}: update {state['updates'] + 1}, "
+          f"processing {win_start:.0f}-{total:.0f}s of {total:.0f}s (committed up to {committed:.0f}s)")
+
+    # 1. Decode and transcribe only the tail
+    with timings.span("decode", total - win_start):
+        samples, sr = _decode_tail(audio_file, win_start, total), SAMPLE_RATE
+        buffer = AudioBuffer(samples, sr)
+    try:
+        with timings.span("vad", buffer.duration):
+            regions = detect_speech(samples, sr)
+        with timings.span("asr", regions.speech_sec):
+            asr_segments, info = transcribe_audio_simple(buffer, regions)
+        with timings.span("diarize", regions.speech_sec):
+            local_turns, embeddings = diarize_with_pyannote(
+                buffer, num_speakers=state["num_speakers"], speech_regions=regions, return_embeddings=True
+            )
+
+        # 2. Local labels -> the session's IDs: the overlap with stored turns first, then the centroids
+        tracker = SpeakerTracker.from_dict(state["tracker"])
+        durations = defaultdict(float)
+        for t in local_turns:
+            durations[t["speaker_id"]] += t["end"] - t["start"]
+        votes = (
+            overlap_votes(_shift(local_turns, win_start), state["shared_turns"], win_start, prev_total)
+            if committed > 0 else {}
+        )
+        mapping = tracker.match(embeddings, dict(durations), votes)
+        window_turns = _shift(local_turns, win_start, mapping)
+        commit_turns = _cut(window_turns, committed, new_committed)
+        tail_turns = _cut(window_turns, new_committed, total)
+
+        # 3. Voice: age/gender from the committed part (within each speaker's remaining
+        # budget); with an emotion head, emotion for everything new within its budget
+        with timings.span("voice"):
+            predictions = dict(state["age_gender"])
+            emotions = None
+            try:
+                speakers = sorted(set(mapping.values()))
+                budgets = {
+                    gid: MAX_SECONDS_PER_SPEAKER - predictions.get(gid, {}).get("analyzed_sec", 0.0)
+                    for gid in speakers
+                }
+                with_emotion = registry.available("emotion")
+                local_commit = _shift(commit_turns, -win_start)
+                windows = speech_windows(
+                    local_commit, speakers, sr, len(samples),
+                    max_seconds_per_speaker=voice_budget(budgets) if with_emotion else budgets,
+                )
+                n_commit = len(windows)
+                if with_emotion:
+                    windows += speech_windows(
+                        _shift(tail_turns, -win_start), speakers, sr, len(samples), max_seconds_per_speaker=voice_budget(0.0),
+                    )
+                bank = extract_features(samples, sr, windows)
+                fresh = predict_speaker_age_gender(
+                    samples, sr, local_commit, speakers, max_seconds_per_speaker=budgets,
+                    features=bank.take(0, n_commit),
+                )
+                for gid, pred in fresh.items():
+                    predictions[gid] = merge_age_gender_predictions(predictions.get(gid), pred)
+                if with_emotion:
+                    emotions = window_emotions(bank)
+                    emotions["windows"] = [[s + win_start, e + win_start, spk] for s, e, spk in emotions["windows"]]
+            except Exception as e:
+                print(f"⚠️ Voice analysis failed for session {key}: {e}")
+
+        # 4. New segments: committed up to the new commit point, provisional after it
+        with timings.span("assign_speakers"):
+            language = info.language
+            segments = [
+                seg for seg in split_segments_by_speaker(_shift(asr_segments, win_start), window_turns)
+                if committed <= (seg["start"] + seg["end"]) / 2 < total
+            ]
+            if emotions:
+                for seg, emotion in zip(segments, segment_emotions(segments, emotions)):
+                    seg["emotion"] = emotion
+            formatted = [format_segment(seg, language) for seg in segments]
+            formatted.sort(key=lambda x: x["start"])
+            commit_segments = [s for s in formatted if (s["start"] + s["end"]) / 2 < new_committed]
+            tail_segments = formatted[len(commit_segments):]
+    finally:
+        buffer.close()
+        del samples
+
+    # 5. Merge into the session: the committed part is stored, the tail only reported
+    with timings.span("merge"):
+        talk_commit = merge_speaker_analytics(
+            state["talk_stats"], speaker_analytics(commit_turns, state["last_speaker"])
+        )
+        last_speaker = _last_speaker(commit_turns, state["last_speaker"])
+        talk_stats = merge_speaker_analytics(talk_commit, speaker_analytics(tail_turns, last_speaker))
+
+        lang_commit = defaultdict(Counter, {spk: Counter(c) for spk, c in state["lang_counts"].items()})
+        languages_commit = Counter(state["languages"])
+        if language:
+            languages_commit[language] += 1
+        lang_counts = defaultdict(Counter)
+        for seg in commit_segments:
+            lang_commit[seg["speaker_id"]][language or "und"] += 1
+        for spk, counts in lang_commit.items():
+            lang_counts[spk].update(counts)
+        for seg in tail_segments:
+            lang_counts[seg["speaker_id"]][language or "und"] += 1
+        session_language = languages_commit.most_common(1)[0][0] if languages_commit else language
+
+        emotion_labels = emotions["labels"] if emotions else state["emotion_labels"]
+        sums_commit = state["emotion_sums"]
+        sums = sums_commit
+        if emotions:
+            sums_commit = merge_emotion_sums(sums_commit, emotion_sums(emotions, committed, new_committed))
+            sums = merge_emotion_sums(sums_commit, emotion_sums(emotions, new_committed))
+
+        speech_commit = state["speech_sec"] + sum(
+            max(0.0, min(e / sr + win_start, new_committed) - max(s / sr + win_start, committed))
+            for s, e in regions.regions
+        )
+
+    # 6. Personas from the merged totals; only speakers new to the session go to the speaker index
+    with timings.span("personas"):
+        personas = build_personas(talk_stats, lang_counts, session_language)
+        voices = dict(state["voices"])
+        centroids = {gid: tracker.centroid(gid) for gid in tracker.weights}
+        for persona in personas:
+            gid = persona["speaker_id"]
+            if gid in predictions:
+                persona.update(age_gender_attributes(predictions[gid]))
+            if emotion_labels:
+                persona["mood_summary"] = mood_summary(sums.get(gid), emotion_labels)
+        unseen = [p for p in personas if p["speaker_id"] not in voices]
+        recognize_personas(unseen, centroids)
+        for persona in personas:
+            gid = persona["speaker_id"]
+            if "voice" in persona:
+                voices[gid] = persona["voice"]
+            elif gid in voices:
+                persona["voice"] = dict(voices[gid], enrolled=False)
+                if centroids.get(gid) is not None:
+                    persona["embedding_vector"] = [round(float(x), 6) for x in centroids[gid]]
+
+    # 7. Names from the new segments; a name found earlier sticks
+    with timings.span("llm_names"):
+        cache_report = {}
+        named = extract_speaker_names_with_llm(formatted, personas, cache_report)
+        names = dict(state["names"])
+        for persona in named:
+            if names.get(persona["speaker_id"], UNKNOWN) == UNKNOWN:
+                names[persona["speaker_id"]] = persona["name"]
+            persona["name"] = names[persona["speaker_id"]]
+        personas = named
+
+    # 8. Store the committed part, then answer with what this update found
+    cursor = state["segment_count"]
+    state.update(
+        updated=datetime.now().isoformat() + "Z",
+        updates=state["updates"] + 1,
+        duration_sec=total,
+        committed_sec=new_committed,
+        final=final,
+        speech_sec=speech_commit,
+        tracker=tracker.to_dict(),
+        shared_turns=_cut(window_turns, max(0.0, new_committed - overlap / 2), total),
+        talk_stats=talk_commit,
+        last_speaker=last_speaker,
+        lang_counts={spk: dict(c) for spk, c in lang_commit.items()},
+        languages=dict(languages_commit),
+        age_gender=predictions,
+        emotion_labels=emotion_labels,
+        emotion_sums=sums_commit,
+        voices=voices,
+        names={gid: name for gid, name in names.items() if name != UNKNOWN},
+        segment_count=state["segment_count"] + len(commit_segments),
+    )
+    with timings.span("save"):
+        store.save(state["session_key"], state, commit_segments)
+
+    return {
+        "session_id": state["session_id"],
+        "meta": {
+            "duration_sec": round(total, 1),
+            "sampling_rate": SAMPLE_RATE,
+            "model_asr": asr_description(),
+            "model_diarization": "pyannote/speaker-diarization-3.1",
+            "model_age_gender": age_gender_description(),
+            "model_emotion": emotion_description(),
+            "date_processed": datetime.now().isoformat() + "Z",
+            "mode": "append",
+            "append": {
+                "session_key": state["session_key"],
+                "update": state["updates"],
+                "new_audio_sec": round(total - prev_total, 2),
+                "processed_from_sec": round(win_start, 2),
+                "processed_sec": round(total - win_start, 2),
+                "committed_sec": round(new_committed, 2),
+                "final": final,
+                "committed_speech_sec": round(speech_commit, 2),
+                "new_segments": len(formatted),
+                "segment_cursor": cursor,
+                "committed_segments": len(commit_segments),
+            },
+            "vad": regions.summary(),
+            "cache": cache_report,
+            "timings": timings.to_list(),
+        },
+        "segments": formatted,
+        "personas": personas,
+        "hierarchy": sorted(personas, key=lambda x: x["speaking_time_sec"], reverse=True),
+        "global_emotion_trend": emotion_trend(sums, emotion_labels) if emotion_labels else {"neutral": 1.0},
+    }
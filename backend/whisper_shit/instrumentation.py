@@ -0,0 +1,194 @@
+"""
+Timing spans and process-wide metrics.
+
+A Timings object collects the spans of one pipeline run: name, start offset,
+duration, seconds of audio the step covered and how much resident memory
+changed, and ends up in output["meta"]["timings"]. Every span is also
+folded into process-wide Prometheus-style metrics (stage duration and memory
+histograms, run and audio-second counters), which the API renders in the
+text exposition format at /api/audio/metrics.
+
+Counters, gauges and histograms are a few dozen lines each and keep the
+service free of a metrics dependency.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if os.uname().sysname == "Linux" else peak / (1024 * 1024)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...]):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: dict[tuple, list] = {}   # labels -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {c}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "echologia_stage_duration_seconds", "Wall time of a pipeline stage",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+STAGE_MEMORY = Histogram(
+    "echologia_stage_memory_delta_mb", "Change in resident memory over a pipeline stage",
+    (0, 10, 50, 100, 250, 500, 1000, 2000, 4000),
+)
+STAGE_RUNS = Counter("echologia_stage_runs_total", "Pipeline stage runs by outcome")
+STAGE_AUDIO_SECONDS = Counter("echologia_stage_audio_seconds_total", "Seconds of audio processed by each stage")
+PIPELINE_RUNS = Counter("echologia_pipeline_runs_total", "Complete pipeline runs by outcome")
+QUEUE_DEPTH = Gauge("echologia_job_queue_depth", "Jobs queued or running")
+MODEL_LOADED = Gauge("echologia_model_loaded", "1 if the shared model is loaded")
+MODEL_LOAD_SECONDS = Gauge("echologia_model_load_seconds", "Time it took to load the shared model")
+MODEL_MEMORY_MB = Gauge("echologia_model_memory_mb", "Resident memory added by loading the shared model")
+PROCESS_RSS_MB = Gauge("echologia_process_resident_memory_mb", "Resident memory of the API process")
+
+METRICS = [
+    STAGE_SECONDS, STAGE_MEMORY, STAGE_RUNS, STAGE_AUDIO_SECONDS, PIPELINE_RUNS,
+    QUEUE_DEPTH, MODEL_LOADED, MODEL_LOAD_SECONDS, MODEL_MEMORY_MB, PROCESS_RSS_MB,
+]
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    PROCESS_RSS_MB.set(rss_mb())
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class Timings:
+    """Spans of one pipeline run. Safe to use from the scheduler's worker threads."""
+
+    def __init__(self):
+        self.spans: list[dict] = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, audio_sec: float | None = None):
+        """
+        Time the block as stage `name`. `audio_sec` is how much audio the stage
+        covered (the whole recording, or only its speech for VAD-gated stages);
+        if it is only known inside the block, set it on the yielded dict.
+        RSS is process-wide, so stages that run side by side share their deltas.
+        """
+        info = {"audio_sec": audio_sec}
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield info
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            delta = rss_mb() - rss_before
+            audio_sec = info["audio_sec"]
+            span = {
+                "name": name,
+                "start_sec": round(start - self._t0, 3),
+                "duration_sec": round(duration, 3),
+                "audio_sec": None if audio_sec is None else round(audio_sec, 2),
+                "rss_delta_mb": round(delta, 1),
+                "status": status,
+            }
+            with self._lock:
+                self.spans.append(span)
+            STAGE_SECONDS.observe(duration, stage=name)
+            STAGE_MEMORY.observe(delta, stage=name)
+            STAGE_RUNS.inc(stage=name, status=status)
+            if audio_sec:
+                STAGE_AUDIO_SECONDS.inc(audio_sec, stage=name)
+
+    def to_list(self) -> list[dict]:
+        """Spans in start order."""
+        with self._lock:
+            return sorted(self.spans, key=lambda s: s["start_sec"])
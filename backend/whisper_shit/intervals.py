@@ -0,0 +1,61 @@
+"""
+Interval joins between transcript spans and diarization turns.
+
+`overlap_join` finds, for every query interval (an ASR segment or a single
+word), the diarization speaker with the largest temporal overlap. Both sides
+are sorted once and swept with two pointers plus a min-heap of the turns that
+are still open, so the cost is O((N + M) log M + K) where K is the number of
+overlapping pairs, instead of comparing every query against every turn.
+"""
+
+import heapq
+
+
+def overlap_join(queries: list[tuple[float, float]], diar_segments: list[dict]) -> list[str | None]:
+    """
+    Max-overlap speaker for each (start, end) query.
+
+    Matches the brute-force rule exactly: the turn with the strictly largest
+    positive overlap wins, ties go to the turn that comes first in
+    `diar_segments`, and a query that overlaps no turn gets None.
+
+    Args:
+        queries: (start, end) pairs in seconds, in any order
+        diar_segments: Diarization turns with start, end and speaker_id
+
+    Returns:
+        speaker_id (or None) per query, in the order of `queries`
+    """
+    result: list[str | None] = [None] * len(queries)
+    if not queries or not diar_segments:
+        return result
+
+    turns = sorted(
+        ((float(d["start"]), float(d["end"]), i, d["speaker_id"]) for i, d in enumerate(diar_segments)),
+        key=lambda t: t[0],
+    )
+    order = sorted(range(len(queries)), key=lambda q: float(queries[q][0]))
+
+    active: list[tuple[float, int]] = []  # (end, index into turns)
+    next_turn = 0
+    for q in order:
+        q_start, q_end = float(queries[q][0]), float(queries[q][1])
+
+        # Open every turn that starts before this query ends
+        while next_turn < len(turns) and turns[next_turn][0] < q_end:
+            heapq.heappush(active, (turns[next_turn][1], next_turn))
+            next_turn += 1
+        # Queries arrive by start time, so turns ending before this one starts are done for good
+        while active and active[0][0] <= q_start:
+            heapq.heappop(active)
+
+        best_ov = 0.0
+        best_idx = -1
+        best_spk = None
+        for _, k in active:
+            t_start, t_end, orig_idx, spk = turns[k]
+            ov = min(q_end, t_end) - max(q_start, t_start)
+            if ov > best_ov or (ov == best_ov and best_spk is not None and orig_idx < best_idx):
+                best_ov, best_idx, best_spk = ov, orig_idx, spk
+        result[q] = best_spk
+    return result
@@ -0,0 +1,230 @@
+"""
+Live transcription and diarization of a PCM stream.
+
+LiveSession is transport-agnostic: feed it 16 kHz mono PCM as it arrives and
+it returns events to send back. Every `step_sec` of new audio, the
+uncommitted tail is re-transcribed with the shared faster-whisper model.
+Segments that end far enough behind the live edge become final, and the rest
+is reported as a partial hypothesis. The rolling buffer is re-diarized every
+`rediarize_sec` with the shared pyannote pipeline, and SpeakerTracker keeps
+speaker IDs stable between re-diarizations. Memory and the work per step are
+bounded by `max_buffer_sec`: silence moves the commit point along with the
+live edge, and a segment that stays open too long is cut at a word boundary.
+
+Every event carries `audio_end`, the stream time (seconds) of the newest audio
+it accounts for, so a client can measure end-to-end latency.
+"""
+
+import time
+
+import numpy as np
+
+from audio_buffer import SAMPLE_RATE, AudioBuffer
+from intervals import overlap_join
+from processor import diarize_with_pyannote, transcribe_audio_simple
+from speaker_tracking import SpeakerTracker, overlap_votes
+from vad import detect_speech
+
+STEP_SEC = 1.0            # new audio between ASR passes; the floor on partial latency
+COMMIT_MARGIN_SEC = 2.0   # segments ending this far behind the live edge are final
+REDIARIZE_SEC = 5.0       # new audio between diarization passes
+MAX_BUFFER_SEC = 30.0     # rolling context kept for diarization
+MAX_UNCOMMITTED_SEC = 20.0
+
+
+def _cut_segment(seg: dict, before: float) -> tuple[list[dict], list[dict]]:
+    """
+    Split one over-long segment at the last word ending by `before`: ([committed part], [rest]).
+    Without word timestamps the whole segment is committed.
+    """
+    words = seg.get("words") or []
+    head = [w for w in words if w["end"] <= before]
+    if not words or not head:
+        return [seg], []
+    tail = words[len(head):]
+    committed = dict(seg, end=head[-1]["end"], text="".join(w["word"] for w in head).strip(), words=head)
+    if not tail:
+        return [committed], []
+    rest = dict(seg, start=tail[0]["start"], text="".join(w["word"] for w in tail).strip(), words=tail)
+    return [committed], [rest]
+
+
+class LiveSession:
+    """State of one live stream."""
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        step_sec: float = STEP_SEC,
+        commit_margin_sec: float = COMMIT_MARGIN_SEC,
+        rediarize_sec: float = REDIARIZE_SEC,
+        max_buffer_sec: float = MAX_BUFFER_SEC,
+        num_speakers: int | None = None,
+    ):
+        self.sr = sample_rate
+        self.step_sec = step_sec
+        self.commit_margin_sec = commit_margin_sec
+        self.rediarize_sec = rediarize_sec
+        self.max_buffer_sec = max_buffer_sec
+        self.num_speakers = num_speakers
+
+        self.tracker = SpeakerTracker()
+        self.turns: list[dict] = []      # global-labelled turns inside the rolling buffer
+        self.speech_sec: dict[str, float] = {}
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0           # stream sample index of self._buffer[0]
+        self._received = 0               # samples received so far
+        self._last_step = 0
+        self._last_diar = 0
+        self._diarized_until = 0.0       # stream seconds covered by the latest diarization
+        self._committed_until = 0.0      # stream seconds already emitted as final segments
+        self._partial_bytes = b""        # end of a frame that split a sample, completed by the next one
+
+    @property
+    def audio_sec(self) -> float:
+        return self._received / self.sr
+
+    def feed(self, data: bytes | np.ndarray, dtype: str = "int16") -> list[dict]:
+        """Append PCM (int16 or float32 bytes, or a float array) and run a step if enough audio arrived."""
+        if isinstance(data, np.ndarray):
+            samples = data.astype(np.float32, copy=False)
+        else:
+            # Clients may chunk by byte count, so a frame can end mid-sample
+            data = self._partial_bytes + data
+            usable = len(data) - len(data) % (4 if dtype == "float32" else 2)
+            data, self._partial_bytes = data[:usable], data[usable:]
+            if dtype == "float32":
+                samples = np.frombuffer(data, dtype=np.float32)
+            else:
+                samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._received += len(samples)
+        if self._received - self._last_step < self.step_sec * self.sr:
+            return []
+        return self._step(final=False)
+
+    def flush(self) -> list[dict]:
+        """End of stream: commit everything that is left."""
+        events = self._step(final=True) if self._received > self._last_step or self._committed_until < self.audio_sec else []
+        events.append({"type": "done", "audio_end": round(self.audio_sec, 3), "speakers": self._speaker_summary()})
+        return events
+
+    def _view(self, start_sec: float) -> np.ndarray:
+        idx = max(0, int(start_sec * self.sr) - self._buffer_start)
+        return self._buffer[idx:]
+
+    def _step(self, final: bool) -> list[dict]:
+        t0 = time.perf_counter()
+        self._last_step = self._received
+        now = self.audio_sec
+        events: list[dict] = []
+
+        # Re-transcribe everything not yet final
+        tail_start = self._committed_until
+        tail = self._view(tail_start)
+        segments = []
+        if len(tail) >= int(0.5 * self.sr):
+            regions = detect_speech(tail, self.sr)
+            if regions.regions:
+                segments, _ = transcribe_audio_simple(AudioBuffer(tail, self.sr), regions)
+        segments = [dict(s, start=s["start"] + tail_start, end=s["end"] + tail_start) for s in segments]
+
+        # Decide what becomes final; a long monologue is cut so the tail stays bounded
+        commit_before = float("inf") if final else now - self.commit_margin_sec
+        to_commit = [s for s in segments if s["end"] <= commit_before]
+        if not final and not to_commit and now - tail_start > min(MAX_UNCOMMITTED_SEC, self.max_buffer_sec):
+            if len(segments) > 1:
+                to_commit = segments[:-1]
+            elif segments:
+                to_commit, rest = _cut_segment(segments[0], commit_before)
+                segments = to_commit + rest
+        pending = segments[len(to_commit):]
+
+        if (final or self._received - self._last_diar >= self.rediarize_sec * self.sr
+                or (to_commit and to_commit[-1]["end"] > self._diarized_until)):
+            self._rediarize()
+
+        speakers = overlap_join([(s["start"], s["end"]) for s in to_commit], self.turns)
+        for seg, spk in zip(to_commit, speakers):
+            events.append({
+                "type": "final",
+                "start": round(seg["start"], 2),
+                "end": round(seg["end"], 2),
+                "speaker_id": spk or self._last_speaker(),
+                "text": seg["text"],
+                "audio_end": round(now, 3),
+            })
+            self._committed_until = seg["end"]
+        if final:
+            self._committed_until = now
+        elif not pending:
+            # Nothing is being said in the tail; don't re-transcribe the silence next step
+            self._committed_until = max(self._committed_until, commit_before)
+        else:
+            self._committed_until = max(self._committed_until, min(pending[0]["start"], commit_before))
+
+        if pending:
+            events.append({
+                "type": "partial",
+                "start": round(pending[0]["start"], 2),
+                "end": round(pending[-1]["end"], 2),
+                "text": " ".join(s["text"] for s in pending),
+                "audio_end": round(now, 3),
+            })
+
+        self._trim()
+        compute_ms = round(1000 * (time.perf_counter() - t0), 1)
+        for e in events:
+            e["compute_ms"] = compute_ms
+        return events
+
+    def _rediarize(self):
+        """Diarize the rolling buffer and relabel its turns with stable global IDs."""
+        self._last_diar = self._received
+        window_start = self._buffer_start / self.sr
+        if len(self._buffer) < int(1.0 * self.sr):
+            return
+        try:
+            local, embeddings = diarize_with_pyannote(
+                AudioBuffer(self._buffer, self.sr), num_speakers=self.num_speakers, return_embeddings=True
+            )
+        except Exception as e:
+            print(f"⚠️  Live diarization failed: {e}")
+            return
+
+        local = [dict(t, start=t["start"] + window_start, end=t["end"] + window_start) for t in local]
+        durations: dict[str, float] = {}
+        for t in local:
+            durations[t["speaker_id"]] = durations.get(t["speaker_id"], 0.0) + t["end"] - t["start"]
+        votes = overlap_votes(local, self.turns, window_start, self._diarized_until)
+        mapping = self.tracker.match(embeddings, durations, votes)
+
+        # Speech time is counted once, for the audio this pass adds
+        for t in local:
+            s = max(t["start"], self._diarized_until)
+            if t["end"] > s:
+                gid = mapping[t["speaker_id"]]
+                self.speech_sec[gid] = self.speech_sec.get(gid, 0.0) + t["end"] - s
+
+        self.turns = [dict(t, speaker_id=mapping[t["speaker_id"]]) for t in local]
+        self._diarized_until = self.audio_sec
+
+    def _last_speaker(self) -> str:
+        return self.turns[-1]["speaker_id"] if self.turns else "spk_01"
+
+    def _trim(self):
+        """Keep the last max_buffer_sec; the tail is force-committed well before it would be dropped."""
+        keep_from = self.audio_sec - self.max_buffer_sec
+        if self._committed_until < keep_from:
+            print(f"⚠️  Live tail longer than {self.max_buffer_sec:.0f}s; dropping uncommitted audio before {keep_from:.1f}s")
+            self._committed_until = keep_from
+        drop = int(keep_from * self.sr) - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:].copy()
+            self._buffer_start += drop
+            start_sec = self._buffer_start / self.sr
+            self.turns = [t for t in self.turns if t["end"] > start_sec]
+
+    def _speaker_summary(self) -> dict:
+        return {gid: round(sec, 2) for gid, sec in sorted(self.speech_sec.items())}
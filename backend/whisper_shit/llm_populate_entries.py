@@ -1,72 +1,252 @@
-import os
+"""
+Speaker names from the transcript, via an LLM.
+
+Only the parts of the transcript that can carry a name are sent: segments
+with an introduction or address cue ("my name is", "thanks", a capitalized
+word mid-sentence) plus their neighbours, and each speaker's first lines so
+every speaker shows up at least once, all within LLM_TOKEN_BUDGET. The
+excerpts are split into chunks that are sent as concurrent async requests,
+and the per-chunk answers are merged by vote. Each chunk's answer goes
+through the result cache, keyed by the hash of the chunk's transcript.
+
+ECHOLOGIA_LLM_BACKEND=stub swaps the API for a local pattern matcher, so
+tests and benchmarks run offline; the OpenAI client is only created when a
+request is actually made.
+"""
+
+import asyncio
 import json
-from openai import OpenAI
+import os
+import re
+from collections import Counter, defaultdict
+
 from dotenv import load_dotenv
 
+from result_cache import fingerprint, get_result_cache
+
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
-client = OpenAI()
+LLM_BACKEND_ENV = "ECHOLOGIA_LLM_BACKEND"   # "openai" (default) or "stub"
+LLM_MODEL = os.environ.get("ECHOLOGIA_LLM_MODEL", "gpt-4o-mini")
+# Bump when the prompt changes, so cached answers to the old prompt are not reused
+PROMPT_VERSION = 2
+
+# Transcript tokens sent in total, and per request. Tokens are estimated at
+# ~4 characters each, which is close enough for budgeting without a tokenizer.
+LLM_TOKEN_BUDGET = int(os.environ.get("ECHOLOGIA_LLM_TOKEN_BUDGET", 6000))
+LLM_CHUNK_TOKENS = int(os.environ.get("ECHOLOGIA_LLM_CHUNK_TOKENS", 1500))
+LLM_MAX_CONCURRENCY = int(os.environ.get("ECHOLOGIA_LLM_CONCURRENCY", 4))
+LLM_TIMEOUT_SEC = 30.0
+CHARS_PER_TOKEN = 4
+# Lines per speaker always kept, so speakers who never hear their name are still listed
+LINES_PER_SPEAKER = 2
+
+UNKNOWN = "Unknown"
+
+# Phrases around which names tend to appear: introductions, greetings, addressing someone
+_NAME_CUE = re.compile(
+    r"\b(my name|name is|name's|i'm|i am|this is|call me|meet|thanks|thank you|"
+    r"hi|hello|hey|welcome|over to you|go ahead)\b",
+    re.IGNORECASE,
+)
+# A capitalized word that doesn't start a sentence (Whisper capitalizes proper nouns)
+_MID_CAPITAL = re.compile(r"(?<![.!?]\s)(?<!^)\b(?!I\b|I'\w)[A-Z][a-z]+")
+# Self-introductions, for the stub backend
+_SELF_INTRO = re.compile(r"\b(?i:my name is|my name's|i'm|i am|this is|call me)\s+([A-Z][a-z]+)")
+
 
-def extract_speaker_names_with_llm(conversation_segments, personas):
+def llm_fingerprint() -> dict:
+    """What the names depend on besides the transcript, for cache keys."""
+    backend = os.environ.get(LLM_BACKEND_ENV, "openai")
+    return {"backend": backend, "model": LLM_MODEL if backend != "stub" else "stub", "prompt": PROMPT_VERSION}
+
+
+def _tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _line(seg: dict) -> str:
+    return f"{seg['speaker_id']}: {seg['text']}"
+
+
+def select_excerpts(segments: list[dict], token_budget: int = LLM_TOKEN_BUDGET) -> list[int]:
     """
-    Use LLM to analyze conversation and extract speaker names
-    Returns updated personas with names
+    Indices (in transcript order) of the segments worth showing the LLM, within `token_budget`.
+    Cue segments come first, then one line per speaker, then the cues' neighbours
+    and more lines per speaker.
     """
-    # Build conversation text
-    conversation_text = ""
-    for seg in conversation_segments:
-        speaker = seg["speaker_id"]
+    cues, context = [], []
+    firsts = defaultdict(list)  # speaker -> their first LINES_PER_SPEAKER segments
+    for i, seg in enumerate(segments):
         text = seg["text"]
-        conversation_text += f"{speaker}: {text}\n"
-    
-    # Create prompt
-    prompt = f"""
-Analyze this conversation and identify the names of the speakers.
-Return ONLY a JSON object mapping speaker_id to name.
-If a speaker's name is not mentioned or unclear, use "Unknown".
+        if _NAME_CUE.search(text) or _MID_CAPITAL.search(text):
+            cues.append(i)
+            context.extend(j for j in (i - 1, i + 1) if 0 <= j < len(segments))
+        if len(firsts[seg["speaker_id"]]) < LINES_PER_SPEAKER:
+            firsts[seg["speaker_id"]].append(i)
+
+    chosen, used = set(), 0
+    one_each = [lines[0] for lines in firsts.values()]
+    rest = [i for lines in firsts.values() for i in lines[1:]]
+    for i in [*cues, *one_each, *context, *rest]:
+        if i in chosen:
+            continue
+        cost = _tokens(_line(segments[i]))
+        if used + cost > token_budget:
+            continue
+        chosen.add(i)
+        used += cost
+    return sorted(chosen)
+
+
+def build_chunks(segments: list[dict], indices: list[int], chunk_tokens: int = LLM_CHUNK_TOKENS) -> list[str]:
+    """Join the selected segments into transcript chunks of at most `chunk_tokens`; "..." marks skipped parts."""
+    chunks, lines, used, prev = [], [], 0, None
+    for i in indices:
+        line = _line(segments[i])
+        cost = _tokens(line)
+        if lines and used + cost > chunk_tokens:
+            chunks.append("\n".join(lines))
+            lines, used, prev = [], 0, None
+        if prev is not None and i != prev + 1:
+            lines.append("...")
+        lines.append(line)
+        used += cost
+        prev = i
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def _chunk_speakers(chunk: str, speakers: list[str]) -> list[str]:
+    present = {line.partition(": ")[0] for line in chunk.splitlines()}
+    return [spk for spk in speakers if spk in present]
+
 
-Conversation:
-{conversation_text}
+def _prompt(chunk: str, speakers: list[str]) -> str:
+    return f"""
+Analyze these excerpts of a conversation and identify the names of the speakers.
+Return ONLY a JSON object mapping speaker_id to name, for these speakers: {", ".join(speakers)}.
+If a speaker's name is not mentioned or unclear, use "{UNKNOWN}".
+Names can come from a speaker introducing themselves or from others addressing them.
+
+Excerpts ("..." marks skipped parts):
+{chunk}
 
 Example output: {{"spk_01": "John", "spk_02": "Alex"}}
 """
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", 
-            messages=[{"role": "user", "content": prompt}],
-            max_completion_tokens=200
+
+
+def _parse_mapping(text: str) -> dict:
+    # Find JSON in the response (in case there's extra text)
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    mapping = json.loads(text[start:end])
+    if not isinstance(mapping, dict):
+        raise ValueError("LLM response is not a JSON object")
+    return {str(k): str(v) for k, v in mapping.items()}
+
+
+def _stub_names(chunk: str, speakers: list[str]) -> dict:
+    """Offline stand-in: a speaker is named only when they introduce themselves."""
+    names = {spk: UNKNOWN for spk in speakers}
+    for line in chunk.splitlines():
+        spk, _, text = line.partition(": ")
+        match = _SELF_INTRO.search(text)
+        if spk in names and names[spk] == UNKNOWN and match:
+            names[spk] = match.group(1)
+    return names
+
+
+async def _ask_openai(client, semaphore: asyncio.Semaphore, chunk: str, speakers: list[str]) -> dict:
+    async with semaphore:
+        response = await client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": _prompt(chunk, speakers)}],
+            # Enough for the JSON object, which grows with the number of speakers
+            max_completion_tokens=40 + 20 * len(speakers),
         )
-        
-        # Parse the response
-        result_text = response.choices[0].message.content.strip()
-        
-        # Try to extract JSON
+    return _parse_mapping(response.choices[0].message.content.strip())
+
+
+async def _names_per_chunk(chunks: list[str], chunk_speakers: list[list[str]]) -> list[dict | Exception]:
+    """One answer per chunk, requested concurrently; a failed chunk yields its exception."""
+    if os.environ.get(LLM_BACKEND_ENV, "openai") == "stub":
+        return [_stub_names(c, s) for c, s in zip(chunks, chunk_speakers)]
+
+    from openai import AsyncOpenAI
+
+    semaphore = asyncio.Semaphore(max(1, LLM_MAX_CONCURRENCY))
+    # A client per call: its connection pool belongs to this event loop
+    async with AsyncOpenAI(timeout=LLM_TIMEOUT_SEC) as client:
+        return await asyncio.gather(
+            *(_ask_openai(client, semaphore, c, s) for c, s in zip(chunks, chunk_speakers)),
+            return_exceptions=True,
+        )
+
+
+def merge_names(answers: list[dict], speakers: list[str]) -> dict:
+    """Most frequent non-Unknown name per speaker across chunk answers (first seen wins ties)."""
+    votes = defaultdict(Counter)
+    for answer in answers:
+        for spk, name in answer.items():
+            name = name.strip()
+            if spk in speakers and name and name.lower() != UNKNOWN.lower():
+                votes[spk][name] += 1
+    return {spk: votes[spk].most_common(1)[0][0] if votes[spk] else UNKNOWN for spk in speakers}
+
+
+def extract_speaker_names_with_llm(conversation_segments, personas, report: dict | None = None):
+    """
+    Use LLM to analyze conversation and extract speaker names
+    Returns updated personas with names. If `report` is given, records whether the
+    answers came from the result cache ("hit", "miss", "partial" or "off"), or
+    "error" if any chunk failed.
+    """
+    speakers = [p["speaker_id"] for p in personas]
+    segments = [s for s in conversation_segments if s.get("text")]
+    chunks = build_chunks(segments, select_excerpts(segments))
+    # Each chunk only asks about the speakers it contains
+    chunk_speakers = [_chunk_speakers(c, speakers) for c in chunks]
+    chunks = [c for c, s in zip(chunks, chunk_speakers) if s]
+    chunk_speakers = [s for s in chunk_speakers if s]
+
+    # Cached chunks are answered straight away; the rest go out together
+    cache = get_result_cache()
+    keys = [fingerprint(llm_fingerprint(), c, s) for c, s in zip(chunks, chunk_speakers)]
+    answers = [cache.get("llm_names", key) if cache is not None else None for key in keys]
+    todo = [i for i, answer in enumerate(answers) if answer is None]
+    if report is not None:
+        if cache is None:
+            report["llm_names"] = "off"
+        else:
+            report["llm_names"] = "hit" if not todo else "miss" if len(todo) == len(chunks) else "partial"
+
+    if todo:
         try:
-            # Find JSON in the response (in case there's extra text)
-            start = result_text.find('{')
-            end = result_text.rfind('}') + 1
-            json_str = result_text[start:end]
-            name_mapping = json.loads(json_str)
-        except:
-            print("⚠️  Could not parse LLM response as JSON")
-            name_mapping = {}
-        
-        # Update personas with names
-        updated_personas = []
-        for persona in personas:
-            speaker_id = persona["speaker_id"]
-            name = name_mapping.get(speaker_id, "Unknown")
-            persona_copy = persona.copy()
-            persona_copy["name"] = name
-            updated_personas.append(persona_copy)
-        
-        print("✅ LLM name extraction complete")
-        return updated_personas
-        
-    except Exception as e:
-        print(f"⚠️  LLM name extraction failed: {e}")
-        # Return personas with "Unknown" names
-        for persona in personas:
-            persona["name"] = "Unknown"
-        return personas
\ No newline at end of file
+            fresh = asyncio.run(_names_per_chunk([chunks[i] for i in todo], [chunk_speakers[i] for i in todo]))
+        except Exception as e:
+            fresh = [e] * len(todo)
+        for i, answer in zip(todo, fresh):
+            if isinstance(answer, Exception):
+                # Not cached, so the next run asks again
+                print(f"⚠️  LLM name extraction failed for a chunk: {answer}")
+                if report is not None:
+                    report["llm_names"] = "error"
+                continue
+            answers[i] = answer
+            if cache is not None:
+                cache.put("llm_names", keys[i], answer)
+
+    names = merge_names([a for a in answers if a is not None], speakers)
+    print(f"✅ LLM name extraction complete ({len(chunks)} chunk(s), {len(todo)} requested)")
+    return [dict(p, name=names[p["speaker_id"]]) for p in personas]
+
+
+def names_resolved(report: dict) -> bool:
+    """
+    Whether the names are worth keeping in a cached final result: no chunk failed.
+    Nobody being named is a normal answer; a failure is retried on the next run
+    (answered chunks are cached on their own, so that is cheap).
+    """
+    return report.get("llm_names") != "error"
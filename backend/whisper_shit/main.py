@@ -1,8 +1,12 @@
 """
 Main entry point for the audio processing pipeline.
 Imports and runs the processor module.
+
+    python main.py                          # demo-audio.mp3 -> personas_output.json
+    python main.py recordings/ "more/*.wav" --workers 4 --output-dir batch_output
 """
 
+import argparse
 import sys
 import os
 from pathlib import Path
@@ -10,6 +14,7 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(__file__))
 
 from processor import process_audio_to_personas
+from batch import run_batch
 
 def main():
     """Main entry point for the audio processing application"""
@@ -58,6 +63,39 @@ def main():
         traceback.print_exc()
         return 1
 
+def batch_main(argv):
+    """Batch mode: many files over a pool of worker processes, resumable via the manifest"""
+    parser = argparse.ArgumentParser(description="Process a directory or glob of recordings")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or glob patterns")
+    parser.add_argument("--output-dir", default="batch_output", help="One JSON per file plus manifest.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: cores / 4)")
+    parser.add_argument("--num-speakers", type=int, default=2, help="0 lets pyannote decide")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run files that failed last time")
+    args = parser.parse_args(argv)
+
+    print("🎬 Audio Processing Pipeline (batch)")
+    print("=" * 50)
+    summary = run_batch(
+        args.inputs,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        num_speakers=args.num_speakers or None,
+        retry_failed=args.retry_failed,
+    )
+    if not summary["files"]:
+        return 1
+
+    print("\n" + "=" * 50)
+    print("✅ Batch complete!")
+    print("=" * 50)
+    print(f"📂 Files: {summary['processed']} processed, {summary['skipped']} skipped, {summary['failed']} failed, "
+          f"{summary['interrupted']} interrupted")
+    print(f"⏱️  {summary['audio_sec'] / 3600:.2f}h of audio in {summary['wall_sec'] / 3600:.2f}h with {summary['workers']} workers")
+    print(f"🚀 Throughput: {summary['files_per_hour']} files/hour, RTF {summary['rtf']} "
+          f"(per worker {summary['rtf_per_worker']})")
+    print(f"💾 Manifest: {summary['manifest']}")
+    return 1 if summary["failed"] or summary["interrupted"] else 0
+
 if __name__ == "__main__":
-    exit_code = main()
+    exit_code = batch_main(sys.argv[1:]) if len(sys.argv) > 1 else main()
     sys.exit(exit_code)
\ No newline at end of file
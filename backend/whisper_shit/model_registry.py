@@ -0,0 +1,497 @@
+"""
+Process-wide model registry.
+
+Every model the pipeline needs (faster-whisper, pyannote diarization, the
+wav2vec2 age/gender classifier and the emotion head on its features) is loaded once per process, optionally from a
+local weights directory, and shared between requests. Loading is guarded by a
+per-model lock so concurrent requests never load the same weights twice, and
+models that are not safe to call from several threads expose an inference lock.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from governor import get_governor
+from instrumentation import rss_mb
+from result_cache import fingerprint, get_result_cache
+from scheduler import cpu_budget
+
+DIARIZATION_MODEL_ID = "pyannote/speaker-diarization-3.1"
+AGE_GENDER_MODEL_ID = "audeering/wav2vec2-large-robust-24-ft-age-gender"
+EMOTION_HEAD_DIR = "emotion-head"
+
+# Optional directory with pre-downloaded weights, laid out as
+#   $ECHOLOGIA_MODEL_DIR/whisper-<size>/            (CTranslate2 model, e.g. whisper-base)
+#   $ECHOLOGIA_MODEL_DIR/speaker-diarization-3.1/config.yaml
+#   $ECHOLOGIA_MODEL_DIR/wav2vec2-large-robust-24-ft-age-gender/
+#   $ECHOLOGIA_MODEL_DIR/emotion-head/{config.json,head.pt}  (from train_emotion_head.py)
+MODEL_DIR_ENV = "ECHOLOGIA_MODEL_DIR"
+
+# How the API warms the models at startup: "background" (serve right away, /health/ready
+# turns ready once they are loaded), "blocking" (load before serving) or "off" (each
+# model loads on the first request that needs it)
+WARMUP_ENV = "ECHOLOGIA_WARMUP"
+
+# faster-whisper engine settings. The model settings apply when the model is
+# (re)loaded, the decoding settings (beam_size, batch_size) on every call.
+ASR_CONFIG = {
+    "model_size": os.environ.get("WHISPER_MODEL_SIZE", "base"),
+    "device": os.environ.get("WHISPER_DEVICE", "cpu"),
+    "compute_type": os.environ.get("WHISPER_COMPUTE_TYPE", "int8"),
+    "cpu_threads": int(os.environ.get("WHISPER_CPU_THREADS", 0)),  # 0: a governor slot, or half of cpu_budget()
+    "num_workers": int(os.environ.get("WHISPER_NUM_WORKERS", 0)),  # concurrent transcribe() calls; 0: one per governor slot
+    "beam_size": int(os.environ.get("WHISPER_BEAM_SIZE", 5)),      # 1: greedy
+    "batch_size": int(os.environ.get("WHISPER_BATCH_SIZE", 0)),    # >0: batched decoding of speech chunks
+    "word_timestamps": os.environ.get("WHISPER_WORD_TIMESTAMPS", "1") != "0",
+}
+_ASR_MODEL_KEYS = ("model_size", "device", "compute_type", "cpu_threads", "num_workers")
+
+# Age/gender inference backend, applied when the model is (re)loaded; see age_gender_model.py.
+# Anything but eager is checked against the fp32 model at load and falls back to eager
+# if the outputs drift.
+AGE_GENDER_BACKENDS = ("eager", "int8", "torchscript")
+AGE_GENDER_CONFIG = {
+    "backend": os.environ.get("AGE_GENDER_BACKEND", "eager"),
+}
+# Backend actually in use and its parity with eager, once the model is loaded. The
+# outcome is also kept in the result cache so later processes know it without loading.
+_age_gender_status: dict = {}
+AGE_GENDER_STATUS_STAGE = "age_gender_backend"
+
+
+def _local_path(name: str) -> str | None:
+    """Return the local weights path for `name` if ECHOLOGIA_MODEL_DIR provides one."""
+    root = os.environ.get(MODEL_DIR_ENV)
+    if not root:
+        return None
+    path = Path(root) / name
+    return str(path) if path.exists() else None
+
+
+def _asr_cpu_threads() -> int:
+    if ASR_CONFIG["cpu_threads"]:
+        return ASR_CONFIG["cpu_threads"]
+    governor = get_governor()
+    if governor.enabled:
+        return governor.stage_threads
+    # The pipeline runs ASR next to diarization, so by default Whisper gets half the cores
+    return max(1, cpu_budget() // 2)
+
+
+def _asr_num_workers() -> int:
+    # Each governor slot can be decoding at the same time
+    if ASR_CONFIG["num_workers"]:
+        return ASR_CONFIG["num_workers"]
+    governor = get_governor()
+    return governor.max_stages if governor.enabled else 1
+
+
+def asr_description() -> dict:
+    """The ASR settings in effect, as recorded in meta.model_asr."""
+    return {
+        "name": f"faster-whisper-{ASR_CONFIG['model_size']}",
+        "device": ASR_CONFIG["device"],
+        "compute_type": ASR_CONFIG["compute_type"],
+        "cpu_threads": _asr_cpu_threads(),
+        "num_workers": _asr_num_workers(),
+        "decoding": "greedy" if ASR_CONFIG["beam_size"] <= 1 else "beam",
+        "beam_size": ASR_CONFIG["beam_size"],
+        "batch_size": ASR_CONFIG["batch_size"] or None,
+        "word_timestamps": ASR_CONFIG["word_timestamps"],
+    }
+
+
+def _age_gender_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _age_gender_status_key(device: str) -> str:
+    import torch
+
+    return fingerprint(AGE_GENDER_MODEL_ID, AGE_GENDER_CONFIG["backend"], device, torch.__version__)
+
+
+def age_gender_backend() -> str:
+    """
+    The backend age/gender features come from, without loading the model: the loaded
+    model's, else what the last load of this configuration on this device settled on,
+    else the requested backend.
+    """
+    if _age_gender_status:
+        return _age_gender_status["backend"]
+    requested = AGE_GENDER_CONFIG["backend"]
+    cache = get_result_cache()
+    if requested == "eager" or cache is None:
+        return requested
+    known = cache.get(AGE_GENDER_STATUS_STAGE, _age_gender_status_key(_age_gender_device()))
+    return known["backend"] if known else requested
+
+
+def age_gender_description() -> dict:
+    """The age/gender model and backend in effect, as recorded in meta.model_age_gender."""
+    return {
+        "name": AGE_GENDER_MODEL_ID,
+        "backend": age_gender_backend(),
+        "requested_backend": AGE_GENDER_CONFIG["backend"],
+        "parity": _age_gender_status.get("parity"),
+    }
+
+
+def emotion_description() -> dict:
+    """The emotion head in effect, as recorded in meta.model_emotion."""
+    info = registry.describe("emotion")
+    if info["model"] is None:
+        return {"name": None, "labels": None, "error": info["error"]}
+    head, _ = info["model"]
+    return {"name": head.name, "labels": head.labels, "trained": head.trained}
+
+
+def _load_whisper():
+    from faster_whisper import WhisperModel
+
+    size = ASR_CONFIG["model_size"]
+    source = _local_path(f"whisper-{size}") or size
+    return WhisperModel(
+        source,
+        device=ASR_CONFIG["device"],
+        compute_type=ASR_CONFIG["compute_type"],
+        cpu_threads=_asr_cpu_threads(),
+        num_workers=_asr_num_workers(),
+    )
+
+
+def _warm_whisper(model):
+    silence = np.zeros(16000, dtype=np.float32)
+    segments, _ = model.transcribe(silence, beam_size=1)
+    list(segments)
+
+
+def _load_diarization():
+    import torch
+    from pyannote.audio import Pipeline as PyannotePipeline
+
+    local = _local_path("speaker-diarization-3.1")
+    if local:
+        pipeline = PyannotePipeline.from_pretrained(str(Path(local) / "config.yaml"))
+    else:
+        from huggingface_hub import login
+
+        hf_token = os.environ.get("HUGGINGFACE_TOKEN") or os.environ.get("HF_TOKEN")
+        if not hf_token:
+            raise RuntimeError("Set HUGGINGFACE_TOKEN or HF_TOKEN for pyannote diarization.")
+        login(token=hf_token, add_to_git_credential=False)
+        pipeline = PyannotePipeline.from_pretrained(DIARIZATION_MODEL_ID)
+    if torch.cuda.is_available():
+        pipeline.to(torch.device("cuda"))
+    return pipeline
+
+
+def _warm_diarization(pipeline):
+    import torch
+
+    waveform = torch.zeros(1, 16000 * 2)
+    pipeline({"waveform": waveform, "sample_rate": 16000})
+
+
+def _load_age_gender():
+    import torch
+    from transformers import Wav2Vec2Processor
+    from age_gender_model import AgeGenderModel
+
+    source = _local_path("wav2vec2-large-robust-24-ft-age-gender") or AGE_GENDER_MODEL_ID
+    device = torch.device(_age_gender_device())
+    processor = Wav2Vec2Processor.from_pretrained(source)
+    model = AgeGenderModel.from_pretrained(source).to(device)
+    model.eval()
+    return processor, apply_age_gender_backend(processor, model, device), device
+
+
+def apply_age_gender_backend(processor, model, device):
+    """
+    `model` prepared for AGE_GENDER_CONFIG["backend"], or the eager model if that
+    backend doesn't apply on `device` or fails the parity check against it.
+    """
+    from age_gender_model import build_backend, example_inputs, parity
+
+    backend = AGE_GENDER_CONFIG["backend"]
+    if backend not in AGE_GENDER_BACKENDS:
+        raise ValueError(f"Unknown age/gender backend {backend!r}; choose from {', '.join(AGE_GENDER_BACKENDS)}")
+    _age_gender_status.clear()
+    eager = build_backend(model, "eager")
+    if backend == "eager":
+        _settle_age_gender_backend(device, "eager", None)
+        return eager
+    if device.type != "cpu":
+        print(f"⚠️  Age/gender backend '{backend}' is for CPU inference; using eager on {device.type}")
+        _settle_age_gender_backend(device, "eager", None)
+        return eager
+
+    inputs = example_inputs(processor, device)
+    candidate = build_backend(model, backend, inputs)
+    report = parity(eager, candidate, inputs)
+    if not report["ok"]:
+        print(f"⚠️  Age/gender backend '{backend}' drifts from eager ({report}); using eager")
+        _settle_age_gender_backend(device, "eager", report)
+        return eager
+    _settle_age_gender_backend(device, backend, report)
+    return candidate
+
+
+def _settle_age_gender_backend(device, backend: str, parity: dict | None):
+    """Record the backend a load settled on, in this process and in the result cache."""
+    _age_gender_status.clear()
+    _age_gender_status.update(backend=backend, parity=parity)
+    cache = get_result_cache()
+    if cache is not None:
+        cache.put(AGE_GENDER_STATUS_STAGE, _age_gender_status_key(device.type), dict(_age_gender_status))
+
+
+def _load_emotion():
+    import json
+
+    import torch
+    from types import SimpleNamespace
+    from age_gender_model import EmotionHead
+
+    path = _local_path(EMOTION_HEAD_DIR)
+    if path is None:
+        raise RuntimeError(
+            f"No emotion head in ${MODEL_DIR_ENV}/{EMOTION_HEAD_DIR}; "
+            "train one with whisper_shit/train_emotion_head.py"
+        )
+    config = json.loads((Path(path) / "config.json").read_text())
+    if config.get("encoder") != AGE_GENDER_MODEL_ID:
+        raise RuntimeError(f"Emotion head was trained on {config.get('encoder')!r} features, not {AGE_GENDER_MODEL_ID!r}")
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    head = EmotionHead(SimpleNamespace(hidden_size=config["hidden_size"], final_dropout=0.0), config["labels"])
+    head.load_state_dict(torch.load(Path(path) / "head.pt", map_location=device))
+    head.name = f"{EMOTION_HEAD_DIR} on {AGE_GENDER_MODEL_ID}"
+    head.trained = config.get("trained")
+    return head.to(device).eval(), device
+
+
+def _warm_age_gender(bundle):
+    import torch
+
+    processor, model, device = bundle
+    y = processor(np.zeros(16000, dtype=np.float32), sampling_rate=16000, return_attention_mask=True, return_tensors="pt")
+    with torch.no_grad():
+        # Every backend takes the mask; the traced graph requires it
+        model(y["input_values"].to(device), attention_mask=y["attention_mask"].to(device))
+
+
+class _Entry:
+    """Bookkeeping for one registered model."""
+
+    def __init__(self, loader: Callable[[], Any], warmup: Callable[[Any], None] | None, thread_safe: bool, optional: bool):
+        self.loader = loader
+        self.warmup = warmup
+        self.thread_safe = thread_safe
+        self.optional = optional
+        self.model = None
+        self.error: str | None = None
+        self.load_time_sec: float | None = None
+        self.warmup_time_sec: float | None = None
+        self.memory_mb: float | None = None
+        self.load_lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Loads each registered model once and hands out the shared instance."""
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+        self._warmup_names: list[str] | None = None  # models a warm-up was asked for
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Callable[[Any], None] | None = None,
+        thread_safe: bool = False,
+        optional: bool = False,
+    ):
+        """
+        Register (or replace) the loader for `name`. Replacing drops any loaded instance.
+        An optional model that fails to load is not retried on every get() and doesn't
+        hold up readiness; the pipeline works without it.
+        """
+        self._entries[name] = _Entry(loader, warmup, thread_safe, optional)
+
+    def get(self, name: str):
+        """Return the shared model for `name`, loading and warming it up on first use."""
+        entry = self._entries[name]
+        if entry.model is not None:
+            return entry.model
+        if entry.optional and entry.error:
+            raise RuntimeError(entry.error)
+        with entry.load_lock:
+            if entry.model is None:
+                self._load(name, entry)
+        return entry.model
+
+    def available(self, name: str) -> bool:
+        """Whether `name` is loaded or loads now; for optional models."""
+        try:
+            self.get(name)
+            return True
+        except Exception:
+            return False
+
+    def _load(self, name: str, entry: _Entry):
+        print(f"🧠 Loading model '{name}'...")
+        rss_before = rss_mb()
+        t0 = time.perf_counter()
+        try:
+            model = entry.loader()
+        except Exception as e:
+            entry.error = str(e)
+            raise
+        entry.load_time_sec = time.perf_counter() - t0
+        if entry.warmup is not None:
+            t1 = time.perf_counter()
+            entry.warmup(model)
+            entry.warmup_time_sec = time.perf_counter() - t1
+        entry.memory_mb = max(0.0, rss_mb() - rss_before)
+        entry.error = None
+        entry.model = model
+        print(f"✅ Model '{name}' ready in {entry.load_time_sec:.1f}s (+{entry.memory_mb:.0f} MB)")
+
+    def unload(self, name: str):
+        """Drop the loaded instance of `name`; the next get() loads it again."""
+        entry = self._entries[name]
+        self.register(name, entry.loader, entry.warmup, entry.thread_safe, entry.optional)
+
+    def lock(self, name: str):
+        """
+        Lock to hold while running inference on `name`.
+        Thread-safe models get a no-op context so concurrent requests run in parallel.
+        """
+        entry = self._entries[name]
+        return _NullLock() if entry.thread_safe else entry.inference_lock
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entries[name].model is not None
+
+    def describe(self, name: str) -> dict:
+        """
+        {"state", "model", "error"} of `name` without loading it: "model" is the instance
+        if loaded, else None. An unregistered name has state "unregistered".
+        """
+        entry = self._entries.get(name)
+        if entry is None:
+            return {"state": "unregistered", "model": None, "error": None}
+        return {"state": self._state(entry), "model": entry.model, "error": entry.error}
+
+    def warm_up(self, names: list[str] | None = None) -> dict:
+        """
+        Load and warm up the given models (all registered ones by default).
+        A model that fails to load is reported but does not stop the others.
+        """
+        names = names or list(self._entries)
+        self._warmup_names = names
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"⚠️  Could not load model '{name}': {e}")
+        return self.stats()
+
+    def warm_up_in_background(self, names: list[str] | None = None) -> threading.Thread:
+        """warm_up on a daemon thread, so the caller (the API's startup) doesn't wait for it."""
+        self._warmup_names = names or list(self._entries)
+        thread = threading.Thread(target=self.warm_up, args=(self._warmup_names,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _state(entry: _Entry) -> str:
+        if entry.model is not None:
+            return "loaded"
+        if entry.load_lock.locked():
+            return "loading"
+        return "error" if entry.error else "not_loaded"
+
+    def readiness(self) -> dict:
+        """
+        Whether every model a warm-up was asked for is loaded, with each model's state.
+        Without a warm-up, models load on first use and the service counts as ready.
+        An optional model that failed to load counts as done.
+        """
+        engines = {name: self._state(entry) for name, entry in self._entries.items()}
+        pending = [
+            n for n in (self._warmup_names or [])
+            if engines.get(n) != "loaded" and not (self._entries[n].optional and engines[n] == "error")
+        ]
+        return {"ready": not pending, "pending": pending, "engines": engines}
+
+    def stats(self) -> dict:
+        """Load time, warm-up time and memory per model."""
+        return {
+            name: {
+                "loaded": entry.model is not None,
+                "state": self._state(entry),
+                "load_time_sec": None if entry.load_time_sec is None else round(entry.load_time_sec, 2),
+                "warmup_time_sec": None if entry.warmup_time_sec is None else round(entry.warmup_time_sec, 2),
+                "memory_mb": None if entry.memory_mb is None else round(entry.memory_mb, 1),
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+
+class _NullLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+registry = ModelRegistry()
+# CTranslate2 handles concurrent transcribe calls itself; the torch pipelines keep state
+# between calls and get serialized.
+registry.register("whisper", _load_whisper, _warm_whisper, thread_safe=True)
+registry.register("diarization", _load_diarization, _warm_diarization)
+registry.register("age_gender", _load_age_gender, _warm_age_gender)
+registry.register("emotion", _load_emotion, optional=True)
+
+
+def configure_asr(**changes):
+    """
+    Update ASR_CONFIG. A change to a model setting replaces the registered Whisper
+    loader, so the next request loads the new model; call it between requests
+    (benchmarks, startup), not while transcriptions are running.
+    """
+    unknown = set(changes) - set(ASR_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown ASR settings: {sorted(unknown)}")
+    reload = any(k in _ASR_MODEL_KEYS and ASR_CONFIG[k] != v for k, v in changes.items())
+    ASR_CONFIG.update(changes)
+    if reload:
+        registry.register("whisper", _load_whisper, _warm_whisper, thread_safe=True)
+
+
+def configure_age_gender(**changes):
+    """
+    Update AGE_GENDER_CONFIG and drop the loaded age/gender model, so the next
+    request loads it (with whichever loader is registered) for the new backend.
+    Like configure_asr, call it between requests.
+    """
+    unknown = set(changes) - set(AGE_GENDER_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown age/gender settings: {sorted(unknown)}")
+    if changes.get("backend", AGE_GENDER_CONFIG["backend"]) not in AGE_GENDER_BACKENDS:
+        raise ValueError(f"Unknown age/gender backend {changes['backend']!r}; choose from {', '.join(AGE_GENDER_BACKENDS)}")
+    if any(AGE_GENDER_CONFIG[k] != v for k, v in changes.items()):
+        AGE_GENDER_CONFIG.update(changes)
+        _age_gender_status.clear()
+        registry.unload("age_gender")
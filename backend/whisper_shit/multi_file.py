@@ -0,0 +1,400 @@
+"""
+Many recordings in one request, with model calls batched across files.
+
+A collection of short clips through process_audio_to_personas pays the
+per-call overhead (decoding, a Whisper call, a feature pass) once per file.
+process_files() instead streams one result per file, in the order the files
+finish:
+    1. every file is hashed, looked up in the result cache and, on a miss,
+       decoded and run through VAD on a thread pool, DECODE_WORKERS at a time
+    2. decoded files are grouped into packs of up to PACK_SEC of audio
+       (PACK_FILES files at most), laid end to end in one buffer. Per pack:
+       asr       one batched Whisper call over the speech of every file, so a
+                 batch mixes chunks from several files; a chunk never spans two
+                 files, and the language is detected per chunk and per file
+                 (one batched encoder pass over the first speech of every file)
+       diarize   per file, next to ASR: pyannote clusters each recording's
+                 speakers on its own, so its batches can't mix recordings
+       voice     one wav2vec2 pass over the windows of every file in the pack
+       output    per file, as process_audio_to_personas builds it
+    3. a summary with the aggregate throughput in audio hours per hour
+
+Stage results go through the result cache under the same keys as the
+single-file pipeline, except ASR: the batched settings get their own key.
+"""
+
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Iterator
+
+import numpy as np
+
+from audio_buffer import SAMPLE_RATE, AudioBuffer, decode_audio
+from governor import get_governor
+from instrumentation import PIPELINE_RUNS, Timings
+from llm_populate_entries import LLM_MAX_CONCURRENCY, names_resolved
+from model_registry import ASR_CONFIG, registry
+from processor import (
+    VAD_PARAMS,
+    _asr_fingerprint,
+    _voice_stage,
+    assemble_output,
+    detect_speech_cached,
+    diarize_cached,
+    final_fingerprint,
+    transcribe_audio_simple,
+    voice_cache_keys,
+    voice_windows,
+)
+from result_cache import fingerprint, get_result_cache, hash_file
+from scheduler import StageScheduler
+from speech_features import FeatureBank, extract_features
+from vad import SpeechRegions
+
+PACK_SEC = float(os.environ.get("ECHOLOGIA_BATCH_PACK_SEC", 900.0))
+PACK_FILES = int(os.environ.get("ECHOLOGIA_BATCH_PACK_FILES", 32))
+DECODE_WORKERS = int(os.environ.get("ECHOLOGIA_BATCH_DECODE_WORKERS", 4))
+# Whisper batch size for packs when ASR_CONFIG doesn't set one
+PACK_ASR_BATCH_SIZE = 8
+# Speech per file the language is detected from; at most Whisper's 30 s window
+LANGUAGE_DETECTION_SEC = 30.0
+
+
+class _File:
+    """One recording of the request, as it moves through the stages."""
+
+    def __init__(self, index: int, name: str, path: str, audio_hash: str | None):
+        self.index = index
+        self.name = name
+        self.path = path
+        self.audio_hash = audio_hash
+        self.buffer: AudioBuffer | None = None
+        self.regions: SpeechRegions | None = None
+        self.report: dict = {}
+        self.output: dict | None = None   # set on a final cache hit
+        self.error: str | None = None
+
+
+def _pack_asr_fingerprint() -> dict:
+    return dict(_asr_fingerprint(), batch_size=ASR_CONFIG["batch_size"] or PACK_ASR_BATCH_SIZE, multilingual=True)
+
+
+def _final_keys(f: _File, num_speakers: int | None) -> list[str]:
+    """The single-file pipeline's key first: its result is just as good."""
+    return [final_fingerprint(f.audio_hash, num_speakers), final_fingerprint(f.audio_hash, num_speakers, _pack_asr_fingerprint())]
+
+
+def _prepare(f: _File, num_speakers: int | None) -> _File:
+    """Hash, final cache lookup and, on a miss, decode and VAD."""
+    try:
+        f.audio_hash = f.audio_hash or hash_file(f.path)
+        cache = get_result_cache()
+        if cache is not None:
+            f.report["final"] = "miss"
+            for key in _final_keys(f, num_speakers):
+                f.output = cache.get("final", key)
+                if f.output is not None:
+                    f.output["meta"]["cache"] = {"final": "hit"}
+                    return f
+        f.buffer = decode_audio(f.path)
+        f.regions = detect_speech_cached(f.buffer, f.audio_hash, f.report)
+    except Exception as e:
+        f.error = f"{type(e).__name__}: {e}"
+    return f
+
+
+def _prepared(files: list[_File], num_speakers: int | None, workers: int) -> Iterator[_File]:
+    """
+    _prepare every file on a pool, in completion order, with at most 2 x workers decoded
+    ahead. If the consumer stops early, files decoded ahead are released here.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-decode") as pool:
+        todo = iter(files)
+        running = set()
+        try:
+            for f in todo:
+                running.add(pool.submit(_prepare, f, num_speakers))
+                if len(running) >= 2 * workers:
+                    break
+            while running:
+                done = next(as_completed(running))
+                running.remove(done)
+                nxt = next(todo, None)
+                if nxt is not None:
+                    running.add(pool.submit(_prepare, nxt, num_speakers))
+                yield done.result()
+        finally:
+            for future in running:
+                future.cancel()
+            for future in running:
+                if not future.cancelled() and future.result().buffer is not None:
+                    future.result().buffer.close()
+
+
+def _first_speech(f: _File, n: int) -> np.ndarray:
+    """Up to `n` samples of the file's speech, from the start."""
+    parts, have = [], 0
+    for s, e in f.regions.regions:
+        parts.append(f.buffer.samples[s:min(e, s + n - have)])
+        have += len(parts[-1])
+        if have >= n:
+            break
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def _detect_languages(model, files: list[_File]) -> dict[int, str]:
+    """{file index: language} from the first speech of each file, in batched encoder passes."""
+    from faster_whisper import WhisperModel
+    from faster_whisper.audio import pad_or_trim
+
+    if not isinstance(model, WhisperModel) or not model.model.is_multilingual:
+        return {}
+    n = int(min(LANGUAGE_DETECTION_SEC, 30.0) * SAMPLE_RATE)
+    clips = {f.index: _first_speech(f, n) for f in files}
+    clips = {i: c for i, c in clips.items() if len(c)}
+    batch = ASR_CONFIG["batch_size"] or PACK_ASR_BATCH_SIZE
+    indices, languages = list(clips), {}
+    for k in range(0, len(indices), batch):
+        chunk = indices[k:k + batch]
+        features = np.stack([pad_or_trim(model.feature_extractor(clips[i])) for i in chunk])
+        with get_governor().stage("asr"):
+            results = model.model.detect_language(model.encode(features))
+        for i, probs in zip(chunk, results):
+            languages[i] = probs[0][0][2:-2]  # "<|en|>" -> "en"
+    return languages
+
+
+def _pack_asr(pack: np.ndarray, files: list[_File], offsets: list[int]) -> dict[int, dict]:
+    """{file index: {"segments", "language"}} from one batched Whisper call over the pack."""
+    regions = [(s + off, e + off) for f, off in zip(files, offsets) for s, e in f.regions.regions]
+    packed = SpeechRegions(regions, SAMPLE_RATE, len(pack), breaks=offsets[1:])
+    segments, info = transcribe_audio_simple(
+        AudioBuffer(pack, SAMPLE_RATE), packed,
+        batch_size=ASR_CONFIG["batch_size"] or PACK_ASR_BATCH_SIZE, multilingual=True,
+    )
+    starts = [off / SAMPLE_RATE for off in offsets]
+    per_file = {f.index: [] for f in files}
+    for seg in segments:
+        k = max(0, bisect_right(starts, seg["start"]) - 1)
+        shift = starts[k]
+        seg = dict(seg, start=seg["start"] - shift, end=seg["end"] - shift)
+        if seg.get("words"):
+            seg["words"] = [dict(w, start=w["start"] - shift, end=w["end"] - shift) for w in seg["words"]]
+        per_file[files[k].index].append(seg)
+
+    languages = _detect_languages(registry.get("whisper"), [f for f in files if per_file[f.index]])
+    out = {}
+    for f in files:
+        language = languages.get(f.index) or (info.language if per_file[f.index] else None)
+        out[f.index] = {"segments": per_file[f.index], "language": language}
+    return out
+
+
+def _pack_features(pack: np.ndarray, files: list[_File], offsets: dict[int, int], diarized: dict[int, tuple]) -> dict[int, FeatureBank]:
+    """One feature pass over the voice windows of every file; a bank per file, in its own time."""
+    rows, windows = {}, []
+    for f in files:
+        offset = offsets[f.index]
+        own = voice_windows(f.buffer, diarized[f.index][0])
+        rows[f.index] = (len(windows), len(windows) + len(own))
+        windows.extend((spk, s + offset, e + offset) for spk, s, e in own)
+    bank = extract_features(pack, SAMPLE_RATE, windows)
+    out = {}
+    for f in files:
+        lo, hi = rows[f.index]
+        out[f.index] = FeatureBank(
+            bank.speakers[lo:hi], bank.starts[lo:hi] - offsets[f.index], bank.ends[lo:hi] - offsets[f.index],
+            bank.features[lo:hi] if len(bank) else bank.features, SAMPLE_RATE,
+        )
+    return out
+
+
+def _file_event(f: _File, status: str, result: dict | None = None, error: str | None = None, cached: bool = False) -> dict:
+    event = {"type": "file", "index": f.index, "filename": f.name, "status": status}
+    if result is not None:
+        event.update(audio_sec=result["meta"]["duration_sec"], cached=cached, result=result)
+    if error is not None:
+        event["error"] = error
+    return event
+
+
+def _run_pack(files: list[_File], num_speakers: int | None, pack_no: int) -> Iterator[dict]:
+    """The model stages for one pack, then a file event per file as its output is ready."""
+    timings = Timings()
+    with timings.span("pack") as span:
+        lengths = [len(f.buffer.samples) for f in files]
+        pack = np.concatenate([f.buffer.samples for f in files])
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int).tolist()
+        offsets = {f.index: off for f, off in zip(files, starts)}
+        for f, off, n in zip(files, starts, lengths):
+            f.buffer.close()
+            f.buffer = AudioBuffer(pack[off:off + n], SAMPLE_RATE)
+        span["audio_sec"] = len(pack) / SAMPLE_RATE
+    print(f"📦 Pack {pack_no}: {len(files)} files, {len(pack) / SAMPLE_RATE:.0f}s of audio")
+    cache = get_result_cache()
+
+    def asr_stage():
+        results = {}
+        for f in files:
+            key = fingerprint(f.audio_hash, _pack_asr_fingerprint(), VAD_PARAMS)
+            results[f.index] = cache.get("asr", key) if cache is not None else None
+            f.report["asr"] = "off" if cache is None else "miss" if results[f.index] is None else "hit"
+        missing = [f for f in files if results[f.index] is None]
+        if missing:
+            with timings.span("asr", sum(f.regions.speech_sec for f in missing)):
+                fresh = _pack_asr(pack, missing, [offsets[f.index] for f in missing])
+            for f in missing:
+                results[f.index] = fresh[f.index]
+                if cache is not None:
+                    cache.put("asr", fingerprint(f.audio_hash, _pack_asr_fingerprint(), VAD_PARAMS), fresh[f.index])
+        return results
+
+    def diarize_stage():
+        with timings.span("diarize", sum(f.regions.speech_sec for f in files)):
+            return {
+                f.index: diarize_cached(
+                    f.buffer, f.audio_hash, num_speakers, speech_regions=f.regions, report=f.report,
+                    return_embeddings=True,
+                )
+                for f in files
+            }
+
+    def voice_stage(diarized):
+        need = [
+            f for f in files
+            if cache is None or any(
+                not cache.contains(stage, key) for stage, key in voice_cache_keys(f.audio_hash, diarized[f.index][0]).items()
+            )
+        ]
+        with timings.span("voice", sum(d["end"] - d["start"] for f in files for d in diarized[f.index][0])):
+            banks = {}
+            if need:
+                with timings.span("features") as span:
+                    banks = _pack_features(pack, need, offsets, diarized)
+                    span["audio_sec"] = float(sum(bank.seconds.sum() for bank in banks.values()))
+            return {
+                f.index: _voice_stage(
+                    f.buffer, f.audio_hash, diarized[f.index][0], timings, f.report,
+                    features=(lambda bank=banks[f.index]: bank) if f.index in banks else None,
+                )
+                for f in files
+            }
+
+    # Same layout as a single recording: ASR next to diarization, voice after diarization
+    governor = get_governor()
+    scheduler = StageScheduler(governor.budget)
+    threads = governor.stage_threads if governor.enabled else max(1, scheduler.budget // 2)
+    scheduler.add("asr", asr_stage, threads=threads)
+    scheduler.add("diarize", diarize_stage, threads=threads)
+    scheduler.add("voice", voice_stage, deps=("diarize",), threads=threads)
+    try:
+        results = scheduler.run()
+    except Exception as e:
+        PIPELINE_RUNS.inc(len(files), status="error")
+        for f in files:
+            f.buffer.close()
+            yield _file_event(f, "failed", error=f"{type(e).__name__}: {e}")
+        return
+    schedule = {**scheduler.summary(), "governor": governor.stats()}
+    batch_meta = {"pack": pack_no, "pack_files": len(files), "pack_audio_sec": round(len(pack) / SAMPLE_RATE, 1)}
+
+    def finish(f: _File) -> dict:
+        output = assemble_output(
+            f.buffer.duration, f.regions, results["asr"][f.index], results["diarize"][f.index],
+            results["voice"][f.index], schedule, f.report, Timings(),
+        )
+        output["meta"]["batch"] = dict(batch_meta, timings=timings.to_list())
+        cache = get_result_cache()
+        # _prepare also answers single-file requests from here; failed names must not stick
+        if cache is not None and names_resolved(f.report):
+            cache.put("final", _final_keys(f, num_speakers)[-1], output)
+        return output
+
+    # The rest is mostly waiting on the LLM, so files finish side by side
+    with ThreadPoolExecutor(max_workers=max(1, LLM_MAX_CONCURRENCY), thread_name_prefix="batch-output") as pool:
+        futures = {pool.submit(finish, f): f for f in files}
+        for future in as_completed(futures):
+            f = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                PIPELINE_RUNS.inc(status="error")
+                yield _file_event(f, "failed", error=f"{type(e).__name__}: {e}")
+            else:
+                PIPELINE_RUNS.inc(status="ok")
+                yield _file_event(f, "done", output)
+            finally:
+                f.buffer.close()
+
+
+def process_files(
+    files: list[dict],
+    num_speakers: int | None = None,
+    decode_workers: int = DECODE_WORKERS,
+) -> Iterator[dict]:
+    """
+    Process many recordings, batching model calls across them.
+
+    Args:
+        files: [{"path", "name", "audio_hash" (optional)}]
+        num_speakers: Speakers per recording if known (default: detect)
+        decode_workers: Files hashed, decoded and run through VAD at a time
+
+    Yields:
+        a start event, a file event per recording as it finishes (its output, or
+        the error), and a summary with the aggregate throughput
+    """
+    started = time.perf_counter()
+    items = [_File(i, f.get("name") or os.path.basename(f["path"]), f["path"], f.get("audio_hash")) for i, f in enumerate(files)]
+    yield {"type": "start", "files": len(items), "pack_sec": PACK_SEC, "pack_files": PACK_FILES}
+
+    summary = {"done": 0, "failed": 0, "cached": 0, "packs": 0, "audio_sec": 0.0}
+
+    def tally(event: dict) -> dict:
+        summary["done" if event["status"] == "done" else "failed"] += 1
+        summary["cached"] += int(event.get("cached", False))
+        summary["audio_sec"] += event.get("audio_sec", 0.0)
+        return event
+
+    pending, pending_sec = [], 0.0
+    prepared = _prepared(items, num_speakers, max(1, decode_workers))
+    try:
+        for f in prepared:
+            if f.error is not None:
+                yield tally(_file_event(f, "failed", error=f.error))
+            elif f.output is not None:
+                PIPELINE_RUNS.inc(status="cached")
+                f.output["session_id"] = f"session_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}"
+                yield tally(_file_event(f, "done", f.output, cached=True))
+            else:
+                pending.append(f)
+                pending_sec += f.buffer.duration
+                if pending_sec >= PACK_SEC or len(pending) >= PACK_FILES:
+                    summary["packs"] += 1
+                    for event in _run_pack(pending, num_speakers, summary["packs"]):
+                        yield tally(event)
+                    pending, pending_sec = [], 0.0
+        if pending:
+            summary["packs"] += 1
+            for event in _run_pack(pending, num_speakers, summary["packs"]):
+                yield tally(event)
+            pending = []
+    finally:
+        # A client that disconnects stops the stream here; decoded files go with it
+        prepared.close()
+        for f in pending:
+            f.buffer.close()
+
+    wall = time.perf_counter() - started
+    yield {
+        "type": "summary",
+        "files": len(items),
+        **summary,
+        "audio_sec": round(summary["audio_sec"], 1),
+        "wall_sec": round(wall, 2),
+        # Hours of audio per hour of wall time; above 1 is faster than real time
+        "audio_hours_per_hour": round(summary["audio_sec"] / wall, 2) if wall else None,
+    }
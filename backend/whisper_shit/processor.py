@@ -1,75 +1,149 @@
 import json
-import torch
-import librosa
 import numpy as np
 from collections import defaultdict, Counter
 from datetime import datetime
-from faster_whisper import WhisperModel
 import os
-from huggingface_hub import login
-from pyannote.audio import Pipeline as PyannotePipeline
 from dotenv import load_dotenv
-from llm_populate_entries import extract_speaker_names_with_llm
+from llm_populate_entries import extract_speaker_names_with_llm, llm_fingerprint, names_resolved
 from age_gender_estimation import estimate_age_gender_for_personas
+from model_registry import registry
+from audio_buffer import AudioBuffer, as_audio_buffer, decode_audio
+from scheduler import StageScheduler
+from governor import get_governor
+from intervals import overlap_join
+from analytics import speaker_analytics
+from vad import SpeechRegions, VAD_PARAMS, detect_speech
+from types import SimpleNamespace
+from result_cache import cached, fingerprint, get_result_cache, hash_array, hash_file
+from instrumentation import PIPELINE_RUNS, Timings
+from speaker_index import recognize_personas
+from speech_features import extract_features, speech_windows
+from emotion import NEUTRAL, emotion_sums, emotion_trend, mood_summary, segment_emotions, voice_budget, window_emotions
+import age_gender_estimation
+import model_registry
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-def transcribe_audio_simple(audio_file="test-audio.mp3"):
+def transcribe_audio_simple(
+    audio="test-audio.mp3",
+    speech_regions: SpeechRegions | None = None,
+    batch_size: int | None = None,
+    multilingual: bool = False,
+):
     """
-    Simple transcription using faster-whisper
+    Simple transcription using faster-whisper.
+    `audio` is an AudioBuffer, a 16 kHz float32 array or a file path.
+    With `speech_regions`, only those regions are decoded; timestamps stay in original time.
+    `batch_size` overrides ASR_CONFIG's; with `multilingual`, the language is detected
+    per chunk instead of once for the whole audio.
     """
-    print("🔊 Loading Whisper model...")
-    model = WhisperModel("base", device="cpu", compute_type="int8")
+    model = registry.get("whisper")
+    buffer = as_audio_buffer(audio)
     
-    print("📝 Transcribing audio...")
-    segments, info = model.transcribe(audio_file, beam_size=5)
-    
-    print(f"✅ Detected language: {info.language}")
+    if speech_regions is not None and not speech_regions.regions:
+        print("⚠️  No speech detected, skipping transcription")
+        if buffer is not audio:
+            buffer.close()
+        return [], SimpleNamespace(language=None)
     
-    # Convert segments to list for processing
-    transcription_segments = []
-    for segment in segments:
-        transcription_segments.append({
-            "start": segment.start,
-            "end": segment.end,
-            "text": segment.text.strip(),
-            "confidence": segment.avg_logprob if hasattr(segment, 'avg_logprob') else 0.9
-        })
+    print("📝 Transcribing audio...")
+    config = model_registry.ASR_CONFIG
+    options = {"beam_size": config["beam_size"], "word_timestamps": config["word_timestamps"]}
+    if multilingual:
+        options["multilingual"] = True
+    batch_size = config["batch_size"] if batch_size is None else batch_size
+    if batch_size > 0:
+        from faster_whisper import BatchedInferencePipeline, WhisperModel
+        # Speech chunks are decoded batch_size at a time; the wrapper keeps per-call
+        # state, so each call gets its own. A stand-in model takes the options itself.
+        engine = BatchedInferencePipeline(model=model) if isinstance(model, WhisperModel) else model
+        options["batch_size"] = batch_size
+        if speech_regions is not None:
+            options["clip_timestamps"] = speech_regions.batch_clips()
+    else:
+        engine = model
+        if speech_regions is not None:
+            options["clip_timestamps"] = speech_regions.clip_timestamps()
+    # Segments are decoded lazily, so the governor slot covers the whole loop
+    with get_governor().stage("asr"):
+        segments, info = engine.transcribe(buffer.samples, **options)
+        
+        print(f"✅ Detected language: {info.language}")
+        
+        # Convert segments to list for processing
+        transcription_segments = []
+        for segment in segments:
+            seg = {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text.strip(),
+                "confidence": segment.avg_logprob if hasattr(segment, 'avg_logprob') else 0.9
+            }
+            if getattr(segment, "words", None):
+                # Whisper's words keep their leading space, so "".join rebuilds the text
+                seg["words"] = [
+                    {"word": w.word, "start": w.start, "end": w.end, "confidence": w.probability}
+                    for w in segment.words
+                ]
+            transcription_segments.append(seg)
     
+    if buffer is not audio:
+        buffer.close()
     return transcription_segments, info
 
-def diarize_with_pyannote(audio_file: str, num_speakers: int | None = None):
+def diarize_with_pyannote(
+    audio,
+    num_speakers: int | None = 2,
+    speech_regions: SpeechRegions | None = None,
+    return_embeddings: bool = False,
+):
     """
     Robust speaker diarization using pyannote/speaker-diarization-3.1.
-    Preloads audio to avoid tensor size mismatches.
+    `audio` is an AudioBuffer, a 16 kHz float32 array or a file path; the waveform is
+    handed to pyannote preloaded to avoid tensor size mismatches.
+    With `speech_regions`, pyannote only sees the concatenated speech and the turns
+    are mapped back to the original timeline.
     Returns a list of dicts: {"start": float, "end": float, "speaker_id": "SPEAKER_00X"}.
+    With `return_embeddings`, returns (segments, {speaker_id: centroid embedding or None}),
+    the per-speaker centroids pyannote computed during clustering.
     """
-    hf_token = os.environ.get("HUGGINGFACE_TOKEN") or os.environ.get("HF_TOKEN")
-    if not hf_token:
-        raise RuntimeError("Set HUGGINGFACE_TOKEN or HF_TOKEN for pyannote diarization.")
-
-    login(token=hf_token, add_to_git_credential=False)
+    import torch
 
-    pipeline = PyannotePipeline.from_pretrained(
-        "pyannote/speaker-diarization-3.1"
-    )
+    pipeline = registry.get("diarization")
+    buffer = as_audio_buffer(audio)
     
-    # Preload audio to avoid PyAnnote's internal loading issues
-    print("🎵 Loading audio for diarization...")
-    waveform, sample_rate = librosa.load(audio_file, sr=16000, mono=True)
-    waveform = torch.from_numpy(waveform).unsqueeze(0)  # Shape: [1, samples]
+    if speech_regions is None:
+        # Zero-copy [1, samples] view of the shared buffer
+        waveform = buffer.tensor()
+    else:
+        waveform = torch.from_numpy(speech_regions.concatenate(buffer.samples)).unsqueeze(0)
     
-    # Pass preloaded waveform instead of file path
-    diarization = pipeline({"waveform": waveform, "sample_rate": sample_rate}, num_speakers=2)
+    raw_turns, centroids = None, None
+    if waveform.shape[1] > 0:
+        # Model lock first: a slot isn't held while waiting for another diarization
+        with registry.lock("diarization"), get_governor().stage("diarize"):
+            raw_turns = pipeline(
+                {"waveform": waveform, "sample_rate": buffer.sample_rate},
+                num_speakers=num_speakers,
+                return_embeddings=return_embeddings,
+            )
+        if return_embeddings:
+            raw_turns, centroids = raw_turns
+    del waveform
+    if buffer is not audio:
+        buffer.close()
 
     # Build normalized segments with consistent spk labels
     raw = []
-    for turn, _, speaker in diarization.itertracks(yield_label=True):
-        raw.append({
-            "start": float(turn.start),
-            "end": float(turn.end),
-            "speaker_id": speaker
-        })
+    if raw_turns is not None:
+        for turn, _, speaker in raw_turns.itertracks(yield_label=True):
+            raw.append({
+                "start": float(turn.start),
+                "end": float(turn.end),
+                "speaker_id": speaker
+            })
+    if speech_regions is not None:
+        raw = speech_regions.to_original(raw)
 
     # Map pyannote labels to spk_01, spk_02, etc.
     spk_order = []
@@ -81,119 +155,529 @@ def diarize_with_pyannote(audio_file: str, num_speakers: int | None = None):
             spk_order.append(spk)
             label_map[spk] = f"spk_{len(spk_order):02d}"
         norm.append({"start": seg["start"], "end": seg["end"], "speaker_id": label_map[spk]})
-    return norm
+    if not return_embeddings:
+        return norm
+
+    embeddings = {}
+    if raw_turns is not None and centroids is not None:
+        # Centroids come back in the order of diarization.labels()
+        for label, vec in zip(raw_turns.labels(), centroids):
+            if label in label_map:
+                vec = np.asarray(vec, dtype=np.float32)
+                embeddings[label_map[label]] = vec.tolist() if np.all(np.isfinite(vec)) else None
+    return norm, embeddings
 
 def assign_speakers_by_overlap(asr_segments: list[dict], diar_segments: list[dict]) -> list[dict]:
     """
     For each ASR segment, assign the speaker_id of the diarization segment with max temporal overlap.
     Returns a new list of ASR segments with "speaker_id" attached.
     """
+    speakers = overlap_join([(a["start"], a["end"]) for a in asr_segments], diar_segments)
     assigned = []
-    for a in asr_segments:
-        a_start, a_end = float(a["start"]), float(a["end"])
-        best_spk = "spk_01"
-        best_ov = 0.0
-        for d in diar_segments:
-            ov = max(0.0, min(a_end, d["end"]) - max(a_start, d["start"]))
-            if ov > best_ov:
-                best_ov = ov
-                best_spk = d["speaker_id"]
+    for a, spk in zip(asr_segments, speakers):
         new_seg = dict(a)
-        new_seg["speaker_id"] = best_spk
+        new_seg["speaker_id"] = spk or "spk_01"
         assigned.append(new_seg)
     return assigned
 
+def assign_words_by_overlap(words: list[dict], diar_segments: list[dict]) -> list[dict]:
+    """
+    Word-level variant of assign_speakers_by_overlap: each word dict (word, start, end)
+    gets the speaker it overlaps most, or None when it falls between turns.
+    """
+    speakers = overlap_join([(w["start"], w["end"]) for w in words], diar_segments)
+    return [dict(w, speaker_id=spk) for w, spk in zip(words, speakers)]
+
+# A one-word speaker change shorter than this, between two runs of the same
+# speaker, is treated as diarization jitter rather than an interjection
+MAX_FLICKER_SEC = 0.5
+
+def _word_speakers(words: list[dict], speakers: list[str | None], fallback: str) -> list[str]:
+    """Fill words that fall between turns from their neighbours, then smooth one-word flickers."""
+    filled = list(speakers)
+    last = None
+    for i, spk in enumerate(filled):
+        if spk is None:
+            filled[i] = last
+        else:
+            last = spk
+    nxt = None
+    for i in range(len(filled) - 1, -1, -1):
+        if filled[i] is None:
+            filled[i] = nxt or fallback
+        else:
+            nxt = filled[i]
+    for i in range(1, len(filled) - 1):
+        w = words[i]
+        if filled[i - 1] == filled[i + 1] != filled[i] and w["end"] - w["start"] < MAX_FLICKER_SEC:
+            filled[i] = filled[i - 1]
+    return filled
+
+def split_segments_by_speaker(asr_segments: list[dict], diar_segments: list[dict]) -> list[dict]:
+    """
+    Speaker attribution at word level. Every word of every segment is joined to
+    the diarization in one sweep, and a segment is split wherever its speaker
+    changes, so a turn that starts mid-segment gets its own piece. Segments
+    without word timestamps fall back to assign_speakers_by_overlap.
+    Returns segments with "speaker_id" (and their words), in time order.
+    """
+    with_words = [seg for seg in asr_segments if seg.get("words")]
+    if not with_words:
+        return assign_speakers_by_overlap(asr_segments, diar_segments)
+    
+    all_words = [w for seg in with_words for w in seg["words"]]
+    word_spk = overlap_join([(w["start"], w["end"]) for w in all_words], diar_segments)
+    seg_spk = dict(zip(map(id, asr_segments), assign_speakers_by_overlap(asr_segments, diar_segments)))
+    
+    out = []
+    pos = 0
+    for seg in asr_segments:
+        words = seg.get("words")
+        fallback = seg_spk[id(seg)]["speaker_id"]
+        if not words:
+            out.append(seg_spk[id(seg)])
+            continue
+        speakers = _word_speakers(words, word_spk[pos:pos + len(words)], fallback)
+        pos += len(words)
+        
+        run_start = 0
+        for i in range(1, len(words) + 1):
+            if i == len(words) or speakers[i] != speakers[run_start]:
+                run = words[run_start:i]
+                out.append(dict(
+                    seg,
+                    start=run[0]["start"] if run_start > 0 else seg["start"],
+                    end=run[-1]["end"] if i < len(words) else seg["end"],
+                    text="".join(w["word"] for w in run).strip(),
+                    words=run,
+                    speaker_id=speakers[run_start],
+                ))
+                run_start = i
+    return out
+
 def speaking_time_fair(diar_segments: list[dict]) -> dict:
     """
     Compute per-speaker talk time with fair apportioning of overlaps.
     Returns dict {speaker_id: seconds}.
     """
-    if not diar_segments:
-        return {}
-    change_points = sorted(
-        {s["start"] for s in diar_segments} | {s["end"] for s in diar_segments}
+    return {spk: float(st["talk_time_sec"]) for spk, st in speaker_analytics(diar_segments).items()}
+
+# What each cached stage depends on besides the audio itself. Bump a model or
+# parameter here and only that stage (and its dependents) is recomputed.
+
+def _asr_fingerprint() -> dict:
+    # Settings that change the transcript; thread and worker counts don't
+    config = model_registry.ASR_CONFIG
+    return {
+        "model": f"faster-whisper-{config['model_size']}",
+        "device": config["device"],
+        "compute_type": config["compute_type"],
+        "beam_size": config["beam_size"],
+        "batch_size": config["batch_size"],
+        "word_timestamps": config["word_timestamps"],
+    }
+
+def _diarization_fingerprint(num_speakers: int | None) -> dict:
+    # "embeddings": entries hold {"segments", "embeddings"}, not the bare segment list
+    return {"model": model_registry.DIARIZATION_MODEL_ID, "num_speakers": num_speakers, "embeddings": True}
+
+def _age_gender_fingerprint() -> dict:
+    return {
+        "model": model_registry.AGE_GENDER_MODEL_ID,
+        # int8 and TorchScript fall back to eager on a GPU or a failed parity check
+        "backend": model_registry.age_gender_backend(),
+        "window_sec": age_gender_estimation.WINDOW_SEC,
+        "max_seconds_per_speaker": age_gender_estimation.MAX_SECONDS_PER_SPEAKER,
+    }
+
+def _emotion_fingerprint() -> dict:
+    # The head reads the encoder's features, so the encoder backend matters too
+    return {
+        "head": model_registry.emotion_description(),
+        "backend": model_registry.age_gender_backend(),
+        "window_sec": age_gender_estimation.WINDOW_SEC,
+        "max_seconds_per_speaker": voice_budget(age_gender_estimation.MAX_SECONDS_PER_SPEAKER),
+    }
+
+def final_fingerprint(audio_hash: str, num_speakers: int | None, asr: dict | None = None) -> str:
+    """Key of a complete output; `asr` replaces the configured ASR settings if given."""
+    emotion = _emotion_fingerprint() if registry.available("emotion") else None
+    return fingerprint(
+        audio_hash, VAD_PARAMS, asr or _asr_fingerprint(), _diarization_fingerprint(num_speakers),
+        _age_gender_fingerprint(), emotion, llm_fingerprint()
     )
-    talk = {}
-    for i in range(len(change_points) - 1):
-        a, b = change_points[i], change_points[i + 1]
-        if b <= a:
-            continue
-        active = {s["speaker_id"] for s in diar_segments if s["start"] < b and s["end"] > a}
-        if not active:
-            continue
-        share = (b - a) / len(active)
-        for spk in active:
-            talk[spk] = talk.get(spk, 0.0) + share
-    return {k: float(v) for k, v in talk.items()}
 
-def process_audio_to_personas(audio_file="test-audio.mp3"):
+def detect_speech_cached(buffer: AudioBuffer, audio_hash: str, report: dict | None = None) -> SpeechRegions:
+    """VAD speech regions through the result cache."""
+    data = cached(
+        "vad",
+        fingerprint(audio_hash, VAD_PARAMS),
+        lambda: detect_speech(buffer.samples, buffer.sample_rate).to_dict(),
+        report,
+    )
+    return SpeechRegions.from_dict(data)
+
+def transcribe_cached(
+    audio,
+    audio_hash: str,
+    vad: bool = True,
+    speech_regions: SpeechRegions | None = None,
+    report: dict | None = None,
+) -> dict:
+    """
+    transcribe_audio_simple through the result cache. Returns {"segments", "language"}.
+    With `vad`, only speech is decoded; pass `speech_regions` if they are already known.
+    """
+    def compute():
+        buffer = as_audio_buffer(audio)
+        try:
+            regions = speech_regions or (detect_speech_cached(buffer, audio_hash) if vad else None)
+            segments, info = transcribe_audio_simple(buffer, regions)
+        finally:
+            if buffer is not audio:
+                buffer.close()
+        return {"segments": segments, "language": info.language}
+    key = fingerprint(audio_hash, _asr_fingerprint(), VAD_PARAMS if vad else None)
+    return cached("asr", key, compute, report)
+
+def diarize_cached(
+    audio,
+    audio_hash: str,
+    num_speakers: int | None = 2,
+    vad: bool = True,
+    speech_regions: SpeechRegions | None = None,
+    report: dict | None = None,
+    return_embeddings: bool = False,
+):
+    """
+    diarize_with_pyannote through the result cache, optionally on speech regions only.
+    The per-speaker embeddings come out of the same pyannote pass and are cached with
+    the turns; with `return_embeddings`, returns (segments, embeddings).
+    """
+    def compute():
+        buffer = as_audio_buffer(audio)
+        try:
+            regions = speech_regions or (detect_speech_cached(buffer, audio_hash) if vad else None)
+            segments, embeddings = diarize_with_pyannote(
+                buffer, num_speakers=num_speakers, speech_regions=regions, return_embeddings=True
+            )
+        finally:
+            if buffer is not audio:
+                buffer.close()
+        return {"segments": segments, "embeddings": embeddings}
+    key = fingerprint(audio_hash, _diarization_fingerprint(num_speakers), VAD_PARAMS if vad else None)
+    result = cached("diarization", key, compute, report)
+    if return_embeddings:
+        return result["segments"], result["embeddings"]
+    return result["segments"]
+
+def process_audio_to_personas(
+    audio_file="test-audio.mp3",
+    mmap_dir: str | None = None,
+    num_speakers: int | None = 2,
+    audio_hash: str | None = None,
+):
     """
     Complete pipeline: transcribe -> diarize -> extract personas -> output JSON
+    `audio_file` may also be an already decoded AudioBuffer. Pass `audio_hash` if the
+    caller already hashed the file, otherwise it is computed here for the result cache.
     """
     print("🚀 Starting audio processing pipeline...")
+    timings = Timings()
+    
+    if audio_hash is None:
+        with timings.span("hash"):
+            if isinstance(audio_file, AudioBuffer):
+                audio_hash = hash_array(audio_file.samples)
+            else:
+                audio_hash = hash_file(audio_file)
     
-    # 1. Transcribe
-    segments, info = transcribe_audio_simple(audio_file)
+    # A full hit skips decoding and every model
+    final_key = final_fingerprint(audio_hash, num_speakers)
+    cache = get_result_cache()
+    if cache is not None:
+        with timings.span("cache_lookup"):
+            output = cache.get("final", final_key)
+        if output is not None:
+            print("✅ Found cached result for this recording")
+            output["session_id"] = f"session_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}"
+            output["meta"]["date_processed"] = datetime.now().isoformat() + "Z"
+            output["meta"]["cache"] = {"final": "hit"}
+            output["meta"]["timings"] = timings.to_list()
+            PIPELINE_RUNS.inc(status="cached")
+            return output
     
-    # 2. Load audio at 16kHz (required for age/gender model)
     try:
-        audio, sr = librosa.load(audio_file, sr=16000)
-        total_duration = len(audio) / sr
-        print(f"📊 Audio duration: {total_duration:.1f} seconds")
-    except Exception as e:
-        print(f"⚠️  Could not load audio for duration: {e}")
-        total_duration = segments[-1]["end"] if segments else 0
+        # 1. Decode once at 16kHz; every stage below reads views of this buffer
+        if isinstance(audio_file, AudioBuffer):
+            buffer = audio_file
+        else:
+            with timings.span("decode") as span:
+                buffer = decode_audio(audio_file, mmap_dir=mmap_dir)
+                span["audio_sec"] = buffer.duration
+        try:
+            output = _process_buffer(buffer, audio_hash, num_speakers, timings)
+        finally:
+            if buffer is not audio_file:
+                buffer.close()
+    except Exception:
+        PIPELINE_RUNS.inc(status="error")
+        raise
+    PIPELINE_RUNS.inc(status="ok")
     
-    # 3. Diarize with pyannote
-    diar_segments = diarize_with_pyannote(audio_file)
+    # Names missing because the LLM failed would otherwise stick until evicted
+    # Keyed again: a first load may have settled on another age/gender backend
+    if cache is not None and names_resolved(output["meta"]["cache"]):
+        cache.put("final", final_fingerprint(audio_hash, num_speakers), output)
+    return output
 
-    # 4. Assign speakers to ASR segments by max-overlap
-    asr_with_spk = assign_speakers_by_overlap(segments, diar_segments)
+def _set_torch_threads(n: int):
+    import torch
+    torch.set_num_threads(n)
 
-    # 5. Compute fair speaking times from diarization
-    talk_times = speaking_time_fair(diar_segments)
+def _default_persona_attributes(spk: str) -> dict:
+    return {
+        "speaker_id": spk,
+        "sex": {"label": "unknown", "confidence": 0.5},
+        "age": {"label": "unknown", "mean_estimate": 30, "confidence": 0.5},
+    }
 
-    # 6. Aggregate per-speaker stats
-    personas = []
-    lang_counts = defaultdict(Counter)
-    for seg in asr_with_spk:
-        lang_counts[seg["speaker_id"]][info.language or "und"] += 1
+def _age_gender_stage(buffer: AudioBuffer, diar_segments: list[dict], features=None) -> dict:
+    """
+    Age/gender per speaker, {speaker_id: {"sex": ..., "age": ...}}. Needs only diarization.
+    `features` returns the shared FeatureBank, if one is being computed.
+    """
+    speakers = sorted({d["speaker_id"] for d in diar_segments})
+    stubs = [_default_persona_attributes(spk) for spk in speakers]
+    try:
+        stubs = estimate_age_gender_for_personas(
+            buffer.samples, buffer.sample_rate, diar_segments, stubs,
+            features=features() if features is not None else None,
+        )
+        print("✅ Age and gender estimation completed")
+    except Exception as e:
+        print(f"⚠️ Age and gender estimation failed: {e}")
+    return {p["speaker_id"]: {"sex": p["sex"], "age": p["age"]} for p in stubs}
+
+def voice_windows(buffer: AudioBuffer, diar_segments: list[dict]) -> list[tuple[str, int, int]]:
+    """
+    Windows the voice stage encodes: each speaker's age/gender budget, or with an
+    emotion head the larger of that and the emotion budget (emotion.voice_budget).
+    """
+    speakers = sorted({d["speaker_id"] for d in diar_segments})
+    budget = age_gender_estimation.MAX_SECONDS_PER_SPEAKER
+    return speech_windows(
+        diar_segments, speakers, buffer.sample_rate, len(buffer.samples),
+        age_gender_estimation.WINDOW_SEC,
+        voice_budget(budget) if registry.available("emotion") else budget,
+    )
 
+def voice_cache_keys(audio_hash: str, diar_segments: list[dict]) -> dict[str, str]:
+    """Result cache keys of the voice stage's outputs, by cache stage."""
+    keys = {"age_gender": fingerprint(audio_hash, _age_gender_fingerprint(), diar_segments)}
+    if registry.available("emotion"):
+        keys["emotion"] = fingerprint(audio_hash, _emotion_fingerprint(), diar_segments)
+    return keys
+
+def _voice_stage(
+    buffer: AudioBuffer,
+    audio_hash: str,
+    diar_segments: list[dict],
+    timings: Timings,
+    report: dict,
+    features=None,
+) -> dict:
+    """
+    Age/gender per speaker and emotion per window, {"age_gender", "emotion"}, from one
+    shared encoder pass. Each goes through the result cache on its own; the features
+    are only computed if one of them misses. Without an emotion head, "emotion" is None
+    and the features cover only the age/gender budget of each speaker. `features`
+    returns a FeatureBank over voice_windows() computed elsewhere (e.g. batched with
+    other recordings).
+    """
+    keys = voice_cache_keys(audio_hash, diar_segments)
+    cache = get_result_cache()
+    if cache is not None and not all(cache.contains(stage, key) for stage, key in keys.items()):
+        # A miss loads the encoder anyway; once it is loaded the backend it settled on
+        # is known, so the results are stored under their real key
+        try:
+            registry.get("age_gender")
+        except Exception:
+            pass  # _age_gender_stage reports the failure
+        keys = voice_cache_keys(audio_hash, diar_segments)
+    bank = None
+
+    def own_features():
+        nonlocal bank
+        if bank is None:
+            with timings.span("features") as span:
+                bank = extract_features(buffer.samples, buffer.sample_rate, voice_windows(buffer, diar_segments))
+                span["audio_sec"] = float(bank.seconds.sum())
+        return bank
+
+    features = features or own_features
+
+    with timings.span("age_gender"):
+        age_gender = cached(
+            "age_gender",
+            keys["age_gender"],
+            lambda: _age_gender_stage(buffer, diar_segments, features),
+            report,
+        )
+    emotions = None
+    if "emotion" in keys:
+        with timings.span("emotion"):
+            emotions = cached(
+                "emotion",
+                keys["emotion"],
+                lambda: window_emotions(features()),
+                report,
+            )
+    return {"age_gender": age_gender, "emotion": emotions}
+
+def build_personas(talk_stats: dict[str, dict], lang_counts: dict[str, Counter], language: str | None) -> list[dict]:
+    """Persona skeletons (talk time, overlap, turn-taking, languages), longest speaker first."""
+    personas = []
+    talk_times = {spk: st["talk_time_sec"] for spk, st in talk_stats.items()}
     total_talk = sum(talk_times.values()) or 1.0
     for spk, t in sorted(talk_times.items(), key=lambda kv: kv[1], reverse=True):
-        counts = lang_counts[spk]
+        counts = lang_counts.get(spk, Counter())
         denom = sum(counts.values()) or 1
         languages = {k: round(v / denom, 3) for k, v in counts.items()}
         personas.append({
             "speaker_id": spk,
             "speaking_time_sec": round(t, 2),
             "speaking_percent": round(100.0 * t / total_talk, 2),
-            "languages": languages or {info.language: 1.0},
+            "overlap_ratio": talk_stats[spk]["overlap_ratio"],
+            "turns": talk_stats[spk]["turns"],
+            "interruptions": talk_stats[spk]["interruptions"],
+            "languages": languages or {language: 1.0},
             "sex": {"label": "unknown", "confidence": 0.5},
             "age": {"label": "unknown", "mean_estimate": 30, "confidence": 0.5},  
             "mood_summary": {"dominant": "neutral"}
         })
+    return personas
 
-    # 7. Estimate age and gender for each persona
-    try:
-        personas = estimate_age_gender_for_personas(audio, sr, diar_segments, personas)
-        print("✅ Age and gender estimation completed")
-    except Exception as e:
-        print(f"⚠️ Age and gender estimation failed: {e}")
+def format_segment(seg: dict, language: str | None) -> dict:
+    """Output form of an ASR segment that already has its speaker_id."""
+    out = {
+        "start": round(seg["start"], 2),
+        "end": round(seg["end"], 2),
+        "speaker_id": seg["speaker_id"],
+        "text": seg["text"],
+        "language": language,
+        "emotion": seg.get("emotion") or dict(NEUTRAL),
+    }
+    if seg.get("words"):
+        out["words"] = [
+            {"word": w["word"].strip(), "start": round(w["start"], 2), "end": round(w["end"], 2),
+             "confidence": round(w["confidence"], 3)}
+            for w in seg["words"]
+        ]
+    return out
 
-    # 8. Create final segments with speaker assignment
-    processed_segments = []
-    for seg in asr_with_spk:
-        processed_segments.append({
-            "start": round(seg["start"], 2),
-            "end": round(seg["end"], 2),
-            "speaker_id": seg["speaker_id"],
-            "text": seg["text"],
-            "language": info.language,
-            "emotion": {"label": "neutral", "confidence": 0.8}
-        })
+def _process_buffer(buffer: AudioBuffer, audio_hash: str, num_speakers: int | None, timings: Timings | None = None):
+    timings = timings or Timings()
+    total_duration = buffer.duration
+    cache_report = {"final": "miss"} if get_result_cache() is not None else {}
+    print(f"📊 Audio duration: {total_duration:.1f} seconds")
     
-    processed_segments.sort(key=lambda x: x["start"])
+    # 2-3. Find speech once, then transcribe and diarize only the speech, side by
+    # side; age/gender and emotion start as soon as diarization is done. CTranslate2 gets its
+    # threads at model load, the torch stages get the rest of the budget. With the
+    # governor on, every heavy stage gets one of its slots instead, shared with any
+    # other request running in this process.
+    governor = get_governor()
+    scheduler = StageScheduler(governor.budget)
+    if governor.enabled:
+        asr_threads = torch_threads = governor.stage_threads
+        set_torch_threads = None  # the governor sizes torch for every request at once
+    else:
+        asr_threads = max(1, scheduler.budget // 2)
+        torch_threads = max(1, scheduler.budget - asr_threads)
+        set_torch_threads = _set_torch_threads
+    # Each stage goes through the result cache, keyed by audio hash + its own inputs.
+    def vad_stage():
+        with timings.span("vad", total_duration):
+            return detect_speech_cached(buffer, audio_hash, cache_report)
+
+    def asr_stage(regions):
+        with timings.span("asr", regions.speech_sec):
+            return transcribe_cached(buffer, audio_hash, speech_regions=regions, report=cache_report)
+
+    def diarize_stage(regions):
+        with timings.span("diarize", regions.speech_sec):
+            return diarize_cached(
+                buffer, audio_hash, num_speakers, speech_regions=regions, report=cache_report,
+                return_embeddings=True,
+            )
+
+    def voice_stage(diarized):
+        diar, _ = diarized
+        with timings.span("voice", sum(d["end"] - d["start"] for d in diar)):
+            return _voice_stage(buffer, audio_hash, diar, timings, cache_report)
+
+    scheduler.add("vad", vad_stage)
+    scheduler.add("asr", asr_stage, deps=("vad",), threads=asr_threads)
+    scheduler.add("diarize", diarize_stage, deps=("vad",), threads=torch_threads, apply_threads=set_torch_threads)
+    scheduler.add("voice", voice_stage, deps=("diarize",), threads=torch_threads, apply_threads=set_torch_threads)
+    results = scheduler.run()
+    return assemble_output(
+        total_duration, results["vad"], results["asr"], results["diarize"], results["voice"],
+        {**scheduler.summary(), "governor": governor.stats()}, cache_report, timings,
+    )
+
+def assemble_output(
+    total_duration: float,
+    speech_regions: SpeechRegions,
+    asr: dict,
+    diarized: tuple[list[dict], dict],
+    voice: dict,
+    schedule: dict,
+    cache_report: dict,
+    timings: Timings,
+) -> dict:
+    """
+    Steps 4-10 of the pipeline: the output for one recording from its model results
+    (asr {"segments", "language"}, diarized (turns, embeddings), voice {"age_gender", "emotion"}).
+    """
+    segments, language = asr["segments"], asr["language"]
+    diar_segments, speaker_embeddings = diarized
+    age_gender, emotions = voice["age_gender"], voice["emotion"]
+
+    # 4. Assign speakers word by word, splitting segments at speaker changes
+    with timings.span("assign_speakers"):
+        asr_with_spk = split_segments_by_speaker(segments, diar_segments)
+
+    # 5. Compute fair speaking times, overlap and turn-taking from diarization
+    with timings.span("analytics"):
+        talk_stats = speaker_analytics(diar_segments)
+
+    # 6. Aggregate per-speaker stats
+    with timings.span("personas"):
+        lang_counts = defaultdict(Counter)
+        for seg in asr_with_spk:
+            lang_counts[seg["speaker_id"]][language or "und"] += 1
+        personas = build_personas(talk_stats, lang_counts, language)
+
+        # 7. Attach the age, gender and mood estimated alongside ASR
+        sums = emotion_sums(emotions) if emotions else {}
+        for persona in personas:
+            persona.update(age_gender.get(persona["speaker_id"], {}))
+            if emotions:
+                persona["mood_summary"] = mood_summary(sums.get(persona["speaker_id"]), emotions["labels"])
+
+    # 7b. Speaker embeddings from diarization, matched against voices from earlier sessions
+    with timings.span("speaker_index"):
+        recognize_personas(personas, speaker_embeddings)
+
+    # 8. Create final segments with speaker assignment
+    with timings.span("format_segments"):
+        if emotions:
+            for seg, emotion in zip(asr_with_spk, segment_emotions(asr_with_spk, emotions)):
+                seg["emotion"] = emotion
+        processed_segments = [format_segment(seg, language) for seg in asr_with_spk]
+        processed_segments.sort(key=lambda x: x["start"])
     
     # 9. Create output structure
     output = {
@@ -201,20 +685,26 @@ def process_audio_to_personas(audio_file="test-audio.mp3"):
         "meta": {
             "duration_sec": round(total_duration, 1),
             "sampling_rate": 16000,
-            "model_asr": "faster-whisper-base",
+            "model_asr": model_registry.asr_description(),
             "model_diarization": "pyannote/speaker-diarization-3.1",
-            "model_age_gender": "audeering/wav2vec2-large-robust-24-ft-age-gender",
-            "date_processed": datetime.now().isoformat() + "Z"
+            "model_age_gender": model_registry.age_gender_description(),
+            "model_emotion": model_registry.emotion_description(),
+            "date_processed": datetime.now().isoformat() + "Z",
+            "vad": speech_regions.summary(),
+            "schedule": schedule,
+            "cache": cache_report
         },
         "segments": processed_segments,
         "personas": personas,
         "hierarchy": sorted(personas, key=lambda x: x["speaking_time_sec"], reverse=True),
-        "global_emotion_trend": {"neutral": 1.0}  
+        "global_emotion_trend": emotion_trend(sums, emotions["labels"]) if emotions else {"neutral": 1.0},
     }
     
-    # 10. Use LLM to extract speaker names
+    # 10. Use LLM to extract speaker names (each transcript chunk's answer is cached)
     print("\n🤖 Using LLM to extract speaker names...")
-    output["personas"] = extract_speaker_names_with_llm(processed_segments, output["personas"])
+    with timings.span("llm_names"):
+        output["personas"] = extract_speaker_names_with_llm(processed_segments, output["personas"], cache_report)
     output["hierarchy"] = sorted(output["personas"], key=lambda x: x["speaking_time_sec"], reverse=True)
+    output["meta"]["timings"] = timings.to_list()
     
-    return output
\ No newline at end of file
+    return output
@@ -0,0 +1,175 @@
+"""
+Content-addressed on-disk cache for pipeline results.
+
+Entries are keyed by the SHA-256 of the audio content plus a fingerprint of
+the model and parameters that produced them, and stored as JSON under
+<root>/<stage>/<key>.json. Each stage (ASR, diarization, age/gender, LLM
+names) and the final output are cached separately, so changing one parameter
+only reruns the stages that depend on it. The cache is bounded by total size
+and evicts least-recently-used entries first.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+CACHE_DIR_ENV = "ECHOLOGIA_CACHE_DIR"
+CACHE_MAX_MB_ENV = "ECHOLOGIA_CACHE_MAX_MB"
+CACHE_ENABLED_ENV = "ECHOLOGIA_CACHE"
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "cache"
+HASH_CHUNK = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_array(samples) -> str:
+    """SHA-256 of a decoded sample buffer."""
+    return hashlib.sha256(memoryview(samples).cast("B")).hexdigest()
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (audio hash, model IDs, parameters, upstream keys)."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of JSON results on disk, safe to share between threads."""
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # path -> (size, last access); rebuilt from disk so the LRU survives restarts
+        self._index: dict[Path, tuple[int, float]] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        for path in self.root.glob("*/*.json"):
+            st = path.stat()
+            self._index[path] = (st.st_size, st.st_mtime)
+        self._total = sum(size for size, _ in self._index.values())
+
+    def _path(self, stage: str, key: str) -> Path:
+        return self.root / stage / f"{key}.json"
+
+    def contains(self, stage: str, key: str) -> bool:
+        """Whether `key` is cached, without reading it or counting a hit or miss."""
+        return self._path(stage, key).exists()
+
+    def get(self, stage: str, key: str):
+        """Cached value or None; counts a hit or a miss for `stage`."""
+        path = self._path(stage, key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            if path in self._index:
+                self._index[path] = (self._index[path][0], now)
+        return value
+
+    def put(self, stage: str, key: str, value):
+        """Store `value` (atomically, via rename) and evict old entries if over budget."""
+        path = self._path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        size = path.stat().st_size
+        with self._lock:
+            old = self._index.get(path)
+            self._total += size - (old[0] if old else 0)
+            self._index[path] = (size, time.time())
+            self._evict_locked()
+
+    def get_or_compute(self, stage: str, key: str, compute: Callable[[], Any]):
+        value = self.get(stage, key)
+        if value is None:
+            value = compute()
+            self.put(stage, key, value)
+        return value
+
+    def _evict_locked(self):
+        if self._total <= self.max_bytes:
+            return
+        for path, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            self._total -= size
+            del self._index[path]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "size_mb": round(self._total / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+            }
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache | None:
+    """Process-wide cache, or None when ECHOLOGIA_CACHE=0."""
+    global _cache
+    if os.environ.get(CACHE_ENABLED_ENV, "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR,
+                    int(float(os.environ.get(CACHE_MAX_MB_ENV, 2048)) * 1024 * 1024),
+                )
+    return _cache
+
+
+def cached(stage: str, key: str, compute: Callable[[], Any], report: dict | None = None):
+    """
+    Run `compute` through the process-wide cache (or directly if caching is off).
+    If `report` is given, records "hit", "miss" or "off" for `stage` in it.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        if report is not None:
+            report[stage] = "off"
+        return compute()
+    value = cache.get(stage, key)
+    if report is not None:
+        report[stage] = "miss" if value is None else "hit"
+    if value is None:
+        value = compute()
+        cache.put(stage, key, value)
+    return value
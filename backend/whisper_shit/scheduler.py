@@ -0,0 +1,170 @@
+"""
+Dependency-driven stage scheduler.
+
+Stages declare which other stages they depend on and how many CPU threads they
+need. Every stage starts as soon as its dependencies are done and enough of the
+CPU budget is free, so independent stages (e.g. ASR and diarization) run side
+by side without oversubscribing cores. Per-stage timings and the critical path
+are recorded for the output metadata.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import combinations
+from typing import Any, Callable
+
+
+def cpu_budget() -> int:
+    """Cores available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class Stage:
+    """One unit of pipeline work."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        deps: tuple[str, ...] = (),
+        threads: int = 1,
+        apply_threads: Callable[[int], None] | None = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.threads = threads
+        # Hook that sizes the stage's library (e.g. torch.set_num_threads). Such pools are
+        # process-wide, so the scheduler calls each hook once per run, not per stage.
+        self.apply_threads = apply_threads
+
+
+class StageScheduler:
+    """
+    Run a DAG of stages on a thread pool under a CPU thread budget.
+
+    Each stage's function is called with the results of its dependencies as
+    positional arguments, in the order the dependencies were declared.
+    """
+
+    def __init__(self, budget: int | None = None):
+        self.budget = budget or cpu_budget()
+        self.stages: dict[str, Stage] = {}
+        self.timings: dict[str, dict] = {}
+        self._t0 = 0.0
+
+    def add(self, name: str, fn: Callable[..., Any], deps: tuple[str, ...] = (), threads: int = 1,
+            apply_threads: Callable[[int], None] | None = None):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.stages[name] = Stage(name, fn, deps, max(1, min(threads, self.budget)), apply_threads)
+        return self
+
+    def _ancestors(self, name: str) -> set[str]:
+        seen, todo = set(), list(self.stages[name].deps)
+        while todo:
+            dep = todo.pop()
+            if dep not in seen:
+                seen.add(dep)
+                todo.extend(self.stages[dep].deps)
+        return seen
+
+    def _apply_threads(self):
+        """
+        Call each apply_threads hook once, before any stage starts, with the most threads
+        the stages sharing it can use at the same time: the largest sum over stages none
+        of which depends on another, capped at the budget.
+        """
+        hooks: dict[Callable[[int], None], list[Stage]] = {}
+        for stage in self.stages.values():
+            if stage.apply_threads is not None:
+                hooks.setdefault(stage.apply_threads, []).append(stage)
+        ancestors = {name: self._ancestors(name) for name in self.stages}
+        for hook, stages in hooks.items():
+            peak = max(
+                sum(s.threads for s in group)
+                for r in range(1, len(stages) + 1)
+                for group in combinations(stages, r)
+                if not any(a.name in ancestors[b.name] for a in group for b in group)
+            )
+            hook(min(peak, self.budget))
+
+    def run(self) -> dict[str, Any]:
+        """Run every stage and return {stage_name: result}. The first stage error is re-raised."""
+        self._apply_threads()
+        results: dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        free = self.budget
+        lock = threading.Lock()
+        self.timings = {}
+        self._t0 = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages))) as pool:
+            while pending or running:
+                # Start everything whose dependencies are done and that fits in the budget
+                for name, stage in list(pending.items()):
+                    if all(d in results for d in stage.deps) and (stage.threads <= free or not running):
+                        free -= stage.threads
+                        del pending[name]
+                        args = [results[d] for d in stage.deps]
+                        running[pool.submit(self._run_stage, stage, args, lock)] = stage
+                if not running:
+                    raise RuntimeError(f"Unschedulable stages: {sorted(pending)}")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    free += stage.threads
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception:
+                        for f in running:
+                            f.cancel()
+                        raise
+        return results
+
+    def _run_stage(self, stage: Stage, args: list, lock: threading.Lock):
+        start = time.perf_counter()
+        try:
+            return stage.fn(*args)
+        finally:
+            end = time.perf_counter()
+            with lock:
+                self.timings[stage.name] = {
+                    "start_sec": round(start - self._t0, 3),
+                    "end_sec": round(end - self._t0, 3),
+                    "duration_sec": round(end - start, 3),
+                    "threads": stage.threads,
+                }
+
+    def critical_path(self) -> tuple[list[str], float]:
+        """
+        Chain of stages that determined the total wall time, and its length.
+        Walks back from the last stage to finish, each time through the dependency
+        that finished last.
+        """
+        if not self.timings:
+            return [], 0.0
+        name = max(self.timings, key=lambda n: self.timings[n]["end_sec"])
+        wall = self.timings[name]["end_sec"]
+        path = [name]
+        while self.stages[name].deps:
+            name = max(self.stages[name].deps, key=lambda d: self.timings[d]["end_sec"])
+            path.append(name)
+        return path[::-1], wall
+
+    def summary(self) -> dict:
+        path, wall = self.critical_path()
+        return {
+            "cpu_budget": self.budget,
+            "critical_path": path,
+            "critical_path_sec": round(wall, 3),
+            "stages": self.timings,
+        }
@@ -0,0 +1,277 @@
+"""
+Persistent index of enrolled speaker voices.
+
+Each persona's speaker embedding (the centroid pyannote computes while
+clustering, so no extra model pass) is matched against every voice enrolled
+in earlier sessions and, if none is close enough, enrolled as a new voice.
+
+Voices are stored as unit-norm float32 rows in one flat file that is memory
+mapped, so cosine similarity against the whole index is a single
+matrix-vector product and only the pages that are read stay resident. The
+file grows by doubling, so inserts are amortized O(1) and never rewrite
+existing rows. Layout under <root>:
+    vectors.f32   capacity x dim float32 rows, the first `count` in use
+    ids.txt       one voice ID per line, in row order (append-only)
+    meta.json     {"dim", "count"}, rewritten atomically after each insert
+Writers take an exclusive flock on <root>/index.lock and readers a shared
+one, so API threads and batch worker processes can share an index.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+SPEAKER_INDEX_DIR_ENV = "ECHOLOGIA_SPEAKER_INDEX_DIR"
+SPEAKER_INDEX_ENABLED_ENV = "ECHOLOGIA_SPEAKER_INDEX"
+
+DEFAULT_SPEAKER_INDEX_DIR = Path(__file__).parent.parent / "speakers"
+# Cosine similarity above which a persona is taken to be an enrolled voice.
+# Session centroids are cleaner than chunk embeddings, hence stricter than
+# speaker_tracking.MATCH_THRESHOLD.
+RECOGNITION_THRESHOLD = 0.6
+INITIAL_CAPACITY = 1024
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    """float32 copy of `vectors` (one per row) scaled to unit norm; zero/NaN rows become zeros."""
+    v = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(v, axis=1, keepdims=True)
+    ok = np.isfinite(norms) & (norms > 0)
+    return np.where(ok, v / np.where(ok, norms, 1.0), 0.0).astype(np.float32)
+
+
+class SpeakerIndex:
+    """Append-only, memory-mapped cosine index of speaker embeddings."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.root / "vectors.f32"
+        self._ids_path = self.root / "ids.txt"
+        self._meta_path = self.root / "meta.json"
+        self._lock_path = self.root / "index.lock"
+        self._lock = threading.Lock()
+        self._dim: int | None = None
+        self._count = 0
+        self._matrix: np.memmap | None = None
+        self._ids: list[str] = []
+        self._ids_offset = 0
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # The thread lock guards this object's mapping, the flock other processes
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows another process appended since we last looked."""
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {"dim": None, "count": 0}
+        self._dim, count = meta["dim"], meta["count"]
+        if count != self._count or self._matrix is None:
+            self._map()
+            if count < self._count:
+                self._ids, self._ids_offset = [], 0
+            if count > len(self._ids):
+                # ids.txt is append-only, so only the new lines need reading
+                with open(self._ids_path, "rb") as f:
+                    f.seek(self._ids_offset)
+                    while len(self._ids) < count:
+                        line = f.readline()
+                        if not line:
+                            break
+                        self._ids.append(line.decode().rstrip("\n"))
+                    self._ids_offset = f.tell()
+            self._count = count
+
+    def _map(self, capacity: int | None = None):
+        """(Re)map vectors.f32, growing the file to `capacity` rows if given."""
+        self._matrix = None
+        if self._dim is None:
+            return
+        row_bytes = self._dim * 4
+        if capacity is not None:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        size = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        if size >= row_bytes:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(size // row_bytes, self._dim))
+
+    def _write_meta(self):
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"dim": self._dim, "count": self._count}, f)
+        os.replace(tmp, self._meta_path)
+
+    def __len__(self) -> int:
+        with self._locked(exclusive=False):
+            return self._count
+
+    @property
+    def dim(self) -> int | None:
+        with self._locked(exclusive=False):
+            return self._dim
+
+    def add(self, embeddings) -> list[str]:
+        """
+        Enroll one embedding (1-D) or a batch (2-D) and return the new voice IDs.
+        Rows are normalized on the way in; the file doubles in size when full.
+        """
+        rows = _unit_rows(embeddings)
+        with self._locked(exclusive=True):
+            return self._append(rows)
+
+    def _append(self, rows: np.ndarray) -> list[str]:
+        """add() for unit rows; the caller holds the exclusive lock."""
+        if self._dim is None:
+            self._dim = rows.shape[1]
+        elif rows.shape[1] != self._dim:
+            raise ValueError(f"Embedding has {rows.shape[1]} dims, the index {self._dim}")
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        needed = self._count + len(rows)
+        if needed > capacity:
+            self._map(max(INITIAL_CAPACITY, capacity * 2, needed))
+        self._matrix[self._count:needed] = rows
+        self._matrix.flush()
+        new_ids = [f"voice_{n:06d}" for n in range(self._count + 1, needed + 1)]
+        with open(self._ids_path, "a") as f:
+            # Drop lines a crashed writer appended without committing them to meta.json
+            f.truncate(self._ids_offset)
+            f.writelines(vid + "\n" for vid in new_ids)
+            self._ids_offset = f.tell()
+        self._ids.extend(new_ids)
+        self._count = needed
+        # meta.json last: a crash before this leaves the new rows unused, not half-read
+        self._write_meta()
+        return new_ids
+
+    def search(self, queries, k: int = 5) -> list[list[tuple[str, float]]]:
+        """
+        Top-k enrolled voices by cosine similarity for each query embedding.
+        `queries` is one embedding or a 2-D batch; returns one [(voice_id, similarity), ...]
+        list per query, best first.
+        """
+        q = _unit_rows(queries)
+        with self._locked(exclusive=False):
+            return self._search(q, k)
+
+    def _search(self, q: np.ndarray, k: int) -> list[list[tuple[str, float]]]:
+        """search() for unit rows; the caller holds a lock."""
+        if self._count == 0:
+            return [[] for _ in q]
+        if q.shape[1] != self._dim:
+            raise ValueError(f"Embedding has {q.shape[1]} dims, the index {self._dim}")
+        sims = self._matrix[:self._count] @ q.T  # (count, queries)
+        k = min(k, sims.shape[0])
+        results = []
+        for col in sims.T:
+            top = np.argpartition(-col, k - 1)[:k] if k < len(col) else np.arange(len(col))
+            top = top[np.argsort(-col[top])]
+            results.append([(self._ids[i], float(col[i])) for i in top])
+        return results
+
+    def match_or_add(self, embeddings, threshold: float = RECOGNITION_THRESHOLD) -> list[tuple[str, float, bool]]:
+        """
+        (voice_id, similarity, enrolled) for each embedding of one session: the best
+        enrolled voice at or above `threshold`, never the same voice twice, else a newly
+        enrolled one. Search and enrollment happen under one exclusive lock, so two
+        sessions seeing the same new voice at once don't both enroll it.
+        """
+        q = _unit_rows(embeddings)
+        with self._locked(exclusive=True):
+            # A couple of extra candidates so a voice taken by one embedding can fall through to the next best
+            hits = self._search(q, k=len(q) + 1)
+            pairs = sorted(
+                ((sim, i, vid) for i, cands in enumerate(hits) for vid, sim in cands if sim >= threshold),
+                reverse=True,
+            )
+            matched: dict[int, tuple[str, float, bool]] = {}
+            taken: set[str] = set()
+            for sim, i, vid in pairs:
+                if i not in matched and vid not in taken:
+                    matched[i] = (vid, sim, False)
+                    taken.add(vid)
+            new = [i for i in range(len(q)) if i not in matched]
+            for i, vid in zip(new, self._append(q[new]) if new else []):
+                matched[i] = (vid, 1.0, True)
+        return [matched[i] for i in range(len(q))]
+
+    def vector(self, voice_id: str) -> np.ndarray | None:
+        """Stored unit-norm embedding of an enrolled voice."""
+        with self._locked(exclusive=False):
+            # IDs are assigned sequentially, so the row is in the name
+            row = int(voice_id.rsplit("_", 1)[-1]) - 1
+            if not 0 <= row < self._count or self._ids[row] != voice_id:
+                return None
+            return np.array(self._matrix[row])
+
+    def stats(self) -> dict:
+        with self._locked(exclusive=False):
+            capacity = 0 if self._matrix is None else self._matrix.shape[0]
+            return {
+                "voices": self._count,
+                "dim": self._dim,
+                "capacity": capacity,
+                "size_mb": round(capacity * (self._dim or 0) * 4 / (1024 * 1024), 2),
+            }
+
+
+_index: SpeakerIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_speaker_index() -> SpeakerIndex | None:
+    """Process-wide speaker index, or None when ECHOLOGIA_SPEAKER_INDEX=0."""
+    global _index
+    if os.environ.get(SPEAKER_INDEX_ENABLED_ENV, "1") == "0":
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SpeakerIndex(os.environ.get(SPEAKER_INDEX_DIR_ENV) or DEFAULT_SPEAKER_INDEX_DIR)
+    return _index
+
+
+def recognize_personas(
+    personas: list[dict],
+    embeddings: dict[str, list | None],
+    threshold: float = RECOGNITION_THRESHOLD,
+) -> list[dict]:
+    """
+    Attach "embedding_vector" and "voice" ({"voice_id", "similarity", "enrolled"}) to
+    each persona that has an embedding. All personas are matched in one batched
+    SpeakerIndex.match_or_add; those below `threshold` are enrolled as new voices. Two
+    personas of the same session never share a voice. Without an index only the
+    embedding is attached.
+    """
+    with_emb = [p for p in personas if embeddings.get(p["speaker_id"]) is not None]
+    for p in with_emb:
+        p["embedding_vector"] = [round(float(x), 6) for x in embeddings[p["speaker_id"]]]
+    index = get_speaker_index()
+    if index is None or not with_emb:
+        return personas
+
+    vectors = np.stack([np.asarray(p["embedding_vector"], dtype=np.float32) for p in with_emb])
+    try:
+        voices = index.match_or_add(vectors, threshold)
+    except ValueError as e:
+        print(f"⚠️  Speaker index lookup skipped: {e}")
+        return personas
+
+    for p, (vid, sim, enrolled) in zip(with_emb, voices):
+        p["voice"] = {"voice_id": vid, "similarity": round(sim, 3), "enrolled": enrolled}
+    return personas
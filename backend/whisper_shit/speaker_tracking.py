@@ -0,0 +1,143 @@
+"""
+Stable speaker IDs across independently diarized chunks.
+
+Every chunk (a window of a long recording, a live buffer, an appended tail)
+is diarized on its own, so pyannote's labels only mean something inside that
+chunk. SpeakerTracker keeps a running centroid embedding per global speaker
+and maps each chunk's local labels onto them: first by how long a local
+speaker overlaps already-labelled speech in the region shared with the
+previous chunk, then by cosine similarity of the embeddings, and finally by
+opening a new global speaker.
+"""
+
+import numpy as np
+
+# Cosine similarity above which a local speaker is taken to be a known one
+MATCH_THRESHOLD = 0.5
+
+
+def _unit(vec) -> np.ndarray | None:
+    if vec is None:
+        return None
+    v = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(v))
+    if not np.isfinite(norm) or norm == 0.0:
+        return None
+    return v / norm
+
+
+class SpeakerTracker:
+    """Maps per-chunk speaker labels to global spk_XX IDs."""
+
+    def __init__(self, threshold: float = MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.centroids: dict[str, np.ndarray] = {}  # global id -> duration-weighted sum of unit embeddings
+        self.weights: dict[str, float] = {}
+
+    def _new_id(self) -> str:
+        return f"spk_{len(self.weights) + 1:02d}"
+
+    def match(
+        self,
+        embeddings: dict[str, list | None],
+        durations: dict[str, float],
+        overlap_votes: dict[str, dict[str, float]] | None = None,
+    ) -> dict[str, str]:
+        """
+        Map local labels to global IDs and fold the chunk's embeddings into the centroids.
+
+        Args:
+            embeddings: Local label -> embedding (None if pyannote couldn't produce one)
+            durations: Local label -> seconds of speech in the chunk (centroid weight)
+            overlap_votes: Local label -> {global id: seconds of agreement} measured in
+                the part of the chunk that was already labelled
+
+        Returns:
+            {local label: global speaker id}, one-to-one within the chunk
+        """
+        labels = list(durations)
+        mapping: dict[str, str] = {}
+        taken: set[str] = set()
+
+        # Overlap with already-labelled audio is the most direct evidence
+        votes = sorted(
+            ((sec, label, gid) for label, by_gid in (overlap_votes or {}).items() for gid, sec in by_gid.items() if sec > 0),
+            reverse=True,
+        )
+        for _, label, gid in votes:
+            if label not in mapping and gid not in taken:
+                mapping[label] = gid
+                taken.add(gid)
+
+        units = {label: _unit(embeddings.get(label)) for label in labels}
+        if self.centroids:
+            gids = list(self.centroids)
+            matrix = np.stack([c / (np.linalg.norm(c) or 1.0) for c in self.centroids.values()])
+            pairs = []
+            for label in labels:
+                if label in mapping or units[label] is None:
+                    continue
+                sims = matrix @ units[label]
+                for gid, sim in zip(gids, sims):
+                    if sim >= self.threshold:
+                        pairs.append((float(sim), label, gid))
+            for _, label, gid in sorted(pairs, reverse=True):
+                if label not in mapping and gid not in taken:
+                    mapping[label] = gid
+                    taken.add(gid)
+
+        # Longest-speaking unmatched labels get the lowest new numbers
+        for label in sorted(labels, key=lambda l: durations[l], reverse=True):
+            if label not in mapping:
+                gid = self._new_id()
+                self.weights[gid] = 0.0
+                mapping[label] = gid
+
+        for label, gid in mapping.items():
+            unit = units[label]
+            if unit is None:
+                continue
+            weight = max(durations.get(label, 0.0), 1e-3)
+            if gid in self.centroids:
+                self.centroids[gid] = self.centroids[gid] + weight * unit
+            else:
+                self.centroids[gid] = weight * unit
+            self.weights[gid] = self.weights.get(gid, 0.0) + weight
+        return mapping
+
+    def centroid(self, gid: str) -> np.ndarray | None:
+        """Unit-norm centroid embedding of a global speaker."""
+        c = self.centroids.get(gid)
+        return None if c is None else _unit(c)
+
+    def to_dict(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "centroids": {gid: c.tolist() for gid, c in self.centroids.items()},
+            "weights": dict(self.weights),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpeakerTracker":
+        tracker = cls(data.get("threshold", MATCH_THRESHOLD))
+        tracker.centroids = {gid: np.asarray(c, dtype=np.float32) for gid, c in data["centroids"].items()}
+        tracker.weights = dict(data["weights"])
+        return tracker
+
+
+def overlap_votes(local_turns: list[dict], labelled_turns: list[dict], start: float, end: float) -> dict[str, dict[str, float]]:
+    """
+    Seconds each local label overlaps each already-labelled global speaker within [start, end).
+    Both lists are short (one shared region), so a direct double loop is fine.
+    """
+    votes: dict[str, dict[str, float]] = {}
+    for lt in local_turns:
+        ls, le = max(lt["start"], start), min(lt["end"], end)
+        if le <= ls:
+            continue
+        for gt in labelled_turns:
+            ov = min(le, gt["end"]) - max(ls, gt["start"])
+            if ov > 0:
+                by_gid = votes.setdefault(lt["speaker_id"], {})
+                by_gid[gt["speaker_id"]] = by_gid.get(gt["speaker_id"], 0.0) + ov
+    return votes
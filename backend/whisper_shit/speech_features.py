@@ -0,0 +1,152 @@
+"""
+Shared wav2vec2 feature pass over the speech.
+
+Each diarized turn is cut into fixed-length windows, and the age/gender
+model's wav2vec2 encoder runs once per window in padded batches. The
+mean-pooled hidden states are kept in a FeatureBank, which both the
+age/gender heads and the emotion head read, so adding emotion doesn't add a
+second encoder pass.
+"""
+
+import numpy as np
+
+from governor import get_governor
+from model_registry import registry
+
+# Every forward pass sees at most BATCH_SIZE windows of WINDOW_SEC each,
+# however long the session is
+WINDOW_SEC = 4.0
+MIN_WINDOW_SEC = 1.0
+BATCH_SIZE = 8
+
+
+def tile_spans(spans: list[tuple[float, float]], sr: int, n_samples: int, window_sec: float = WINDOW_SEC) -> list[tuple[int, int]]:
+    """
+    Cut a speaker's turns into fixed-length sample windows, in time order. A
+    speaker with only short turns gets their longest one if it has at least
+    half a second.
+    """
+    win = int(window_sec * sr)
+    min_win = int(MIN_WINDOW_SEC * sr)
+    windows = []
+    for start, end in spans:
+        s_idx = max(0, int(start * sr))
+        e_idx = min(n_samples, int(end * sr))
+        while e_idx - s_idx >= min_win:
+            windows.append((s_idx, min(s_idx + win, e_idx)))
+            s_idx += win
+
+    if not windows:
+        best = max(
+            ((max(0, int(s * sr)), min(n_samples, int(e * sr))) for s, e in spans),
+            key=lambda w: w[1] - w[0],
+            default=None,
+        )
+        if best is not None and best[1] - best[0] >= sr * 0.5:
+            windows.append(best)
+    return windows
+
+
+def spread_subset(n_windows: int, window_sec: float, max_seconds: float) -> np.ndarray:
+    """Indices of an evenly spread subset of `n_windows` covering at most `max_seconds`."""
+    max_windows = max(1, int(max_seconds / window_sec))
+    if n_windows <= max_windows:
+        return np.arange(n_windows)
+    return np.linspace(0, n_windows - 1, max_windows).round().astype(int)
+
+
+def speech_windows(
+    diar_segments: list[dict],
+    speakers: list[str],
+    sr: int,
+    n_samples: int,
+    window_sec: float = WINDOW_SEC,
+    max_seconds_per_speaker: float | dict[str, float] | None = None,
+) -> list[tuple[str, int, int]]:
+    """
+    (speaker, start sample, end sample) windows over every turn of `speakers`.
+    With `max_seconds_per_speaker` (a number, or a per-speaker dict), only an
+    evenly spread subset of each speaker's windows is kept.
+    """
+    spans_by_spk: dict[str, list[tuple[float, float]]] = {}
+    for seg in diar_segments:
+        spans_by_spk.setdefault(seg["speaker_id"], []).append((seg["start"], seg["end"]))
+
+    out = []
+    for spk in speakers:
+        windows = tile_spans(sorted(spans_by_spk.get(spk, [])), sr, n_samples, window_sec)
+        if max_seconds_per_speaker is not None:
+            budget = max_seconds_per_speaker.get(spk, 0.0) if isinstance(max_seconds_per_speaker, dict) else max_seconds_per_speaker
+            if budget <= 0:
+                continue
+            windows = [windows[i] for i in spread_subset(len(windows), window_sec, budget)]
+        out.extend((spk, s_idx, e_idx) for s_idx, e_idx in windows)
+    return out
+
+
+class FeatureBank:
+    """Pooled encoder features of a set of windows, one row per window."""
+
+    def __init__(self, speakers: list[str], starts: np.ndarray, ends: np.ndarray, features: np.ndarray, sample_rate: int):
+        self.speakers = speakers
+        self.starts = starts
+        self.ends = ends
+        self.features = features
+        self.sample_rate = sample_rate
+
+    def __len__(self) -> int:
+        return len(self.speakers)
+
+    @property
+    def seconds(self) -> np.ndarray:
+        return (self.ends - self.starts) / self.sample_rate
+
+    def indices(self, speaker: str) -> np.ndarray:
+        """Rows of `speaker`, in time order."""
+        return np.array([i for i, spk in enumerate(self.speakers) if spk == speaker], dtype=int)
+
+    def take(self, start: int, stop: int) -> "FeatureBank":
+        """Rows start..stop as a bank of their own (views, no copy)."""
+        return FeatureBank(
+            self.speakers[start:stop], self.starts[start:stop], self.ends[start:stop],
+            self.features[start:stop] if len(self) else self.features, self.sample_rate,
+        )
+
+
+def extract_features(
+    audio_np: np.ndarray,
+    sr: int,
+    windows: list[tuple[str, int, int]],
+    batch_size: int = BATCH_SIZE,
+) -> FeatureBank:
+    """Run the encoder once per window and collect the pooled features, rows in `windows` order."""
+    import torch
+
+    processor, model, device = registry.get("age_gender")
+    features = None
+    # Similar lengths in the same batch keep padding small
+    order = sorted(range(len(windows)), key=lambda i: windows[i][2] - windows[i][1], reverse=True)
+    for b in range(0, len(order), batch_size):
+        batch = order[b:b + batch_size]
+        # Slices are views into the shared buffer; only the padded batch is materialized
+        y = processor(
+            [audio_np[windows[i][1]:windows[i][2]] for i in batch],
+            sampling_rate=sr,
+            padding=True,
+            return_attention_mask=True,
+            return_tensors="pt",
+        )
+        with torch.no_grad(), registry.lock("age_gender"), get_governor().stage("features"):
+            pooled = model.encode(y["input_values"].to(device), y["attention_mask"].to(device))
+        pooled = pooled.detach().cpu().numpy().astype(np.float32)
+        if features is None:
+            features = np.zeros((len(windows), pooled.shape[1]), dtype=np.float32)
+        features[batch] = pooled
+
+    return FeatureBank(
+        [w[0] for w in windows],
+        np.array([w[1] for w in windows], dtype=np.int64),
+        np.array([w[2] for w in windows], dtype=np.int64),
+        features if features is not None else np.zeros((0, 0), dtype=np.float32),
+        sr,
+    )
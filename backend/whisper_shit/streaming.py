@@ -0,0 +1,271 @@
+"""
+Windowed long-recording mode with incremental results.
+
+Instead of decoding the whole recording and returning once the LLM step is
+done, the file is processed in overlapping windows that are decoded straight
+from disk one at a time. Each window runs VAD, ASR and diarization on its own;
+SpeakerTracker keeps speaker IDs stable across windows. Finished segments are
+yielded as events as soon as their window is done, so memory stays bounded by
+the window size and a client can start rendering after the first window.
+The file itself is decoded once, front to back, as a stream of blocks; each
+window is sliced from the decoded tail rather than re-read from disk.
+
+Every window owns the part of its span up to the middle of the overlap with
+its neighbours; segments and turns are only emitted from the owned part, so
+nothing is reported twice.
+"""
+
+import json
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Iterator
+
+import numpy as np
+
+from age_gender_estimation import (
+    MAX_SECONDS_PER_SPEAKER,
+    age_gender_attributes,
+    merge_age_gender_predictions,
+    predict_speaker_age_gender,
+)
+from analytics import speaker_analytics
+from audio_buffer import SAMPLE_RATE, AudioBuffer, stream_audio
+from emotion import (
+    emotion_sums,
+    emotion_trend,
+    merge_emotion_sums,
+    mood_summary,
+    segment_emotions,
+    voice_budget,
+    window_emotions,
+)
+from llm_populate_entries import extract_speaker_names_with_llm
+from model_registry import age_gender_description, asr_description, emotion_description, registry
+from processor import (
+    build_personas,
+    diarize_with_pyannote,
+    format_segment,
+    split_segments_by_speaker,
+    transcribe_audio_simple,
+)
+from speaker_index import recognize_personas
+from speaker_tracking import SpeakerTracker, overlap_votes
+from speech_features import extract_features, speech_windows
+from vad import detect_speech
+
+WINDOW_SEC = 300.0
+OVERLAP_SEC = 10.0
+
+
+def _shift(turns: list[dict], offset: float, mapping: dict[str, str] | None = None) -> list[dict]:
+    out = []
+    for t in turns:
+        shifted = dict(t, start=t["start"] + offset, end=t["end"] + offset)
+        if mapping:
+            shifted["speaker_id"] = mapping[t["speaker_id"]]
+        if t.get("words"):
+            shifted["words"] = [dict(w, start=w["start"] + offset, end=w["end"] + offset) for w in t["words"]]
+        out.append(shifted)
+    return out
+
+
+def _clip(turns: list[dict], start: float, end: float) -> list[dict]:
+    out = []
+    for t in turns:
+        s, e = max(t["start"], start), min(t["end"], end)
+        if e > s:
+            out.append(dict(t, start=s, end=e))
+    return out
+
+
+def process_audio_windowed(
+    audio_file: str,
+    window_sec: float = WINDOW_SEC,
+    overlap_sec: float = OVERLAP_SEC,
+    num_speakers: int | None = None,
+) -> Iterator[dict]:
+    """
+    Process a long recording window by window and yield events as results are ready.
+
+    Events (each a dict with a "type"):
+        start     duration and window settings
+        segment   one finished transcript segment, with a stable speaker_id
+        progress  seconds processed so far and speakers seen
+        summary   personas, hierarchy and meta once the whole file is done
+
+    Args:
+        audio_file: Path to the recording
+        window_sec: Length of each processing window
+        overlap_sec: Overlap between consecutive windows (used to match speakers)
+        num_speakers: Speakers per window if known; None lets pyannote decide
+    """
+    import librosa
+
+    if overlap_sec >= window_sec:
+        raise ValueError("overlap_sec must be smaller than window_sec")
+
+    total = float(librosa.get_duration(path=audio_file))
+    session_id = f"session_{datetime.now().strftime('%Y_%m_%d_%H%M%S')}"
+    yield {
+        "type": "start",
+        "session_id": session_id,
+        "duration_sec": round(total, 1),
+        "window_sec": window_sec,
+        "overlap_sec": overlap_sec,
+    }
+
+    tracker = SpeakerTracker()
+    owned_turns: list[dict] = []      # global-labelled turns from every window's owned part
+    shared_turns: list[dict] = []     # previous window's turns inside the overlap with this one
+    transcript: list[dict] = []       # emitted segments, kept for the LLM name pass
+    lang_counts = defaultdict(Counter)
+    languages = Counter()
+    predictions: dict[str, dict] = {}
+    emotion_totals: dict[str, list[float]] = {}
+    emotion_labels = None
+    speech_sec = 0.0
+
+    decoded = stream_audio(audio_file, SAMPLE_RATE)
+    pending = np.zeros(0, dtype=np.float32)   # decoded samples from win_start onwards
+
+    win_start = 0.0
+    while win_start < total:
+        win_end = min(total, win_start + window_sec)
+        is_last = win_end >= total
+        own_start = win_start + overlap_sec / 2 if win_start > 0 else 0.0
+        own_end = total if is_last else win_end - overlap_sec / 2
+
+        need = int(round((win_end - win_start) * SAMPLE_RATE))
+        parts, have = [pending], len(pending)
+        while have < need:
+            block = next(decoded, None)
+            if block is None:
+                break
+            parts.append(block)
+            have += len(block)
+        pending = np.concatenate(parts)
+        samples, sr = pending[:need], SAMPLE_RATE
+        buffer = AudioBuffer(samples, sr)
+        regions = detect_speech(samples, sr)
+        speech_sec += sum(
+            max(0.0, min(e / sr + win_start, own_end) - max(s / sr + win_start, own_start))
+            for s, e in regions.regions
+        )
+
+        asr_segments, info = transcribe_audio_simple(buffer, regions)
+        local_turns, embeddings = diarize_with_pyannote(
+            buffer, num_speakers=num_speakers, speech_regions=regions, return_embeddings=True
+        )
+
+        # Local labels -> global IDs, using the overlap with the previous window first
+        durations = defaultdict(float)
+        for t in local_turns:
+            durations[t["speaker_id"]] += t["end"] - t["start"]
+        abs_local = _shift(local_turns, win_start)
+        votes = overlap_votes(abs_local, shared_turns, win_start, win_start + overlap_sec) if win_start > 0 else {}
+        mapping = tracker.match(embeddings, dict(durations), votes)
+        window_turns = _shift(local_turns, win_start, mapping)
+
+        owned_turns.extend(_clip(window_turns, own_start, own_end))
+        next_start = win_start + window_sec - overlap_sec
+        shared_turns = _clip(window_turns, next_start, win_end)
+
+        # One encoder pass over this window's owned speech feeds age/gender (only for
+        # speakers that still have budget left) and, with an emotion head, emotion
+        budgets = {
+            gid: MAX_SECONDS_PER_SPEAKER - predictions.get(gid, {}).get("analyzed_sec", 0.0)
+            for gid in set(mapping.values())
+        }
+        owned_local = _clip(_shift(local_turns, 0.0, mapping), own_start - win_start, own_end - win_start)
+        emotions = None
+        try:
+            with_emotion = registry.available("emotion")
+            windows = speech_windows(
+                owned_local, sorted(budgets), sr, len(samples),
+                max_seconds_per_speaker=voice_budget(budgets) if with_emotion else budgets,
+            )
+            bank = extract_features(samples, sr, windows)
+            window_preds = predict_speaker_age_gender(
+                samples, sr, owned_local, sorted(budgets), max_seconds_per_speaker=budgets, features=bank
+            )
+            for gid, pred in window_preds.items():
+                predictions[gid] = merge_age_gender_predictions(predictions.get(gid), pred)
+            if with_emotion:
+                emotions = window_emotions(bank)
+                emotions["windows"] = [[s + win_start, e + win_start, spk] for s, e, spk in emotions["windows"]]
+                emotion_labels = emotions["labels"]
+                emotion_totals = merge_emotion_sums(emotion_totals, emotion_sums(emotions))
+        except Exception as e:
+            print(f"⚠️ Voice analysis failed for window at {win_start:.0f}s: {e}")
+
+        # Segments whose midpoint falls in the owned part belong to this window
+        language = info.language
+        if language:
+            languages[language] += 1
+        segments = [
+            seg for seg in split_segments_by_speaker(_shift(asr_segments, win_start), window_turns)
+            if own_start <= (seg["start"] + seg["end"]) / 2 < own_end
+        ]
+        if emotions:
+            for seg, emotion in zip(segments, segment_emotions(segments, emotions)):
+                seg["emotion"] = emotion
+        for seg in segments:
+            out = format_segment(seg, language)
+            lang_counts[out["speaker_id"]][language or "und"] += 1
+            transcript.append({"speaker_id": out["speaker_id"], "text": out["text"]})
+            yield {"type": "segment", **out}
+
+        del buffer, samples
+        yield {
+            "type": "progress",
+            "processed_sec": round(own_end, 1),
+            "total_sec": round(total, 1),
+            "speakers": len(tracker.weights),
+        }
+        if is_last:
+            break
+        pending = pending[int(round((next_start - win_start) * SAMPLE_RATE)):]
+        win_start = next_start
+
+    language = languages.most_common(1)[0][0] if languages else None
+    personas = build_personas(speaker_analytics(owned_turns), lang_counts, language)
+    for persona in personas:
+        if persona["speaker_id"] in predictions:
+            persona.update(age_gender_attributes(predictions[persona["speaker_id"]]))
+        if emotion_labels:
+            persona["mood_summary"] = mood_summary(emotion_totals.get(persona["speaker_id"]), emotion_labels)
+    recognize_personas(personas, {gid: tracker.centroid(gid) for gid in tracker.weights})
+    personas = extract_speaker_names_with_llm(transcript, personas)
+
+    yield {
+        "type": "summary",
+        "session_id": session_id,
+        "meta": {
+            "duration_sec": round(total, 1),
+            "sampling_rate": SAMPLE_RATE,
+            "model_asr": asr_description(),
+            "model_diarization": "pyannote/speaker-diarization-3.1",
+            "model_age_gender": age_gender_description(),
+            "model_emotion": emotion_description(),
+            "date_processed": datetime.now().isoformat() + "Z",
+            "mode": "windowed",
+            "window_sec": window_sec,
+            "overlap_sec": overlap_sec,
+            "speech_sec": round(speech_sec, 2),
+        },
+        "personas": personas,
+        "hierarchy": sorted(personas, key=lambda x: x["speaking_time_sec"], reverse=True),
+        "global_emotion_trend": emotion_trend(emotion_totals, emotion_labels) if emotion_labels else {"neutral": 1.0},
+    }
+
+
+def to_ndjson(events: Iterator[dict]) -> Iterator[str]:
+    """One JSON object per line."""
+    for event in events:
+        yield json.dumps(event) + "\n"
+
+
+def to_sse(events: Iterator[dict]) -> Iterator[str]:
+    """Server-sent events, with the event type as the SSE event name."""
+    for event in events:
+        yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,135 @@
+"""
+Train the emotion head on the age/gender encoder's features.
+
+The pipeline gets emotion from the same wav2vec2 pass as age and gender
+(speech_features.py), so the head has to be trained on that encoder's pooled
+features rather than taken from a separately fine-tuned emotion model. The
+dataset is a directory with one subdirectory per label, e.g.
+
+    emotions/neutral/*.wav  emotions/happy/*.wav  emotions/angry/*.wav ...
+
+Every clip is cut into the pipeline's windows, the features are extracted with
+the configured age/gender backend, and a ModelHead is trained on them. The
+result goes to $ECHOLOGIA_MODEL_DIR/emotion-head (or --out), where the model
+registry picks it up.
+
+    python whisper_shit/train_emotion_head.py emotions/ --epochs 30
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from audio_buffer import decode_audio
+from model_registry import AGE_GENDER_MODEL_ID, EMOTION_HEAD_DIR, MODEL_DIR_ENV, registry
+from speech_features import WINDOW_SEC, extract_features, speech_windows
+
+AUDIO_SUFFIXES = {".wav", ".flac", ".mp3", ".ogg", ".m4a"}
+
+
+def load_dataset(root: Path) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    """Features and label indices of every window of every clip under `root`."""
+    labels = sorted(d.name for d in root.iterdir() if d.is_dir())
+    if len(labels) < 2:
+        raise ValueError(f"Need at least two label directories in {root}, found {labels}")
+    features, targets = [], []
+    for k, label in enumerate(labels):
+        clips = sorted(p for p in (root / label).rglob("*") if p.suffix.lower() in AUDIO_SUFFIXES)
+        print(f"🎧 {label}: {len(clips)} clips")
+        for clip in clips:
+            buffer = decode_audio(str(clip))
+            try:
+                turns = [{"speaker_id": label, "start": 0.0, "end": buffer.duration}]
+                windows = speech_windows(turns, [label], buffer.sample_rate, len(buffer.samples), WINDOW_SEC)
+                if not windows:
+                    continue
+                bank = extract_features(buffer.samples, buffer.sample_rate, windows)
+            finally:
+                buffer.close()
+            features.append(bank.features)
+            targets.extend([k] * len(bank))
+    if not features:
+        raise ValueError(f"No usable clips under {root}")
+    return np.concatenate(features), np.array(targets, dtype=np.int64), labels
+
+
+def train(features: np.ndarray, targets: np.ndarray, labels: list[str], epochs: int, lr: float, dropout: float, seed: int):
+    """An EmotionHead fitted on (features, targets), plus the held-out accuracy."""
+    import torch
+    from age_gender_model import EmotionHead
+
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(targets))
+    n_val = max(1, len(order) // 10)
+    val, fit = order[:n_val], order[n_val:]
+
+    head = EmotionHead(SimpleNamespace(hidden_size=features.shape[1], final_dropout=dropout), labels)
+    x, y = torch.from_numpy(features), torch.from_numpy(targets)
+    # Classes are weighted so a dominant label doesn't swamp the rest
+    counts = np.bincount(targets[fit], minlength=len(labels)).astype(np.float32)
+    weights = torch.from_numpy(counts.sum() / np.maximum(counts, 1.0) / len(labels))
+    loss_fn = torch.nn.CrossEntropyLoss(weight=weights)
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=1e-3)
+    for epoch in range(epochs):
+        head.train()
+        for b in np.array_split(rng.permutation(fit), max(1, len(fit) // 64)):
+            optimizer.zero_grad()
+            loss = loss_fn(head.head(x[b]), y[b])
+            loss.backward()
+            optimizer.step()
+        head.eval()
+        with torch.no_grad():
+            accuracy = float((head(x[val]).argmax(dim=1) == y[val]).float().mean())
+        print(f"  epoch {epoch + 1}/{epochs}: loss {loss.item():.3f}, held-out accuracy {accuracy:.3f}")
+    return head, accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", help="Directory with one subdirectory of clips per label")
+    parser.add_argument("--out", help=f"Output directory (default: ${MODEL_DIR_ENV}/{EMOTION_HEAD_DIR})")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--dropout", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.out:
+        out = Path(args.out)
+    elif os.environ.get(MODEL_DIR_ENV):
+        out = Path(os.environ[MODEL_DIR_ENV]) / EMOTION_HEAD_DIR
+    else:
+        parser.error(f"--out is required when ${MODEL_DIR_ENV} is not set")
+
+    import torch
+
+    registry.get("age_gender")
+    features, targets, labels = load_dataset(Path(args.dataset))
+    print(f"🧠 Training on {len(targets)} windows, labels {labels}")
+    head, accuracy = train(features, targets, labels, args.epochs, args.lr, args.dropout, args.seed)
+
+    out.mkdir(parents=True, exist_ok=True)
+    torch.save(head.state_dict(), out / "head.pt")
+    (out / "config.json").write_text(json.dumps({
+        "labels": labels,
+        "hidden_size": int(features.shape[1]),
+        "encoder": AGE_GENDER_MODEL_ID,
+        "window_sec": WINDOW_SEC,
+        "windows": int(len(targets)),
+        "held_out_accuracy": round(accuracy, 3),
+        "trained": datetime.now().isoformat(),
+    }, indent=2))
+    print(f"💾 Emotion head saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
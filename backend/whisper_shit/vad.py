@@ -0,0 +1,135 @@
+"""
+Voice activity detection stage.
+
+Speech regions are computed once per recording with the Silero VAD bundled in
+faster-whisper, then reused downstream: Whisper decodes only those regions
+(via clip_timestamps, in original time), pyannote diarizes the concatenated
+speech and its turns are mapped back to the original timeline, and the
+age/gender windows come from those speech-only turns.
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+# Silero settings; padding keeps word onsets and offsets that fall just outside a region
+VAD_PARAMS = {
+    "threshold": 0.5,
+    "min_speech_duration_ms": 250,
+    "min_silence_duration_ms": 500,
+    "speech_pad_ms": 200,
+}
+
+
+class SpeechRegions:
+    """Speech regions of one recording, in samples, with helpers to move between timelines."""
+
+    def __init__(self, regions: list[tuple[int, int]], sample_rate: int, total_samples: int, breaks: list[int] = ()):
+        self.regions = [(int(s), int(e)) for s, e in regions if e > s]
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        # Sample positions no batch_clips() chunk may span, e.g. where one file ends
+        # and the next begins in audio packed from several recordings
+        self.breaks = sorted(int(b) for b in breaks)
+        # Start of each region inside the concatenated speech-only audio
+        lengths = [e - s for s, e in self.regions]
+        self._concat_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64) if lengths else np.zeros(0, dtype=np.int64)
+        self.speech_samples = int(sum(lengths))
+
+    @property
+    def speech_sec(self) -> float:
+        return self.speech_samples / self.sample_rate
+
+    @property
+    def total_sec(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    @property
+    def speech_fraction(self) -> float:
+        return self.speech_samples / self.total_samples if self.total_samples else 0.0
+
+    def clip_timestamps(self) -> list[float]:
+        """Flat [start, end, start, end, ...] in seconds, as faster-whisper's clip_timestamps expects."""
+        out = []
+        for s, e in self.regions:
+            out.extend((s / self.sample_rate, e / self.sample_rate))
+        return out
+
+    def batch_clips(self, max_sec: float = 30.0) -> list[dict]:
+        """
+        Regions grouped into chunks of at most `max_sec` (Whisper's window), as
+        [{"start", "end"}] in seconds for faster-whisper's batched pipeline.
+        Neighbouring short regions share a chunk unless a break lies between them;
+        longer ones are split.
+        """
+        sr = self.sample_rate
+        max_len = int(max_sec * sr)
+        clips = []
+        for s, e in self.regions:
+            while e - s > max_len:
+                clips.append([s, s + max_len])
+                s += max_len
+            crosses = clips and bisect_right(self.breaks, s) != bisect_right(self.breaks, clips[-1][0])
+            if clips and not crosses and e - clips[-1][0] <= max_len:
+                clips[-1][1] = e
+            else:
+                clips.append([s, e])
+        return [{"start": s / sr, "end": e / sr} for s, e in clips]
+
+    def concatenate(self, samples: np.ndarray) -> np.ndarray:
+        """Speech-only audio: the regions of `samples` back to back."""
+        if not self.regions:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate([samples[s:e] for s, e in self.regions])
+
+    def to_original(self, segments: list[dict]) -> list[dict]:
+        """
+        Map segments timed on the concatenated speech back to the original timeline.
+        A segment that spans a join between two regions is split there, so the
+        silence that was cut out is never attributed to anyone.
+        """
+        out = []
+        sr = self.sample_rate
+        for seg in segments:
+            s = int(round(seg["start"] * sr))
+            e = int(round(seg["end"] * sr))
+            k = max(0, bisect_right(self._concat_starts, s) - 1)
+            while k < len(self.regions) and s < e:
+                r_start, r_end = self.regions[k]
+                c_start = int(self._concat_starts[k])
+                c_end = c_start + (r_end - r_start)
+                piece_end = min(e, c_end)
+                if piece_end > s:
+                    out.append(dict(seg, start=(r_start + s - c_start) / sr, end=(r_start + piece_end - c_start) / sr))
+                s = c_end
+                k += 1
+        return out
+
+    def summary(self) -> dict:
+        return {
+            "speech_sec": round(self.speech_sec, 2),
+            "total_sec": round(self.total_sec, 2),
+            "speech_fraction": round(self.speech_fraction, 3),
+            "regions": len(self.regions),
+            # Whisper and pyannote only see the speech, so this much audio is never decoded
+            "skipped_sec": round(self.total_sec - self.speech_sec, 2),
+            "compute_saved_percent": round(100.0 * (1.0 - self.speech_fraction), 1),
+        }
+
+    def to_dict(self) -> dict:
+        return {"regions": self.regions, "sample_rate": self.sample_rate, "total_samples": self.total_samples}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpeechRegions":
+        return cls([tuple(r) for r in data["regions"]], data["sample_rate"], data["total_samples"])
+
+
+def detect_speech(samples: np.ndarray, sample_rate: int = 16000) -> SpeechRegions:
+    """Run Silero VAD over 16 kHz float32 audio and return the speech regions."""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    print("🗣️  Detecting speech regions...")
+    chunks = get_speech_timestamps(np.asarray(samples, dtype=np.float32), VadOptions(**VAD_PARAMS))
+    regions = SpeechRegions([(c["start"], c["end"]) for c in chunks], sample_rate, len(samples))
+    print(f"✅ Speech: {regions.speech_sec:.1f}s of {regions.total_sec:.1f}s ({100 * regions.speech_fraction:.0f}%)")
+    return regions